@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark for :func:`pyms.DPA.PairwiseAlignment.dp`
+
+Compares the vectorised anti-diagonal implementation of the dynamic
+programming step against the original cell-by-cell Python loop, using
+synthetic score matrices of 500 to 5,000 alignment positions.
+
+Usage::
+
+	python benchmarks/dpa_dp.py [--sizes 500 1000 ...] [--reference-limit 2000]
+"""
+
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+import argparse
+import time
+
+# 3rd party
+import numpy  # type: ignore
+
+# this package
+from pyms.DPA.PairwiseAlignment import dp
+
+
+def reference_dp(S, gap_penalty):
+	"""
+	The original cell-by-cell implementation of ``dp()``, kept for comparison.
+	"""
+
+	row_length, col_length = S.shape
+
+	D = numpy.zeros((row_length + 1, col_length + 1), dtype='d')
+	for i in range(1, row_length + 1):
+		D[i, 0] = gap_penalty * i
+	for j in range(1, col_length + 1):
+		D[0, j] = gap_penalty * j
+
+	trace_matrix = numpy.zeros((row_length + 1, col_length + 1))
+	trace_matrix[:, 0] = 1
+	trace_matrix[0, :] = 2
+	trace_matrix[0, 0] = 3
+
+	for i in range(1, row_length + 1):
+		for j in range(1, col_length + 1):
+			darray = [D[i - 1, j - 1] + S[i - 1, j - 1], D[i - 1, j] + gap_penalty, D[i, j - 1] + gap_penalty]
+			D[i, j] = min(darray)
+			trace_matrix[i, j] = darray.index(D[i, j])
+
+	trace = []
+	i, j = row_length, col_length
+	direction = trace_matrix[i, j]
+
+	while direction != 3:
+		if direction == 0:
+			i, j = i - 1, j - 1
+		elif direction == 1:
+			i = i - 1
+		elif direction == 2:
+			j = j - 1
+		trace.append(direction)
+		direction = trace_matrix[i, j]
+
+	trace.reverse()
+
+	return {'trace': trace, 'D': D}
+
+
+def synthetic_score_matrix(n_positions, rng):
+	"""
+	Build a score matrix resembling one from two similar peak lists.
+
+	Scores are 1.0 (worst) away from the diagonal band and lower near it,
+	as they are for real alignments where retention times roughly agree.
+	"""
+
+	rts_1 = numpy.sort(rng.uniform(0, 3600, n_positions))
+	rts_2 = numpy.sort(rts_1 + rng.normal(0, 2.0, n_positions))
+
+	delta = numpy.abs(rts_1[:, None] - rts_2[None, :])
+	scores = 1.0 - numpy.exp(-(delta / 2.5) ** 2 / 2.0) * rng.uniform(0.5, 1.0, (n_positions, n_positions))
+
+	return scores
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--sizes", type=int, nargs='+', default=[500, 1000, 2000, 3000, 5000])
+	parser.add_argument(
+			"--reference-limit",
+			type=int,
+			default=2000,
+			help="Largest size to run the (slow) reference implementation for.",
+			)
+	parser.add_argument("--gap", type=float, default=0.3)
+	args = parser.parse_args()
+
+	rng = numpy.random.RandomState(1234)
+
+	print(f"{'positions':>10}  {'vectorised (s)':>15}  {'reference (s)':>14}  {'speedup':>8}  identical")
+
+	for size in args.sizes:
+		S = synthetic_score_matrix(size, rng)
+
+		start = time.perf_counter()
+		result = dp(S, args.gap)
+		new_time = time.perf_counter() - start
+
+		if size <= args.reference_limit:
+			start = time.perf_counter()
+			expected = reference_dp(S, args.gap)
+			ref_time = time.perf_counter() - start
+
+			identical = result['trace'] == expected['trace'] and numpy.array_equal(result['D'], expected['D'])
+			print(f"{size:>10}  {new_time:>15.3f}  {ref_time:>14.3f}  {ref_time / new_time:>7.1f}x  {identical}")
+		else:
+			print(f"{size:>10}  {new_time:>15.3f}  {'-':>14}  {'-':>8}  -")
+
+
+if __name__ == "__main__":
+	main()
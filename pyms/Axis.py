@@ -0,0 +1,378 @@
+"""
+Immutable axes of retention times and masses, with fast nearest-value lookup
+"""
+
+################################################################################
+#                                                                              #
+#    PyMassSpec software for processing of mass-spectrometry data              #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                              #
+#                                                                              #
+#    This program is free software; you can redistribute it and/or modify      #
+#    it under the terms of the GNU General Public License version 2 as         #
+#    published by the Free Software Foundation.                                #
+#                                                                              #
+#    This program is distributed in the hope that it will be useful,           #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#    GNU General Public License for more details.                              #
+#                                                                              #
+#    You should have received a copy of the GNU General Public License         #
+#    along with this program; if not, write to the Free Software               #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.                 #
+#                                                                              #
+################################################################################
+
+# stdlib
+from numbers import Number
+from typing import Any, Iterator, List, Optional, Sequence, Union
+
+# 3rd party
+import numpy  # type: ignore
+
+# Largest deviation from an evenly spaced axis, as a fraction of the step,
+# for which the nearest value is looked up arithmetically.
+# Up to a quarter of a step the nearest value is always within one point of the estimate.
+_UNIFORM_TOLERANCE = 0.25
+
+# Number of values compared at once when searching an unsorted axis
+_SEARCH_BLOCK_SIZE = 2 ** 20
+
+
+class Axis(Sequence):
+	"""
+	An immutable sequence of retention times or masses
+
+	An Axis can be shared by any number of objects, such as an
+	:class:`~pyms.IntensityMatrix.IntensityMatrix` and the
+	:class:`~pyms.IonChromatogram.IonChromatogram` objects taken from it,
+	without being copied.
+
+	The index of the value nearest to a given value is found in constant time
+	if the values are evenly spaced, by binary search if they are sorted,
+	and by comparing every value otherwise.
+
+	:param values: The values of the axis
+	:type values: ~collections.abc.Sequence of ~numbers.Number or numpy.ndarray
+
+	:author: Dominic Davis-Foster
+	"""
+
+	def __init__(self, values: Union[Sequence[Number], numpy.ndarray]):
+		"""
+		Initialize the Axis
+		"""
+
+		if isinstance(values, Axis):
+			values = values._values
+		else:
+			values = numpy.array(values)
+
+		if values.ndim != 1 or values.dtype.kind not in "iuf":
+			raise TypeError("'values' must be a Sequence of Numbers")
+
+		values.flags.writeable = False
+
+		self.__set_values(values)
+
+	@classmethod
+	def _from_array(cls, values: numpy.ndarray) -> "Axis":
+		"""
+		Returns a new Axis of the values in a read-only array, without copying them
+		"""
+
+		axis = cls.__new__(cls)
+		axis.__set_values(values)
+
+		return axis
+
+	def __set_values(self, values: numpy.ndarray):
+		"""
+		Sets the values of the axis and the properties derived from them
+		"""
+
+		if not len(values):
+			raise ValueError("'values' must not be empty")
+
+		self._values = values
+		self._min = values.min().item()
+		self._max = values.max().item()
+		self._sorted = bool((values[1:] >= values[:-1]).all())
+		self._step = self.__calc_uniform_step()
+		self._mean_step: Optional[float] = None
+
+	def __calc_uniform_step(self) -> Optional[float]:
+		"""
+		Returns the step between values if they are evenly spaced, otherwise :py:obj:`None`
+		"""
+
+		values = self._values
+
+		# Three points are needed to look either side of the estimate
+		if len(values) < 3 or not self._sorted:
+			return None
+
+		step = (float(values[-1]) - float(values[0])) / (len(values) - 1)
+		if step <= 0:
+			return None
+
+		deviation = numpy.abs(values - (float(values[0]) + step * numpy.arange(len(values))))
+		if deviation.max() >= step * _UNIFORM_TOLERANCE:
+			return None
+
+		return step
+
+	def __len__(self) -> int:
+		return len(self._values)
+
+	def __getitem__(self, item):
+		"""
+		Returns the value at the given index, or a new Axis for a slice.
+
+		Slices share the values of this Axis rather than copying them.
+		"""
+
+		if isinstance(item, slice):
+			return self._from_array(self._values[item])
+
+		return self._values[item].item()
+
+	def __iter__(self) -> Iterator:
+		return iter(self.tolist())
+
+	def __eq__(self, other: Any) -> bool:
+		"""
+		Return whether this Axis has the same values as another Axis or sequence
+
+		:param other: The other object to test equality with
+		:type other: object
+
+		:rtype: bool
+		"""
+
+		if isinstance(other, Axis):
+			return other is self or numpy.array_equal(self._values, other._values)
+		elif isinstance(other, (list, tuple, numpy.ndarray)):
+			return self.tolist() == list(other)
+
+		return NotImplemented
+
+	__hash__ = None  # type: ignore
+
+	def __repr__(self) -> str:
+		return f"Axis({self.min} - {self.max}, length {len(self)})"
+
+	def __array__(self, dtype=None) -> numpy.ndarray:
+		if dtype is None:
+			return self._values
+
+		return self._values.astype(dtype)
+
+	def __copy__(self) -> "Axis":
+		# The values cannot be changed, so there is no need for a copy
+		return self
+
+	def __deepcopy__(self, memodict={}) -> "Axis":
+		return self
+
+	def __reduce__(self):
+		return self.__class__, (self._values, )
+
+	@property
+	def values(self) -> numpy.ndarray:
+		"""
+		Returns a read-only array of the values of the axis
+
+		:rtype: numpy.ndarray
+		"""
+
+		return self._values
+
+	@property
+	def min(self) -> Number:
+		"""
+		Returns the smallest value of the axis
+
+		:rtype: ~numbers.Number
+		"""
+
+		return self._min
+
+	@property
+	def max(self) -> Number:
+		"""
+		Returns the largest value of the axis
+
+		:rtype: ~numbers.Number
+		"""
+
+		return self._max
+
+	@property
+	def step(self) -> Optional[float]:
+		"""
+		Returns the step between values if they are evenly spaced, otherwise :py:obj:`None`
+
+		:rtype: float or None
+		"""
+
+		return self._step
+
+	@property
+	def mean_step(self) -> float:
+		"""
+		Returns the mean difference between consecutive values
+
+		:rtype: float
+		"""
+
+		if self._mean_step is None:
+			self._mean_step = float(numpy.diff(self._values).mean()) if len(self) > 1 else float("nan")
+
+		return self._mean_step
+
+	def tolist(self) -> List:
+		"""
+		Returns the values of the axis as a list
+
+		:rtype: list
+		"""
+
+		return self._values.tolist()
+
+	def nearest_index(self, value: float) -> int:
+		"""
+		Returns the index of the value nearest to the given value
+
+		If two values are equally near the lower index is returned.
+
+		:param value:
+		:type value: ~numbers.Number
+
+		:rtype: int
+		"""
+
+		if not isinstance(value, Number):
+			raise TypeError("'value' must be a number")
+
+		values = self._values
+		n_values = len(values)
+
+		# The same search as nearest_indices, without the overhead of arrays for a single value
+		if n_values == 1:
+			return 0
+		elif self._step is not None:
+			estimate = int(round((value - values.item(0)) / self._step))
+			estimate = min(max(estimate, 1), n_values - 2)
+			candidates = (estimate - 1, estimate, estimate + 1)
+		elif self._sorted:
+			right = min(max(int(numpy.searchsorted(values, value)), 1), n_values - 1)
+			candidates = (right - 1, right)
+		else:
+			return int(self.nearest_indices([value])[0])
+
+		# min returns the first of equally near values
+		index = min(candidates, key=lambda candidate: abs(values.item(candidate) - value))
+
+		if self._step is None:
+			# The first of any repeated values
+			index = int(numpy.searchsorted(values, values[index]))
+
+		return index
+
+	def nearest_indices(self, values: Union[Sequence[Number], numpy.ndarray]) -> numpy.ndarray:
+		"""
+		Returns the index of the value nearest to each of the given values
+
+		If two values are equally near the lower index is returned.
+
+		:param values:
+		:type values: ~collections.abc.Sequence of ~numbers.Number or numpy.ndarray
+
+		:rtype: numpy.ndarray
+		"""
+
+		targets = numpy.asarray(values, dtype=float)
+		shape = targets.shape
+		targets = targets.ravel()
+
+		if len(self._values) == 1:
+			indices = numpy.zeros(len(targets), dtype=int)
+		elif self._step is not None:
+			indices = self.__uniform_indices(targets)
+		elif self._sorted:
+			indices = self.__sorted_indices(targets)
+		else:
+			indices = self.__unsorted_indices(targets)
+
+		return indices.reshape(shape)
+
+	def __uniform_indices(self, targets: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Returns the nearest indices for an evenly spaced axis
+		"""
+
+		# The nearest value is within one point of the estimate
+		estimate = numpy.rint((targets - float(self._values[0])) / self._step)
+		estimate = estimate.clip(1, len(self._values) - 2).astype(int)
+
+		return self.__nearest_of(targets, estimate - 1, estimate, estimate + 1)
+
+	def __sorted_indices(self, targets: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Returns the nearest indices for a sorted axis
+		"""
+
+		right = numpy.searchsorted(self._values, targets).clip(1, len(self._values) - 1)
+		indices = self.__nearest_of(targets, right - 1, right)
+
+		# The first of any repeated values
+		return numpy.searchsorted(self._values, self._values[indices])
+
+	def __unsorted_indices(self, targets: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Returns the nearest indices for an unsorted axis
+		"""
+
+		values = self._values.astype(float)
+		indices = numpy.zeros(len(targets), dtype=int)
+		block_size = max(1, _SEARCH_BLOCK_SIZE // len(values))
+
+		for start in range(0, len(targets), block_size):
+			block = targets[start:start + block_size]
+			indices[start:start + block_size] = numpy.abs(values - block[:, None]).argmin(axis=1)
+
+		return indices
+
+	def __nearest_of(self, targets: numpy.ndarray, *candidates: numpy.ndarray) -> numpy.ndarray:
+		"""
+		Returns whichever of the candidate indices has the value nearest to each target.
+
+		The candidates must be given in ascending order. Ties go to the earlier candidate.
+		"""
+
+		best = candidates[0]
+		best_distance = numpy.abs(self._values[best] - targets)
+
+		for candidate in candidates[1:]:
+			distance = numpy.abs(self._values[candidate] - targets)
+			nearer = distance < best_distance
+			best = numpy.where(nearer, candidate, best)
+			best_distance = numpy.where(nearer, distance, best_distance)
+
+		return best
+
+
+def as_axis(values: Union[Axis, Sequence[Number], numpy.ndarray]) -> Axis:
+	"""
+	Returns ``values`` if it is already an :class:`~pyms.Axis.Axis`, otherwise a new Axis of the values
+
+	:param values:
+	:type values: pyms.Axis.Axis or ~collections.abc.Sequence of ~numbers.Number or numpy.ndarray
+
+	:rtype: pyms.Axis.Axis
+	"""
+
+	if isinstance(values, Axis):
+		return values
+
+	return Axis(values)
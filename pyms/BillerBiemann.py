@@ -31,6 +31,7 @@ from numbers import Number
 from typing import List, Union, Sequence
 
 import numpy  # type: ignore
+import scipy.sparse  # type: ignore
 
 # this package
 from pyms.IntensityMatrix import IntensityMatrix
@@ -79,15 +80,17 @@ def BillerBiemann(im: IntensityMatrix, points: int = 3, scans: int = 1) -> List[
     mass_list = im.mass_list
     peak_list = []
     maxima_im = get_maxima_matrix(im, points, scans)
-    numrows = len(maxima_im)
 
-    for row in range(numrows):
-        if sum(maxima_im[row]) > 0:
-            rt = rt_list[row]
+    for row in numpy.flatnonzero(numpy.asarray(maxima_im.sum(axis=1)) > 0).tolist():
+        rt = rt_list[row]
+
+        if scipy.sparse.issparse(maxima_im):
+            ms = MassSpectrum(mass_list, maxima_im[row].toarray()[0])
+        else:
             ms = MassSpectrum(mass_list, maxima_im[row])
-            peak = Peak(rt, ms)
-            peak.bounds = [0, row, 0]  # store IM index for convenience
-            peak_list.append(peak)
+        peak = Peak(rt, ms)
+        peak.bounds = [0, row, 0]  # store IM index for convenience
+        peak_list.append(peak)
 
     return peak_list
 
@@ -113,35 +116,76 @@ def get_maxima_indices(ion_intensities: Union[Sequence, numpy.nd.array], points:
     if not isinstance(points, int):
         raise TypeError("'points' must be an integer")
 
+    rows, _ = _maxima_positions(numpy.asarray(ion_intensities, dtype='d').reshape(-1, 1), points)
+
+    return rows.tolist()
+
+
+def _maxima_positions(intensity_array: numpy.ndarray, points: int = 3):
+    """
+    Find local maxima in each column of an intensity array.
+
+    This applies the rules of :func:`get_maxima_indices` to every column at
+    once, comparing each scan with the largest intensities in the half-windows
+    either side of it.
+
+    :param intensity_array: An array of intensities with shape (scans, ions)
+    :type intensity_array: numpy.ndarray
+    :param points: Number of scans over which to consider a maxima to be a peak. Default ``3``
+    :type points: int, optional
+
+    :return: The scan and ion indices of the maxima, ordered by ion
+    :rtype: tuple of numpy.ndarray
+    """
+
     # find peak inflection points
     # use a 'points' point window
     # for a plateau after a rise, need to check if it is the left edge of
     # a peak
-    peak_point = []
-    edge = -1
-    points = int(points)
     half = int(points / 2)
     points = 2 * half + 1  # ensure odd number of points
+    numrows = intensity_array.shape[0]
+
+    if half < 1:
+        raise ValueError("'points' must be at least 2")
+
+    if numrows < points:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+
+    # largest intensity in the 'half' scans before and after each scan
+    left_max = numpy.full(intensity_array.shape, -numpy.inf)
+    right_max = numpy.full(intensity_array.shape, -numpy.inf)
+    for offset in range(1, half + 1):
+        numpy.maximum(left_max[offset:], intensity_array[:-offset], out=left_max[offset:])
+        numpy.maximum(right_max[:-offset], intensity_array[offset:], out=right_max[:-offset])
+
+    window = slice(half, numrows - half)
+    mid = intensity_array[window].T
+    left_max = left_max[window].T
+    right_max = right_max[window].T
+
+    # max in middle
+    apex = (mid > left_max) & (mid > right_max)
+    # flat from rise (left of peak?)
+    rise_to_flat = (mid > left_max) & (mid == right_max)
+    # fall from flat
+    flat_to_fall = (mid == left_max) & (mid > right_max)
+
+    # Walk through the events for each ion in scan order. A fall from flat is
+    # a peak centred on the plateau if the previous event for the ion was a
+    # flat from rise; any other event resets the left edge.
+    cols, rows = numpy.nonzero(apex | rise_to_flat | flat_to_fall)
+    is_apex = apex[cols, rows]
+    is_edge = rise_to_flat[cols, rows]
+
+    after_edge = numpy.zeros(len(rows), dtype=bool)
+    after_edge[1:] = is_edge[:-1] & (cols[:-1] == cols[1:])
+    plateau = flat_to_fall[cols, rows] & after_edge
 
-    for index in range(len(ion_intensities) - points + 1):
-        left = ion_intensities[index:index + half]
-        mid = ion_intensities[index + half]
-        right = ion_intensities[index + half + 1:index + points]
-        # max in middle
-        if mid > max(left) and mid > max(right):
-            peak_point.append(index + half)
-            edge = -1  # ignore previous rising edge
-        # flat from rise (left of peak?)
-        if mid > max(left) and mid == max(right):
-            edge = index + half  # ignore previous rising edge, update latest
-        # fall from flat
-        if mid == max(left) and mid > max(right):
-            if edge > -1:
-                centre = int((edge + index + half) / 2)  # mid point
-                peak_point.append(centre)
-            edge = -1
-
-    return peak_point
+    peak_rows = numpy.where(plateau, (numpy.roll(rows, 1) + rows) // 2, rows)
+    is_peak = is_apex | plateau
+
+    return peak_rows[is_peak] + half, cols[is_peak]
 
 
 def get_maxima_list(ic: IonChromatogram, points: List = 3) -> int:
@@ -232,8 +276,9 @@ def get_maxima_matrix(im: IntensityMatrix, points: int = 3, scans: int = 1) -> L
     :param scans: Number of scans to combine peaks from to compensate for spectra skewing. Default ``1``
     :type scans: int, optional
 
-    :return: A matrix of each ion and scan and intensity at ion peaks
-    :rtype: list
+    :return: A matrix of each ion and scan and intensity at ion peaks.
+        For a sparse intensity matrix this is a :class:`scipy.sparse.csr_matrix`.
+    :rtype: numpy.ndarray or scipy.sparse.csr_matrix
 
     :author: Andrew Isaac, Dominic Davis-Foster (type assertions)
     """
@@ -247,44 +292,196 @@ def get_maxima_matrix(im: IntensityMatrix, points: int = 3, scans: int = 1) -> L
     if not isinstance(scans, int):
         raise TypeError("'scans' must be an integer")
 
-    numrows, numcols = im.size
-    # zeroed matrix, size numrows*numcols
-    maxima_im = numpy.zeros((numrows, numcols))
-    raw_im = im.intensity_array
+    if im.is_sparse:
+        return _sparse_maxima_matrix(im, points, scans)
+
+    raw_im = numpy.asarray(im.intensity_array, dtype='d')
 
-    for col in range(numcols):  # assume all rows have same width
-        # 1st, find maxima
-        maxima = get_maxima_indices(raw_im[:, col], points)
+    # 1st, find maxima
+    rows, cols = _maxima_positions(raw_im, points)
 
-        # 2nd, fill intensities
-        for row in maxima:
-            maxima_im[row, col] = raw_im[row, col]
+    # 2nd, fill intensities
+    maxima_im = numpy.zeros(raw_im.shape)
+    maxima_im[rows, cols] = raw_im[rows, cols]
 
     # combine spectra within 'scans' scans.
+    _combine_scans(maxima_im, scans)
+
+    return maxima_im
+
+
+def _sparse_maxima_matrix(im: IntensityMatrix, points: int = 3, scans: int = 1) -> scipy.sparse.csr_matrix:
+    """
+    Get matrix of local maxima for each ion of a sparse intensity matrix.
+
+    The maxima are found a few ion chromatograms at a time, so the whole
+    intensity matrix is never converted to a dense array. Ion chromatograms
+    with no intensities have no maxima, so are skipped.
+
+    :param im: An :class:`~pyms.IntensityMatrix.IntensityMatrix`` object with sparse intensities
+    :type im: ~pyms.IntensityMatrix.IntensityMatrix
+    :param points: Number of scans over which to consider a maxima to be a peak. Default ``3``
+    :type points: int, optional
+    :param scans: Number of scans to combine peaks from to compensate for spectra skewing. Default ``1``
+    :type scans: int, optional
+
+    :rtype: scipy.sparse.csr_matrix
+    """
+
+    columns = im._sparse_columns()
+    n_scans, n_ions = columns.shape
+    block_size = max(1, 2**22 // max(n_scans, 1))
+
+    occupied = numpy.flatnonzero(numpy.diff(columns.indptr))
+
+    rows = [numpy.zeros(0, dtype=int)]
+    cols = [numpy.zeros(0, dtype=int)]
+    values = [numpy.zeros(0)]
+
+    for first in range(0, len(occupied), block_size):
+        block_ions = occupied[first:first + block_size]
+        block = columns[:, block_ions].toarray().astype('d')
+        block_rows, block_cols = _maxima_positions(block, points)
+
+        rows.append(block_rows)
+        cols.append(block_ions[block_cols])
+        values.append(block[block_rows, block_cols])
+
+    maxima_im = scipy.sparse.coo_matrix(
+            (numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(cols))),
+            shape=(n_scans, n_ions),
+            )
+
+    return _combine_sparse_scans(maxima_im, scans)
+
+
+def _combine_sparse_scans(maxima_im: scipy.sparse.coo_matrix, scans: int) -> scipy.sparse.csr_matrix:
+    """
+    Combines the maxima within 'scans' scans of each other into the scan
+    with the largest total intensity, as :func:`_combine_scans` does for a dense matrix.
+
+    :param maxima_im: The matrix of maxima
+    :type maxima_im: scipy.sparse.coo_matrix
+    :param scans: Number of scans to combine peaks from
+    :type scans: int
+
+    :rtype: scipy.sparse.csr_matrix
+    """
+
+    numrows = maxima_im.shape[0]
+
+    if scans < 2:
+        return maxima_im.tocsr()
+
+    tics = numpy.bincount(maxima_im.row, weights=maxima_im.data, minlength=numrows)
+    destination = _scan_destinations(tics, scans)
+
+    # Maxima moved into the same place are summed
+    return scipy.sparse.csr_matrix(
+            (maxima_im.data, (destination[maxima_im.row], maxima_im.col)),
+            shape=maxima_im.shape,
+            )
+
+
+def _combine_scans(maxima_im: numpy.ndarray, scans: int):
+    """
+    Combines the maxima within 'scans' scans of each other into the scan
+    with the largest total intensity, in place.
+
+    :param maxima_im: The matrix of maxima from :func:`get_maxima_matrix`
+    :type maxima_im: numpy.ndarray
+    :param scans: Number of scans to combine peaks from
+    :type scans: int
+    """
+
+    if scans < 2:
+        return
+
+    destination = _scan_destinations(maxima_im.sum(axis=1), scans)
+
+    # Move the maxima of each scan into its destination, summing those that
+    # meet with a sparse matrix with a one for each (destination, scan) pair
+    moved = numpy.flatnonzero(destination != numpy.arange(len(maxima_im)))
+    if not len(moved):
+        return
+
+    targets, group = numpy.unique(destination[moved], return_inverse=True)
+    grouping = scipy.sparse.csr_matrix(
+            (numpy.ones(len(moved)), (group, numpy.arange(len(moved)))),
+            shape=(len(targets), len(moved)),
+            )
+    moved_maxima = grouping @ maxima_im[moved]
+
+    maxima_im[moved] = 0
+    maxima_im[targets] += moved_maxima
+
+
+def _scan_destinations(tics: numpy.ndarray, scans: int) -> numpy.ndarray:
+    """
+    Returns the scan that the maxima of each scan are combined into by :func:`_combine_scans`.
+
+    A window of 'scans' scans slides over the matrix, and the maxima in the
+    window are moved into the scan with the largest total intensity. After the
+    first window each window differs from the last by one new scan, and holds
+    at most one other scan with maxima; the one they were moved into. So each
+    new scan either joins that scan, or takes its place, or, if it has moved out
+    of the window, starts a new group. Which of these happens depends on the
+    total intensity of the group so far, so the scans are visited in order,
+    but only the total intensity of each group is tracked.
+
+    :param tics: The total intensity of the maxima in each scan
+    :type tics: numpy.ndarray
+    :param scans: Number of scans to combine peaks from
+    :type scans: int
+
+    :rtype: numpy.ndarray
+    """
+
+    numrows = len(tics)
     half = int(scans / 2)
 
-    for row in range(numrows):
-        # tic = 0
-        best = 0
-        loc = 0
+    destination = numpy.arange(numrows)
+    rows = numpy.flatnonzero(tics > 0)
 
-        # find best in scans
-        for ii in range(scans):
-            if 0 <= row - half + ii < numrows:
-                tic = maxima_im[row - half + ii].sum()
-                # find largest tic of scans
-                if tic > best:
-                    best = tic
-                    loc = ii
+    if not len(rows):
+        return destination
 
-        # move and add others to best
-        for ii in range(scans):
-            if 0 <= row - half + ii < numrows and ii != loc:
-                for col in range(numcols):
-                    maxima_im[row - half + loc, col] += maxima_im[row - half + ii, col]
-                    maxima_im[row - half + ii, col] = 0
+    tics = tics[rows].tolist()
 
-    return maxima_im
+    # The first window contains the first few scans
+    n_first = int(numpy.searchsorted(rows, min(scans - half, numrows)))
+    rows_list = rows.tolist()
+
+    # The index into 'rows' at which each group starts, and the scan the group is moved into
+    group_starts = []
+    targets = []
+
+    if n_first:
+        group_starts.append(0)
+        best = max(range(n_first), key=tics.__getitem__)
+        targets.append(rows_list[best])
+        total = sum(tics[:n_first])
+    else:
+        total = 0
+
+    for index in range(n_first, len(rows_list)):
+        row = rows_list[index]
+        tic = tics[index]
+
+        if targets and targets[-1] > row - scans:
+            # The target is still in the window
+            if tic > total:
+                targets[-1] = row
+            total += tic
+        else:
+            group_starts.append(index)
+            targets.append(row)
+            total = tic
+
+    group_sizes = numpy.diff(numpy.append(group_starts, len(rows)))
+    destination[rows] = numpy.repeat(targets, group_sizes)
+
+    return destination
 
 
 def num_ions_threshold(pl: List, n: int, cutoff: float, copy_peaks: bool = True) -> List:
@@ -404,7 +601,7 @@ def sum_maxima(im: IntensityMatrix, points: int = 3, scans: int = 1) -> IonChrom
 
     maxima_im = get_maxima_matrix(im, points)
     sums = []
-    numrows = len(maxima_im)
+    numrows = maxima_im.shape[0]
     half = int(scans / 2)
 
     for row in range(numrows):
@@ -24,10 +24,10 @@ Classes for peak alignment by dynamic programming
 ################################################################################
 
 # stdlib
-import copy
 import math
 import operator
 import pathlib
+import pickle
 from numbers import Number
 
 # 3rd party
@@ -38,6 +38,7 @@ import pandas  # type: ignore
 from pandas import DataFrame
 
 from pyms.Peak import Peak
+from pyms.Spectrum import MassSpectrum
 
 try:
 	from Pycluster import treecluster  # type: ignore
@@ -56,10 +57,46 @@ from pyms.Utils.IO import prepare_filepath
 from pyms.Utils.Utils import is_path, is_sequence_of
 
 
+class _ExperimentPeaks:
+	"""
+	The peaks of one experiment in an alignment, together with arrays of their
+	retention times, areas and mass spectra.
+
+	Instances are shared between alignments, so must not be modified.
+
+	:param peaks: The peaks
+	:type peaks: tuple of pyms.Peak.Class.Peak
+	"""
+
+	def __init__(self, peaks):
+		self.peaks = tuple(peaks)
+		self.rt = numpy.array([peak.rt for peak in self.peaks], dtype='d')
+		self.area = numpy.array([numpy.nan if peak.area is None else peak.area for peak in self.peaks], dtype='d')
+
+		# The spectra are only stored if all peaks have spectra with the same masses
+		self.mass_list = None
+		self.spectra = None
+
+		mass_specs = [peak.mass_spectrum for peak in self.peaks]
+
+		if mass_specs and all(ms is not None for ms in mass_specs):
+			mass_list = mass_specs[0].mass_list
+			if all(ms.mass_list == mass_list for ms in mass_specs):
+				self.mass_list = mass_list
+				self.spectra = numpy.array([ms.mass_spec for ms in mass_specs], dtype='d')
+
+	def __len__(self):
+		return len(self.peaks)
+
+
 class Alignment:
 	"""
 	Models an alignment of peak lists
 
+	The aligned peaks are stored as an array of the indices of the peaks in
+	each experiment, with ``-1`` for gaps, along with arrays of the retention
+	times, areas and mass spectra of each experiment's peaks.
+
 	:param expr: The experiment to be converted into an alignment object
 	:type expr: pyms.Experiment.Experiment
 
@@ -72,8 +109,8 @@ class Alignment:
 	def __init__(self, expr):
 
 		if expr is None:
-			self.peakpos = []
-			self.peakalgt = []
+			self._peak_store = []
+			self._set_peak_index(numpy.empty((0, 0), dtype=numpy.int32))
 			self.expr_code = []
 			self.similarity = None
 		else:
@@ -83,11 +120,176 @@ class Alignment:
 			# for peak in expr.get_peak_list():
 			#    if peak.get_area() == None or peak.get_area() <= 0:
 			#        error("All peaks must have an area for alignment")
-			self.peakpos = [copy.deepcopy(expr.peak_list)]
-			self.peakalgt = numpy.transpose(self.peakpos)
+
+			# The peaks are shared with the experiment and with any alignments
+			# made from this one, rather than copied, so must not be modified.
+			self._peak_store = [_ExperimentPeaks(expr.peak_list)]
+			self._set_peak_index(numpy.arange(len(expr.peak_list), dtype=numpy.int32).reshape(-1, 1))
 			self.expr_code = [expr.expr_code]
 			self.similarity = None
 
+	def _set_peak_index(self, peak_index: numpy.ndarray):
+		"""
+		Sets the array of peak indices, with shape (positions, experiments).
+
+		Each element is the index of the aligned peak in that experiment's peak
+		list in the peak store, or ``-1`` where there is a gap.
+
+		:param peak_index:
+		:type peak_index: numpy.ndarray
+		"""
+
+		self._peak_index = peak_index
+		self._peakalgt = None
+
+	@property
+	def peakalgt(self) -> numpy.ndarray:
+		"""
+		Returns a read-only array of the aligned peaks with shape
+		(positions, experiments), with :py:obj:`None` where there is a gap.
+
+		:rtype: numpy.ndarray
+		"""
+
+		if self._peakalgt is None:
+			peakalgt = numpy.empty(self._peak_index.shape, dtype=object)
+
+			for column, peaks in enumerate(self._peak_store):
+				# The last element is used for gaps, which have an index of -1
+				lookup = numpy.empty(len(peaks) + 1, dtype=object)
+				for idx, peak in enumerate(peaks.peaks):
+					lookup[idx] = peak
+
+				peakalgt[:, column] = lookup[self._peak_index[:, column]]
+
+			peakalgt.flags.writeable = False
+			self._peakalgt = peakalgt
+
+		return self._peakalgt
+
+	@peakalgt.setter
+	def peakalgt(self, peakalgt):
+		"""
+		Sets the aligned peaks from a sequence of alignment positions,
+		each a sequence of peaks or :py:obj:`None` for each experiment.
+
+		Peaks which are not already in the peak store are added to it.
+		"""
+
+		n_expr = len(self.expr_code)
+		peak_index = numpy.full((len(peakalgt), n_expr), -1, dtype=numpy.int32)
+		peak_store = list(self._peak_store[:n_expr])
+		peak_store += [_ExperimentPeaks(())] * (n_expr - len(peak_store))
+
+		for column in range(n_expr):
+			indices = {id(peak): idx for idx, peak in enumerate(peak_store[column].peaks)}
+			new_peaks = []
+
+			for position_idx, position in enumerate(peakalgt):
+				peak = position[column]
+
+				if peak is None:
+					continue
+
+				if id(peak) not in indices:
+					indices[id(peak)] = len(peak_store[column]) + len(new_peaks)
+					new_peaks.append(peak)
+
+				peak_index[position_idx, column] = indices[id(peak)]
+
+			if new_peaks:
+				peak_store[column] = _ExperimentPeaks(peak_store[column].peaks + tuple(new_peaks))
+
+		self._peak_store = peak_store
+		self._set_peak_index(peak_index)
+
+	@property
+	def peakpos(self) -> numpy.ndarray:
+		"""
+		Returns a read-only array of the aligned peaks with shape
+		(experiments, positions), with :py:obj:`None` where there is a gap.
+
+		:rtype: numpy.ndarray
+		"""
+
+		return self.peakalgt.T
+
+	@peakpos.setter
+	def peakpos(self, peakpos):
+		"""
+		Sets the aligned peaks from a sequence of peak lists, one per experiment.
+		"""
+
+		self.peakalgt = list(zip(*peakpos))
+
+	def _position_values(self, attribute: str) -> numpy.ndarray:
+		"""
+		Returns an array with shape (positions, experiments) of the retention
+		times or areas of the aligned peaks, with ``nan`` where there is a gap.
+
+		:param attribute: Either ``'rt'`` or ``'area'``
+		:type attribute: str
+
+		:rtype: numpy.ndarray
+		"""
+
+		values = numpy.full(self._peak_index.shape, numpy.nan, dtype='d')
+
+		for column, peaks in enumerate(self._peak_store):
+			indices = self._peak_index[:, column]
+			present = indices >= 0
+			values[present, column] = getattr(peaks, attribute)[indices[present]]
+
+		return values
+
+	def _composite_peaks(self) -> List[Peak]:
+		"""
+		Returns the composite peak of each alignment position, calculated in the
+		same way as :func:`pyms.Peak.List.Function.composite_peak`.
+
+		:rtype: list of pyms.Peak.Class.Peak
+		"""
+
+		mass_list = self._peak_store[0].mass_list if self._peak_store else None
+
+		if mass_list is None or any(peaks.mass_list != mass_list for peaks in self._peak_store):
+			# The spectra can't be combined as arrays, so use the peaks.
+			return [composite_peak([peak for peak in position if peak is not None]) for position in self.peakalgt]
+
+		n_positions = len(self._peak_index)
+		rt_sums = numpy.zeros(n_positions, dtype='d')
+		spec_sums = numpy.zeros((n_positions, len(mass_list)), dtype='d')
+		counts = numpy.zeros(n_positions, dtype=int)
+
+		# The experiments are added in order, as composite_peak() adds the peaks
+		for column, peaks in enumerate(self._peak_store):
+			indices = self._peak_index[:, column]
+			present = indices >= 0
+
+			if not present.any():
+				continue
+
+			spectra = peaks.spectra[indices[present]]
+
+			# scale all intensities to [0,100]
+			max_spec = spectra.max(axis=1) / 100.0
+			scaled = numpy.zeros_like(spectra)
+			numpy.divide(spectra, max_spec[:, None], out=scaled, where=max_spec[:, None] > 0)
+
+			rt_sums[present] += peaks.rt[indices[present]]
+			spec_sums[present] += scaled
+			counts[present] += 1
+
+		composite_peaks = []
+
+		for rt_sum, spec_sum, count in zip(rt_sums, spec_sums, counts):
+			if count > 0:
+				composite_peaks.append(Peak(rt_sum / count, MassSpectrum(list(mass_list), spec_sum / count)))
+			else:
+				composite_peaks.append(None)
+
+		return composite_peaks
+
 	def __len__(self):
 		"""
 		Returns the length of the alignment, defined as the number of
@@ -116,24 +318,7 @@ class Alignment:
 
 		# TODO: minutes currently does nothing
 
-		# for all peaks found
-		peak_list = []
-
-		for peak_idx in range(len(self.peakpos[0])):
-			# get aligned peaks, ignore missing
-
-			new_peak_list = []
-			for align_idx in range(len(self.peakpos)):
-				peak = self.peakpos[align_idx][peak_idx]
-
-				if peak is not None:
-					new_peak_list.append(peak)
-
-			# create composite
-			new_peak = composite_peak(new_peak_list)
-			peak_list.append(new_peak)
-
-		return peak_list
+		return self._composite_peaks()
 
 	def common_ion(self) -> List:
 		"""
@@ -235,15 +420,8 @@ class Alignment:
 		if not isinstance(min_peaks, int):
 			raise TypeError("'min_peaks' must be an integer")
 
-		filtered_list = []
-
-		for pos in range(len(self.peakalgt)):
-			# if len(filter(None,self.peakalgt[pos])) >= min_peaks:
-			if len([x for x in self.peakalgt[pos] if x is not None]) >= min_peaks:
-				filtered_list.append(self.peakalgt[pos])
-
-		self.peakalgt = filtered_list
-		self.peakpos = numpy.transpose(self.peakalgt)
+		n_peaks = numpy.count_nonzero(self._peak_index >= 0, axis=1)
+		self._set_peak_index(self._peak_index[n_peaks >= min_peaks])
 
 	@staticmethod
 	def get_highest_mz_ion(ion_dict: Dict) -> int:
@@ -311,32 +489,14 @@ class Alignment:
 		fp1.write(",".join(header) + "\n")
 		fp2.write(",".join(header) + "\n")
 
-		# for each alignment position write alignment's peak and area
-		for peak_idx in range(len(self.peakpos[0])):  # loop through peak lists (rows)
-
-			rts = []
-			areas = []
-			new_peak_list = []
-
-			for align_idx in range(len(self.peakpos)):
-				peak = self.peakpos[align_idx][peak_idx]
+		rts = self._position_values("rt")
+		areas = self._position_values("area")
 
-				if peak is not None:
-
-					if minutes:
-						rt = peak.rt / 60.0
-					else:
-						rt = peak.rt
+		if minutes:
+			rts = rts / 60.0
 
-					rts.append(rt)
-					areas.append(peak.area)
-					new_peak_list.append(peak)
-
-				else:
-					rts.append(None)
-					areas.append(None)
-
-			compo_peak = composite_peak(new_peak_list)
+		# for each alignment position write alignment's peak and area
+		for position_rts, position_areas, compo_peak in zip(rts, areas, self._composite_peaks()):
 
 			# write to retention times file
 			fp1.write(compo_peak.UID)
@@ -346,8 +506,8 @@ class Alignment:
 			else:
 				fp1.write(f",{compo_peak.rt:.3f}")
 
-			for rt in rts:
-				if rt is None or numpy.isnan(rt):
+			for rt in position_rts:
+				if numpy.isnan(rt):
 					fp1.write(",NA")
 				else:
 					fp1.write(f",{rt:.3f}")
@@ -361,8 +521,8 @@ class Alignment:
 			else:
 				fp2.write(f",{compo_peak.rt:.3f}")
 
-			for area in areas:
-				if area is None:
+			for area in position_areas:
+				if numpy.isnan(area):
 					fp2.write(",NA")
 				else:
 					fp2.write(f",{area:.0f}")
@@ -550,6 +710,23 @@ class Alignment:
 
 				fp1.write("\n")
 
+	def store(self, file_name: Union[str, pathlib.Path]):
+		"""
+		Stores the alignment to a file, for example to add further experiments
+		to it later with :func:`pyms.DPA.PairwiseAlignment.align_to_profile`.
+
+		:param file_name: The name of the file
+		:type file_name: str or os.PathLike
+		"""
+
+		if not is_path(file_name):
+			raise TypeError("'file_name' must be a string or a PathLike object")
+
+		file_name = prepare_filepath(file_name)
+
+		with file_name.open('wb') as fp:
+			pickle.dump(self, fp, pickle.HIGHEST_PROTOCOL)
+
 	def get_peak_alignment(self, minutes: bool = True, require_all_expr: bool = True) -> DataFrame:
 		"""
 		Returns a Pandas dataframe of aligned retention times
@@ -568,31 +745,13 @@ class Alignment:
 		:author: Dominic Davis-Foster
 		"""
 
-		rt_table = []
+		rt_table = self._position_values("rt")
 
-		# for each alignment position write alignment's RT
-		for peak_idx in range(len(self.peakpos[0])):
-			rts = []
-			countrt = 0
+		if minutes:
+			rt_table = rt_table / 60.0
 
-			for align_idx in range(len(self.peakpos)):
-				peak = self.peakpos[align_idx][peak_idx]
-
-				if peak is not None:
-
-					if minutes:
-						rt = peak.get_rt() / 60.0
-					else:
-						rt = peak.get_rt()
-
-					rts.append(rt)
-					countrt = countrt + 1
-
-				else:
-					rts.append(None)
-
-			if (require_all_expr and countrt == len(self.expr_code)) or not require_all_expr:
-				rt_table.append(rts)
+		if require_all_expr:
+			rt_table = rt_table[numpy.all(self._peak_index >= 0, axis=1)]
 
 		rt_alignment = pandas.DataFrame(rt_table, columns=self.expr_code)
 		rt_alignment = rt_alignment.reindex(sorted(rt_alignment.columns), axis=1)
@@ -694,25 +853,10 @@ class Alignment:
 		:author: Dominic Davis-Foster
 		"""
 
-		areas_table = []
-
-		# for each alignment position write alignment's ms
-		for peak_idx in range(len(self.peakpos[0])):
-			areas = []
-			count_areas = 0
-
-			for align_idx in range(len(self.peakpos)):
-				peak = self.peakpos[align_idx][peak_idx]
+		areas_table = self._position_values("area")
 
-				if peak is not None:
-					area = peak.area
-					areas.append(area)
-					count_areas = count_areas + 1
-				else:
-					areas.append(None)
-
-			if (require_all_expr and count_areas == len(self.expr_code)) or not require_all_expr:
-				areas_table.append(areas)
+		if require_all_expr:
+			areas_table = areas_table[numpy.all(self._peak_index >= 0, axis=1)]
 
 		area_alignment = pandas.DataFrame(areas_table, columns=self.expr_code)
 		area_alignment = area_alignment.reindex(sorted(area_alignment.columns), axis=1)
@@ -745,3 +889,28 @@ def exprl2alignment(expr_list: List[Experiment]) -> List[Alignment]:
 		alignments.append(Alignment(item))
 
 	return alignments
+
+
+def load_alignment(file_name: Union[str, pathlib.Path]) -> Alignment:
+	"""
+	Loads an alignment saved with :meth:`pyms.DPA.Alignment.Alignment.store`
+
+	:param file_name: The name of the file
+	:type file_name: str or os.PathLike
+
+	:return: The loaded alignment
+	:rtype: pyms.DPA.Alignment.Alignment
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+
+	with file_name.open('rb') as fp:
+		alignment = pickle.load(fp)
+
+	if not isinstance(alignment, Alignment):
+		raise IOError("The loaded file is not an alignment file")
+
+	return alignment
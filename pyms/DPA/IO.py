@@ -386,7 +386,8 @@ def write_transposed_output(alignment: Alignment, file_name: Union[str, pathlib.
 				comment = Comment("Area: NA", 'dave')
 				currcell1.comment = comment
 
-		# this method will create the compo peak, and also mark outlier peaks with a bool is_outlier
+		# The composite peak of all the peaks at this position.
+		# Outliers are not left out, so only peaks already marked as outliers are highlighted below.
 		compo_peak = composite_peak(list(p[0] for p in new_peak_list))
 
 		ws1.cell(column=2 + peak_idx, row=1, value=f'"{compo_peak.UID}"')
@@ -396,7 +397,7 @@ def write_transposed_output(alignment: Alignment, file_name: Union[str, pathlib.
 
 		# highlight outlier cells in the current peak list
 		for p in new_peak_list:
-			if p[0].isoutlier:
+			if p[0].is_outlier:
 				# ws[ get_column_letter(p[1]) + str(p[2]) ].style = style_outlier
 				ws1.cell(column=p[1], row=p[2]).fill = style_outlier
 				ws2.cell(column=p[1], row=p[2]).fill = style_outlier
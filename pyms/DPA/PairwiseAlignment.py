@@ -26,10 +26,15 @@ Classes for peak alignment by dynamic programming
 # stdlib
 import copy
 import math
-import functools
+import multiprocessing
+import os
+import pathlib
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 # 3rd party
-from typing import List, Dict
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import numpy   # type: ignore
 
@@ -49,7 +54,18 @@ Please install one of them and try again.""")
 
 # this package
 from pyms.DPA.Alignment import Alignment
-from pyms.Utils.Utils import is_sequence_of
+from pyms.Experiment import Experiment
+from pyms.Utils.Utils import is_path, is_sequence_of
+
+# Peaks whose retention time similarity is below this tolerance are not compared,
+# so positions outside the band of a banded alignment are beyond the same cutoff.
+_TOL = 0.001
+
+# The banded alignment only finds the optimal alignment for gap penalties below this
+_MAX_BANDED_GAP = 0.5
+
+# Seconds to wait for a result from a worker process before checking the workers are still running
+_POLL_INTERVAL = 1.0
 
 
 class PairwiseAlignment:
@@ -62,12 +78,31 @@ class PairwiseAlignment:
 	:type D: float
 	:param gap: Gap parameter for pairwise alignments
 	:type gap: float
+	:param banded: Whether to only score and align pairs of positions within
+		the retention time cutoff of each other. See :func:`align` for details.
+	:type banded: bool, optional
+	:param workers: The number of worker processes to use for the pairwise
+		alignments. :py:obj:`None` uses one per CPU. Default ``1``, which
+		performs the alignments in this process.
+	:type workers: int, optional
+	:param progress_callback: Function called as ``progress_callback(done, total)``
+		after each pairwise alignment completes. By default the number of
+		pairs remaining is printed.
+	:type progress_callback: callable, optional
 
 	:author: Woon Wai Keen
 	:author: Vladimir Likic
 	"""
 
-	def __init__(self, alignments: List[Alignment], D: float, gap: float):
+	def __init__(
+			self,
+			alignments: List[Alignment],
+			D: float,
+			gap: float,
+			banded: bool = False,
+			workers: Optional[int] = 1,
+			progress_callback: Optional[Callable[[int, int], None]] = None,
+			):
 		"""
 		Models pairwise alignment of alignments
 		"""
@@ -81,9 +116,25 @@ class PairwiseAlignment:
 		if not isinstance(gap, float):
 			raise TypeError("'gap' must be a float")
 
+		if banded and gap >= _MAX_BANDED_GAP:
+			raise ValueError(f"'gap' must be less than {_MAX_BANDED_GAP} for banded alignment")
+
+		if workers is None:
+			workers = os.cpu_count() or 1
+		elif not isinstance(workers, int) or isinstance(workers, bool):
+			raise TypeError("'workers' must be an int or None")
+		elif workers < 1:
+			raise ValueError("'workers' must be at least 1")
+
+		if progress_callback is None:
+			progress_callback = _print_pairs_remaining
+
 		self.alignments = alignments
 		self.D = D
 		self.gap = gap
+		self.banded = banded
+		self.workers = workers
+		self.progress_callback = progress_callback
 
 		self._sim_matrix()
 		self._dist_matrix()
@@ -105,13 +156,55 @@ class PairwiseAlignment:
 
 		self.sim_matrix = numpy.zeros((n, n), dtype='f')
 
-		# Could we parallelize this pairwise alignment loop??
-		for i in range(n - 1):
-			for j in range(i + 1, n):
-				ma = align(self.alignments[i], self.alignments[j], self.D, self.gap)
-				self.sim_matrix[i, j] = self.sim_matrix[j, i] = ma.similarity
-				total_n = total_n - 1
-				print(f" -> {total_n:d} pairs remaining")
+		# Each alignment is only packed once, and only the similarity score
+		# is needed, so the merged alignment is not constructed.
+		# The packed arrays are also all that the worker processes need,
+		# so they are sent to each worker once rather than with every pair.
+		packed = [pack_alignment(alignment) for alignment in self.alignments]
+		pairs = [(i, j) for i in range(n - 1) for j in range(i + 1, n)]
+
+		workers = min(self.workers, len(pairs))
+
+		if workers > 1:
+			# multiprocessing.Pool is used, rather than concurrent.futures, as
+			# ProcessPoolExecutor only accepts an initializer from Python 3.7
+			other_children = set(multiprocessing.active_children())
+			pool = multiprocessing.Pool(
+					processes=workers,
+					initializer=_init_pair_worker,
+					initargs=(packed, self.D, self.gap, self.banded),
+					)
+			processes = set(multiprocessing.active_children()) - other_children
+
+			try:
+				chunksize = max(1, len(pairs) // (workers * 8))
+				results = _checked_results(pool.imap(_pair_worker, pairs, chunksize), len(pairs), processes)
+				self._fill_sim_matrix(pairs, results, total_n)
+			finally:
+				pool.terminate()
+				pool.join()
+		else:
+			results = (
+					_packed_similarity(packed[i], packed[j], self.D, self.gap, self.banded) for i, j in pairs
+					)
+			self._fill_sim_matrix(pairs, results, total_n)
+
+	def _fill_sim_matrix(self, pairs, similarities, total_n: int):
+		"""
+		Places the similarity of each pair of alignments in the similarity matrix,
+		reporting progress to ``progress_callback`` as each one arrives.
+
+		:param pairs: The ``(i, j)`` indices of the pairs of alignments
+		:type pairs: list
+		:param similarities: The similarity of each pair, in the same order as ``pairs``
+		:type similarities: iterable
+		:param total_n: The total number of pairs
+		:type total_n: int
+		"""
+
+		for done, ((i, j), similarity) in enumerate(zip(pairs, similarities), start=1):
+			self.sim_matrix[i, j] = self.sim_matrix[j, i] = similarity
+			self.progress_callback(done, total_n)
 
 	def _dist_matrix(self):
 		"""
@@ -144,10 +237,76 @@ class PairwiseAlignment:
 		print("Done")
 
 
-def align(a1: Alignment, a2: Alignment, D: float, gap: float) -> Alignment:
+def _print_pairs_remaining(done: int, total: int):
+	"""
+	The default progress callback for :class:`PairwiseAlignment`.
+	"""
+
+	print(f" -> {total - done:d} pairs remaining")
+
+
+def _checked_results(results, n_results: int, processes):
+	"""
+	Yields the results from :meth:`multiprocessing.pool.Pool.imap`, checking
+	the worker processes are still running while waiting for each one.
+
+	A task whose worker process is killed never completes, so rather than waiting forever
+	:exc:`concurrent.futures.process.BrokenProcessPool` is raised.
+
+	:param results: The iterator returned by :meth:`~multiprocessing.pool.Pool.imap`
+	:param n_results: The number of results
+	:type n_results: int
+	:param processes: The worker processes of the pool
+	:type processes: collections.abc.Iterable[multiprocessing.Process]
+	"""
+
+	for _ in range(n_results):
+		while True:
+			try:
+				result = results.next(_POLL_INTERVAL)
+				break
+			except multiprocessing.TimeoutError:
+				if any(process.exitcode is not None for process in processes):
+					raise BrokenProcessPool("A worker process terminated abruptly") from None
+
+		yield result
+
+
+# Per-process state for the pairwise alignment workers, set by _init_pair_worker
+_pair_worker_state: Dict = {}
+
+
+def _init_pair_worker(packed, D: float, gap: float, banded: bool):
+	"""
+	Stores the packed alignments and alignment parameters in a worker process.
+	"""
+
+	_pair_worker_state.update(packed=packed, D=D, gap=gap, banded=banded)
+
+
+def _pair_worker(pair: Tuple[int, int]) -> float:
+	"""
+	Returns the similarity of the pair of packed alignments with the given indices.
+	"""
+
+	i, j = pair
+	state = _pair_worker_state
+	packed = state["packed"]
+	return _packed_similarity(packed[i], packed[j], state["D"], state["gap"], state["banded"])
+
+
+def align(a1: Alignment, a2: Alignment, D: float, gap: float, banded: bool = False) -> Alignment:
 	"""
 	Aligns two alignments
 
+	If ``banded`` is :py:obj:`True` only pairs of positions that could contain
+	peaks within the retention time cutoff of each other are scored, and the
+	dynamic programming is restricted to that band (see :func:`banded_dp`).
+	Time and memory then grow with the number of positions times the band
+	width rather than with the product of the alignment lengths. The band is
+	narrowest when the positions are in retention time order, as they are in
+	alignments produced by :func:`merge_alignments`.
+
 	:param a1: The first alignment
 	:type a1: pyms.Peak.List.Class.Alignment
 	:param a2: The second alignment
@@ -156,6 +315,9 @@ def align(a1: Alignment, a2: Alignment, D: float, gap: float) -> Alignment:
 	:type D: float
 	:param gap: Gap penalty
 	:type gap: float
+	:param banded: Whether to use the banded alignment, which requires ``gap``
+		to be less than 0.5. Default :py:obj:`False`.
+	:type banded: bool, optional
 
 	:return: Aligned alignments
 	:rtype: pyms.Peak.List.Class.Alignment
@@ -164,12 +326,18 @@ def align(a1: Alignment, a2: Alignment, D: float, gap: float) -> Alignment:
 	:author: Vladimir Likic
 	"""
 
-	# comm = MPI.COMM_WORLD
-	# rank = comm.Get_rank()
+	if banded:
+		if gap >= _MAX_BANDED_GAP:
+			raise ValueError(f"'gap' must be less than {_MAX_BANDED_GAP} for banded alignment")
+
+		scores, first, last = banded_score_matrix(a1, a2, D)
+		result = banded_dp(scores, first, last, len(a2), gap)
+		ma = merge_alignments(a1, a2, result['trace'])
+		ma.similarity = banded_alignment_similarity(result['trace'], scores, first, last, gap)
+		return ma
 
 	# calculate score matrix for two alignments
 	M = score_matrix(a1, a2, D)
-	# print("calculated score matrix on rank", rank)
 
 	# run dynamic programming
 	result = dp(M, gap)
@@ -183,10 +351,51 @@ def align(a1: Alignment, a2: Alignment, D: float, gap: float) -> Alignment:
 	return ma
 
 
+def _packed_similarity(
+		packed1: Tuple[numpy.ndarray, numpy.ndarray],
+		packed2: Tuple[numpy.ndarray, numpy.ndarray],
+		D: float,
+		gap: float,
+		banded: bool = False,
+		) -> float:
+	"""
+	Returns the similarity score of the alignment of two packed alignments,
+	without constructing the merged alignment.
+	"""
+
+	return _packed_trace(packed1, packed2, D, gap, banded)[1]
+
+
+def _packed_trace(
+		packed1: Tuple[numpy.ndarray, numpy.ndarray],
+		packed2: Tuple[numpy.ndarray, numpy.ndarray],
+		D: float,
+		gap: float,
+		banded: bool = False,
+		) -> Tuple[List[int], float]:
+	"""
+	Returns the DP traceback and similarity score of the alignment of two
+	packed alignments.
+	"""
+
+	if banded:
+		scores, first, last = packed_banded_score_matrix(packed1, packed2, D)
+		result = banded_dp(scores, first, last, len(packed2[0]), gap)
+		return result['trace'], banded_alignment_similarity(result['trace'], scores, first, last, gap)
+
+	M = packed_score_matrix(packed1, packed2, D)
+	result = dp(M, gap)
+	return result['trace'], alignment_similarity(result['trace'], M, gap)
+
+
 def score_matrix(a1: Alignment, a2: Alignment, D: float) -> numpy.ndarray:
 	"""
 	Calculates the score matrix between two alignments
 
+	The result is the same as calling :func:`position_similarity` for every
+	pair of positions, but the whole matrix is computed with matrix
+	multiplications on the arrays returned by :func:`pack_alignment`.
+
 	:param a1: The first alignment
 	:type a1: pyms.DPA.Alignment.Alignment
 	:param a2: The second alignment
@@ -200,25 +409,252 @@ def score_matrix(a1: Alignment, a2: Alignment, D: float) -> numpy.ndarray:
 	:author: Andrew Isaac
 	"""
 
-	# sim_score = 0
+	return packed_score_matrix(pack_alignment(a1), pack_alignment(a2), D)
 
-	score_matrix = numpy.zeros((len(a1.peakalgt), len(a2.peakalgt)))
 
-	for i, algt1pos in enumerate(a1.peakalgt):
-		for j, algt2pos in enumerate(a2.peakalgt):
-			sim_score = position_similarity(algt1pos, algt2pos, D)
-			score_matrix[i][j] = sim_score
+def pack_alignment(alignment: Alignment) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Packs the retention times and mass spectra of an alignment into arrays
+		for :func:`packed_score_matrix`
+
+	:param alignment: The alignment to pack
+	:type alignment: pyms.DPA.Alignment.Alignment
+
+	:return: An array of retention times with shape (positions, experiments),
+		with ``nan`` for gaps, and an array of mass spectra normalised to unit
+		length with shape (positions, experiments, masses), with zeros for gaps.
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	peak_index = alignment._peak_index
+	n_positions, n_expr = peak_index.shape
+
+	rts = numpy.full((n_positions, n_expr), numpy.nan, dtype='d')
+	spectra = None
+
+	for expr, peaks in enumerate(alignment._peak_store):
+		indices = peak_index[:, expr]
+		present = indices >= 0
+
+		if not present.any():
+			continue
+
+		if peaks.spectra is None:
+			raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+		if spectra is None:
+			spectra = numpy.zeros((n_positions, n_expr, peaks.spectra.shape[1]), dtype='d')
+		elif peaks.spectra.shape[1] != spectra.shape[2]:
+			raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+		rts[present, expr] = peaks.rt[indices[present]]
+		spectra[present, expr] = peaks.spectra[indices[present]]
+
+	if spectra is None:
+		spectra = numpy.zeros((n_positions, n_expr, 0), dtype='d')
+
+	norms = numpy.sqrt(numpy.sum(spectra ** 2, axis=2, keepdims=True))
+	numpy.divide(spectra, norms, out=spectra, where=norms > 0)
+
+	return rts, spectra
+
+
+def packed_score_matrix(
+		packed1: Tuple[numpy.ndarray, numpy.ndarray],
+		packed2: Tuple[numpy.ndarray, numpy.ndarray],
+		D: float,
+		) -> numpy.ndarray:
+	"""
+	Calculates the score matrix between two alignments packed with
+		:func:`pack_alignment`
+
+	Each score is the mean of ``1 - cos * rtime`` over every pair of peaks
+	in the two positions, where ``cos`` is the cosine similarity of the mass
+	spectra and ``rtime`` the Gaussian retention time weighting. Pairs
+	further apart than the cutoff score 1, and positions with no pairs of
+	peaks score 1.
+
+	:param packed1: The packed first alignment
+	:type packed1: tuple of numpy.ndarray
+	:param packed2: The packed second alignment
+	:type packed2: tuple of numpy.ndarray
+	:param D: Retention time tolerance
+	:type D: float
+
+	:return: The score matrix
+	:rtype: numpy.ndarray
+	"""
+
+	rts1, spectra1 = packed1
+	rts2, spectra2 = packed2
+
+	n_positions1, n_expr1 = rts1.shape
+	n_positions2, n_expr2 = rts2.shape
+
+	if spectra1.shape[2] and spectra2.shape[2] and spectra1.shape[2] != spectra2.shape[2]:
+		raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+	cutoff = D * math.sqrt(-2.0 * math.log(_TOL))
+
+	score_matrix = numpy.ones((n_positions1, n_positions2), dtype='d')
+
+	valid1 = ~numpy.isnan(rts1)
+	valid2 = ~numpy.isnan(rts2)
+	count = numpy.outer(valid1.sum(axis=1), valid2.sum(axis=1))
+
+	if not n_positions1 or not n_positions2 or not spectra1.shape[2] or not spectra2.shape[2]:
+		return score_matrix
+
+	flat_spectra2 = spectra2.reshape(n_positions2 * n_expr2, -1).T
+	rts2 = rts2[numpy.newaxis, numpy.newaxis]
+
+	# Limit the size of the (rows, expr1, positions2, expr2) intermediates
+	rows_per_chunk = max(1, 2 ** 22 // max(1, n_expr1 * n_positions2 * n_expr2))
+
+	for start in range(0, n_positions1, rows_per_chunk):
+		stop = min(start + rows_per_chunk, n_positions1)
+		rows = stop - start
+
+		cos = numpy.dot(spectra1[start:stop].reshape(rows * n_expr1, -1), flat_spectra2)
+		cos = cos.reshape(rows, n_expr1, n_positions2, n_expr2)
+
+		delta = rts1[start:stop, :, numpy.newaxis, numpy.newaxis] - rts2
+		rtime = numpy.exp(-(delta / float(D)) ** 2 / 2.0)
+
+		with numpy.errstate(invalid="ignore"):
+			pair_scores = numpy.where(numpy.abs(delta) > cutoff, 1.0, 1.0 - (cos * rtime))
+
+		# Gaps are nan and drop out of the sum
+		total = numpy.nansum(pair_scores, axis=(1, 3))
+
+		chunk_count = count[start:stop]
+		numpy.divide(total, chunk_count, out=score_matrix[start:stop], where=chunk_count > 0)
 
 	return score_matrix
 
 
+def banded_score_matrix(a1: Alignment, a2: Alignment, D: float) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Calculates the scores between two alignments for only those pairs of
+		positions that contain peaks within the retention time cutoff of
+		each other
+
+	All other pairs of positions have a score of exactly 1.0 (the worst
+	score), as every pair of peaks they contain is outside the cutoff.
+
+	:param a1: The first alignment
+	:type a1: pyms.DPA.Alignment.Alignment
+	:param a2: The second alignment
+	:type a2: pyms.DPA.Alignment.Alignment
+	:param D: Retention time tolerance
+	:type D: float
+
+	:return: The scores, and the first and last position in ``a2`` scored
+		against each position in ``a1``. The score of position ``i`` in ``a1``
+		against position ``j`` in ``a2`` is ``scores[i, j - first[i]]``.
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	return packed_banded_score_matrix(pack_alignment(a1), pack_alignment(a2), D)
+
+
+def packed_banded_score_matrix(
+		packed1: Tuple[numpy.ndarray, numpy.ndarray],
+		packed2: Tuple[numpy.ndarray, numpy.ndarray],
+		D: float,
+		) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Calculates the banded score matrix between two alignments packed with
+		:func:`pack_alignment`
+
+	See :func:`banded_score_matrix` for details.
+
+	:param packed1: The packed first alignment
+	:type packed1: tuple of numpy.ndarray
+	:param packed2: The packed second alignment
+	:type packed2: tuple of numpy.ndarray
+	:param D: Retention time tolerance
+	:type D: float
+
+	:return: The scores, and the first and last position in the second
+		alignment scored against each position in the first alignment.
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	rts1, spectra1 = packed1
+	rts2, spectra2 = packed2
+
+	n_positions1 = len(rts1)
+
+	cutoff = D * math.sqrt(-2.0 * math.log(_TOL))
+
+	with warnings.catch_warnings():
+		# Positions with no peaks give all-nan slices
+		warnings.simplefilter("ignore", RuntimeWarning)
+		earliest1 = numpy.nanmin(rts1, axis=1) if rts1.size else numpy.full(n_positions1, numpy.nan)
+		latest1 = numpy.nanmax(rts1, axis=1) if rts1.size else numpy.full(n_positions1, numpy.nan)
+		earliest2 = numpy.nanmin(rts2, axis=1) if rts2.size else numpy.full(len(rts2), numpy.nan)
+		latest2 = numpy.nanmax(rts2, axis=1) if rts2.size else numpy.full(len(rts2), numpy.nan)
+
+	# The running maximum of the latest retention times, and the running
+	# minimum (from the end) of the earliest retention times, are sorted even
+	# if the positions are not, and bound the positions that can be in range.
+	latest2_so_far = numpy.maximum.accumulate(numpy.where(numpy.isnan(latest2), -numpy.inf, latest2))
+	earliest2_from_here = numpy.minimum.accumulate(numpy.where(numpy.isnan(earliest2), numpy.inf, earliest2)[::-1])[::-1]
+
+	first = numpy.searchsorted(latest2_so_far, earliest1 - cutoff, side="left")
+	last = numpy.searchsorted(earliest2_from_here, latest1 + cutoff, side="right") - 1
+
+	empty = numpy.isnan(earliest1) | (last < first)
+	first[empty] = 0
+	last[empty] = -1
+
+	width = max(1, int(numpy.max(last - first, initial=-1)) + 1)
+	scores = numpy.ones((n_positions1, width), dtype='d')
+
+	# Score blocks of rows against the columns any of them can reach
+	block_size = 64
+
+	for start in range(0, n_positions1, block_size):
+		stop = min(start + block_size, n_positions1)
+		block = numpy.flatnonzero(~empty[start:stop]) + start
+
+		if not len(block):
+			continue
+
+		col_start = int(first[block].min())
+		col_stop = int(last[block].max()) + 1
+
+		block_scores = packed_score_matrix(
+				(rts1[start:stop], spectra1[start:stop]),
+				(rts2[col_start:col_stop], spectra2[col_start:col_stop]),
+				D,
+				)
+
+		for i in block:
+			row_width = last[i] - first[i] + 1
+			scores[i, :row_width] = block_scores[i - start, first[i] - col_start:last[i] + 1 - col_start]
+
+	return scores, first, last
+
+
 def dp(S, gap_penalty: float) -> Dict:
 	"""
 	Solves optimal path in score matrix based on global sequence
 		alignment
 
+	The dynamic programming matrix is filled one anti-diagonal at a time.
+	Every cell on an anti-diagonal depends only on the two preceding
+	anti-diagonals, so each anti-diagonal is computed with a few vectorised
+	operations instead of one Python iteration per cell. Ties are resolved
+	in the same order as before (match, then up, then left).
+	The trace matrix (``'phi'``) is stored as a ``uint8`` array.
+
 	:param S: Score matrix
-	:type S:
+	:type S: numpy.ndarray
 	:param gap_penalty: Gap penalty
 	:type gap_penalty: float
 
@@ -227,9 +663,6 @@ def dp(S, gap_penalty: float) -> Dict:
 
 	:author: Tim Erwin
 	"""
-	# comm = MPI.COMM_WORLD
-	# rank = comm.Get_rank()
-	# print " In DP.py, I am rank", rank
 
 	try:
 		row_length = len(S[:, 0])
@@ -238,47 +671,88 @@ def dp(S, gap_penalty: float) -> Dict:
 		raise IndexError('Zero length alignment found: Samples with no peaks cannot be aligned')
 
 	col_length = len(S[0, :])
+	n_cols = col_length + 1
 
 	# D contains the score of the optimal alignment
-	D = numpy.zeros((row_length + 1, col_length + 1), dtype='d')
-	for i in range(1, row_length + 1):
-		D[i, 0] = gap_penalty * i
-	for j in range(1, col_length + 1):
-		D[0, j] = gap_penalty * j
+	D = numpy.zeros((row_length + 1, n_cols), dtype='d')
+	D[:, 0] = gap_penalty * numpy.arange(row_length + 1)
+	D[0, :] = gap_penalty * numpy.arange(n_cols)
 	D[0, 0] = 0.0
-	D[1:(row_length + 1), 1:(col_length + 1)] = S.copy()
 
 	# Directions for trace
 	# 0 - match               (move diagonal)
 	# 1 - peaks1 has no match (move up)
 	# 2 - peaks2 has no match (move left)
 	# 3 - stop
-	trace_matrix = numpy.zeros((row_length + 1, col_length + 1))
+	trace_matrix = numpy.zeros((row_length + 1, n_cols), dtype=numpy.uint8)
 	trace_matrix[:, 0] = 1
 	trace_matrix[0, :] = 2
 	trace_matrix[0, 0] = 3
 
-	for i in range(1, row_length + 1):
-		for j in range(1, col_length + 1):
-			#
-			# Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
-			#
-			#              | D[i-1,j-1] + S(i,j)
-			# D[i,j] = min | D(i-1,j] + gap
-			#              | D[i,j-1] + gap
-			#
-
-			darray = [D[i - 1, j - 1] + S[i - 1, j - 1], D[i - 1, j] + gap_penalty, D[i, j - 1] + gap_penalty]
-			D[i, j] = min(darray)
-			# Store direction in trace matrix
-			trace_matrix[i, j] = darray.index(D[i, j])
+	#
+	# Needleman-Wunsch Algorithm assuming a score function S(x,x)=0
+	#
+	#              | D[i-1,j-1] + S(i,j)
+	# D[i,j] = min | D(i-1,j] + gap
+	#              | D[i,j-1] + gap
+	#
+	# Cells (i, j) with i + j == k form the k-th anti-diagonal. The two
+	# previous anti-diagonals are kept in contiguous buffers indexed by i,
+	# so the three candidate scores for every cell of the current
+	# anti-diagonal are plain slices. In the flattened output matrices the
+	# cells of an anti-diagonal are ``col_length`` elements apart.
+
+	S = numpy.ascontiguousarray(S, dtype='d')
+	D_flat = D.reshape(-1)
+	trace_flat = trace_matrix.reshape(-1)
+	S_flat = S.reshape(-1)
+	s_step = max(col_length - 1, 1)
+
+	prev2 = numpy.empty(row_length + 1, dtype='d')
+	prev = numpy.empty(row_length + 1, dtype='d')
+	current = numpy.empty(row_length + 1, dtype='d')
+	prev2[0] = 0.0
+	prev[0:2] = gap_penalty
+	candidates = numpy.empty((3, min(row_length, col_length)), dtype='d')
+
+	for k in range(2, row_length + col_length + 1):
+		i_start = max(1, k - col_length)
+		i_stop = min(row_length, k - 1)
+		length = i_stop - i_start + 1
+
+		if length < 1:
+			continue
+
+		darray = candidates[:, :length]
+
+		s_start = (i_start - 1) * col_length + (k - i_start - 1)
+		numpy.add(prev2[i_start - 1:i_stop], S_flat[s_start:s_start + length * s_step:s_step], out=darray[0])
+		numpy.add(prev[i_start - 1:i_stop], gap_penalty, out=darray[1])
+		numpy.add(prev[i_start:i_stop + 1], gap_penalty, out=darray[2])
+
+		# argmin returns the first occurrence, matching ``list.index(min(...))``
+		direction = numpy.argmin(darray, axis=0)
+		numpy.min(darray, axis=0, out=current[i_start:i_stop + 1])
+
+		start = i_start * n_cols + (k - i_start)
+		stop = start + length * col_length
+		D_flat[start:stop:col_length] = current[i_start:i_stop + 1]
+		trace_flat[start:stop:col_length] = direction
+
+		# Cells of this anti-diagonal in the first row and column
+		if k <= col_length:
+			current[0] = D[0, k]
+		if k <= row_length:
+			current[k] = D[k, 0]
+
+		prev2, prev, current = prev, current, prev2
 
 	# Trace back from bottom right
 	trace = []
 	matches = []
 	i = row_length
 	j = col_length
-	direction = trace_matrix[i, j]
+	direction = int(trace_matrix[i, j])
 	p = [row_length - 1]
 	q = [col_length - 1]
 
@@ -295,7 +769,7 @@ def dp(S, gap_penalty: float) -> Dict:
 		p.append(i - 1)
 		q.append(j - 1)
 		trace.append(direction)
-		direction = trace_matrix[i, j]
+		direction = int(trace_matrix[i, j])
 
 	# remove 'stop' entry
 	p.pop()
@@ -309,6 +783,161 @@ def dp(S, gap_penalty: float) -> Dict:
 	return {'p': p, 'q': q, 'trace': trace, 'matches': matches, 'D': D, 'phi': trace_matrix}
 
 
+def banded_dp(scores: numpy.ndarray, first: numpy.ndarray, last: numpy.ndarray, n_cols: int, gap_penalty: float) -> Dict:
+	"""
+	Solves optimal path in a banded score matrix based on global sequence
+		alignment
+
+	Only the cells of the dynamic programming matrix within the band given
+	by ``first`` and ``last`` (widened so every cell can be reached from the
+	start) are computed, and every score outside the band is taken to be 1.0.
+	With a gap penalty below 0.5 an optimal path never matches two positions
+	with a score of 1.0, so the score of the optimal path is the same as
+	from :func:`dp` on the full score matrix. Where several paths have the
+	same score the one chosen may differ.
+
+	:param scores: Score matrix, as returned by :func:`banded_score_matrix`
+	:type scores: numpy.ndarray
+	:param first: The first column scored in each row
+	:type first: numpy.ndarray
+	:param last: The last column scored in each row
+	:type last: numpy.ndarray
+	:param n_cols: The number of columns in the full score matrix
+	:type n_cols: int
+	:param gap_penalty: Gap penalty. Must be less than 0.5
+	:type gap_penalty: float
+
+	:return: A dictionary of results. ``'D'`` and ``'phi'`` are stored by row
+		as for :func:`dp`, but starting at column ``'offsets'[row]``.
+	:rtype: dict
+	"""
+
+	if gap_penalty >= _MAX_BANDED_GAP:
+		raise ValueError(f"'gap_penalty' must be less than {_MAX_BANDED_GAP} for banded alignment")
+
+	row_length = len(first)
+
+	if not row_length or not n_cols:
+		raise IndexError('Zero length alignment found: Samples with no peaks cannot be aligned')
+
+	rows = numpy.arange(row_length + 1)
+	in_use = last >= first
+
+	# Each row of the dynamic programming matrix must contain the cells for
+	# its row of the score matrix (one column to the right), and the
+	# diagonal predecessors of the cells for the next row.
+	row_first = numpy.full(row_length + 1, n_cols, dtype=numpy.intp)
+	row_last = numpy.zeros(row_length + 1, dtype=numpy.intp)
+	row_first[1:] = numpy.where(in_use, first + 1, n_cols)
+	row_last[1:] = numpy.where(in_use, last + 1, 0)
+	row_first[:-1] = numpy.minimum(row_first[:-1], numpy.where(in_use, first, n_cols))
+	row_last[:-1] = numpy.maximum(row_last[:-1], numpy.where(in_use, last, 0))
+
+	# Widen the band into a staircase from (0, 0) to the bottom right where
+	# consecutive rows overlap, so any path of gaps can be followed within it.
+	row_first[0] = 0
+	row_last[-1] = n_cols
+	row_first = numpy.minimum.accumulate(row_first[::-1])[::-1]
+	row_last = numpy.maximum.accumulate(row_last)
+	row_last[:-1] = numpy.maximum(row_last[:-1], row_first[1:])
+	row_last = numpy.maximum(row_last, row_first)
+
+	width = int(numpy.max(row_last - row_first)) + 1
+
+	# D contains the score of the optimal alignment
+	D = numpy.full((row_length + 1, width), numpy.inf, dtype='d')
+
+	# Directions for trace, as for dp()
+	trace_matrix = numpy.full((row_length + 1, width), 3, dtype=numpy.uint8)
+
+	# The first and last row of the band on each anti-diagonal
+	diagonals = numpy.arange(row_length + n_cols + 1)
+	diag_first = numpy.searchsorted(row_last + rows, diagonals, side="left")
+	diag_last = numpy.searchsorted(row_first + rows, diagonals, side="right") - 1
+
+	# The two previous anti-diagonals, indexed by row, with infinity either
+	# side of the band
+	prev2, prev, current = (numpy.full(row_length + 2, numpy.inf, dtype='d') for _ in range(3))
+
+	for k in diagonals:
+		a = diag_first[k]
+		b = diag_last[k]
+
+		# Cells not in the first row or column
+		i_start = max(a, 1)
+		i_stop = min(b, k - 1)
+
+		if i_stop >= i_start:
+			cell_rows = rows[i_start:i_stop + 1]
+			score_rows = cell_rows - 1
+			score_cols = k - cell_rows - 1 - first[score_rows]
+			scored = (score_cols >= 0) & (score_cols <= last[score_rows] - first[score_rows])
+
+			cell_scores = numpy.ones(len(cell_rows), dtype='d')
+			cell_scores[scored] = scores[score_rows[scored], score_cols[scored]]
+
+			darray = numpy.empty((3, len(cell_rows)), dtype='d')
+			numpy.add(prev2[i_start - 1:i_stop], cell_scores, out=darray[0])
+			numpy.add(prev[i_start - 1:i_stop], gap_penalty, out=darray[1])
+			numpy.add(prev[i_start:i_stop + 1], gap_penalty, out=darray[2])
+
+			direction = numpy.argmin(darray, axis=0)
+			numpy.min(darray, axis=0, out=current[i_start:i_stop + 1])
+
+			band_cols = k - cell_rows - row_first[cell_rows]
+			D[cell_rows, band_cols] = current[i_start:i_stop + 1]
+			trace_matrix[cell_rows, band_cols] = direction
+
+		if a == 0:
+			current[0] = D[0, k] = gap_penalty * k
+			trace_matrix[0, k] = 2 if k else 3
+
+		if 1 <= k <= row_length and row_first[k] == 0:
+			current[k] = D[k, 0] = gap_penalty * k
+			trace_matrix[k, 0] = 1
+
+		if a >= 1:
+			current[a - 1] = numpy.inf
+		current[b + 1] = numpy.inf
+
+		prev2, prev, current = prev, current, prev2
+
+	# Trace back from bottom right
+	trace = []
+	matches = []
+	i = row_length
+	j = n_cols
+	direction = int(trace_matrix[i, j - row_first[i]])
+	p = [row_length - 1]
+	q = [n_cols - 1]
+
+	while direction != 3:
+
+		if direction == 0:  # Match
+			i = i - 1
+			j = j - 1
+			matches.append([i, j])
+		elif direction == 1:  # peaks1 has no match
+			i = i - 1
+		elif direction == 2:  # peaks2 has no match
+			j = j - 1
+		p.append(i - 1)
+		q.append(j - 1)
+		trace.append(direction)
+		direction = int(trace_matrix[i, j - row_first[i]])
+
+	# remove 'stop' entry
+	p.pop()
+	q.pop()
+	# reverse the trace back
+	p.reverse()
+	q.reverse()
+	trace.reverse()
+	matches.reverse()
+
+	return {'p': p, 'q': q, 'trace': trace, 'matches': matches, 'D': D, 'phi': trace_matrix, 'offsets': row_first}
+
+
 def position_similarity(pos1, pos2, D) -> float:
 	"""
 	Calculates the similarity between the two alignment positions.
@@ -333,8 +962,6 @@ def position_similarity(pos1, pos2, D) -> float:
 	count = 0
 
 	# Attempt to speed up by only calculating 'in-range' values
-	# set tolerance to 1/1000
-	_TOL = 0.001
 	cutoff = D * math.sqrt(-2.0 * math.log(_TOL))
 
 	for a in pos1:
@@ -403,53 +1030,110 @@ def merge_alignments(A1, A2, traces):
 	:author: Qiao Wang
 	"""
 
+	return _merge_alignments(A1, A2, traces)[0]
+
+
+def _merge_alignments(A1, A2, traces) -> Tuple[Alignment, numpy.ndarray]:
+	"""
+	Merges two alignments with gaps added in from DP traceback, and also returns
+	where each position of the merged alignment came from.
+
+	:return: A single alignment from A1 and A2, and an array with shape
+		(positions, 2) giving the index of the position in A1 and in A2 that
+		each position of the merged alignment was made from, or ``-1`` for a gap.
+	:rtype: tuple
+	"""
+
 	# Create object to hold new merged alignment and fill in its expr_codes
 	ma = Alignment(None)
 	ma.expr_code = A1.expr_code + A2.expr_code
 
-	# create empty lists of dimension |A1| + |A2|
-	dimension = len(A1.peakpos) + len(A2.peakpos)
-	merged = [[] for _ in range(dimension)]
-	A1 = A1.peakpos
-	A2 = A2.peakpos
-
-	idx1 = idx2 = 0
+	# The merged alignment refers to the same peaks as A1 and A2
+	ma._peak_store = A1._peak_store + A2._peak_store
 
 	# trace can either be 0, 1, or 2
 	# if it is 0, there are no gaps. otherwise, if it is 1 or 2,
 	# there is a gap in A2 or A1 respectively.
+	traces = numpy.asarray(traces, dtype=int)
+	from_a1 = traces != 2
+	from_a2 = traces != 1
+	origins = numpy.full((len(traces), 2), -1, dtype=int)
+	origins[from_a1, 0] = numpy.arange(numpy.count_nonzero(from_a1))
+	origins[from_a2, 1] = numpy.arange(numpy.count_nonzero(from_a2))
+
+	n_expr1 = len(A1.expr_code)
+	peak_index = numpy.full((len(traces), len(ma.expr_code)), -1, dtype=numpy.int32)
+	peak_index[from_a1, :n_expr1] = A1._peak_index[origins[from_a1, 0]]
+	peak_index[from_a2, n_expr1:] = A2._peak_index[origins[from_a2, 1]]
+
+	# sort according to average peak. The retention times are summed in the
+	# same order as alignment_compare(), and ties keep their order.
+	rt_sums = numpy.zeros(len(peak_index), dtype='d')
+	for expr, peaks in enumerate(ma._peak_store):
+		indices = peak_index[:, expr]
+		present = indices >= 0
+		rt_sums[present] += peaks.rt[indices[present]]
+
+	average_rts = rt_sums / numpy.count_nonzero(peak_index >= 0, axis=1)
+	order = numpy.argsort(average_rts, kind="mergesort")
+	ma._set_peak_index(peak_index[order])
+
+	return ma, origins[order]
+
+
+def merge_packed(
+		packed1: Tuple[numpy.ndarray, numpy.ndarray],
+		packed2: Tuple[numpy.ndarray, numpy.ndarray],
+		origins: numpy.ndarray,
+		) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Builds the packed form of a merged alignment from the packed forms of the
+	two alignments it was made from, without going back to the peaks.
+
+	:param packed1: The packed form of the first alignment, from :func:`pack_alignment`
+	:type packed1: tuple of numpy.ndarray
+	:param packed2: The packed form of the second alignment
+	:type packed2: tuple of numpy.ndarray
+	:param origins: The origin of each position of the merged alignment, as
+		returned by :func:`_merge_alignments`
+	:type origins: numpy.ndarray
+
+	:return: The packed form of the merged alignment
+	:rtype: tuple of numpy.ndarray
+	"""
 
-	for trace in traces:
-
-		if trace in {0, 1}:
-			for i, _ in enumerate(A1):
-				merged[i].append(A1[i][idx1])
-
-			idx1 = idx1 + 1
-
-		elif trace == 2:
-			for i, _ in enumerate(A1):
-				merged[i].append(None)
-
-		# ---
-
-		if trace in {0, 2}:
-			for j, peak in enumerate(A2):
-				merged[1 + i + j].append(peak[idx2])
-
-			idx2 = idx2 + 1
-
-		elif trace == 1:
-			for j, _ in enumerate(A2):
-				merged[1 + i + j].append(None)
-
-	ma.peakalgt = numpy.transpose(merged)
-	# sort according to average peak
-	ma.peakalgt = list(ma.peakalgt)
-	ma.peakalgt.sort(key=functools.cmp_to_key(alignment_compare))
-	ma.peakpos = numpy.transpose(ma.peakalgt)
+	rts = []
+	spectra = []
+
+	for (part_rts, part_spectra), idx in zip((packed1, packed2), origins.T):
+		gaps = idx < 0
+		idx = numpy.where(gaps, 0, idx)
+
+		if len(part_rts):
+			part_rts = part_rts[idx]
+			part_spectra = part_spectra[idx]
+		else:
+			part_rts = numpy.empty((len(idx), part_rts.shape[1]), dtype='d')
+			part_spectra = numpy.empty((len(idx), *part_spectra.shape[1:]), dtype='d')
+
+		part_rts[gaps] = numpy.nan
+		part_spectra[gaps] = 0
+		rts.append(part_rts)
+		spectra.append(part_spectra)
+
+	if spectra[0].shape[2] != spectra[1].shape[2]:
+		# Alignments without any peaks have no masses
+		if not spectra[0].shape[2] or not spectra[1].shape[2]:
+			n_masses = max(spectra[0].shape[2], spectra[1].shape[2])
+			spectra = [
+					part if part.shape[2] else numpy.zeros((*part.shape[:2], n_masses), dtype='d')
+					for part in spectra
+					]
+		else:
+			raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
 
-	return ma
+	return numpy.concatenate(rts, axis=1), numpy.concatenate(spectra, axis=1)
 
 
 def alignment_similarity(traces, score_matrix, gap):
@@ -495,6 +1179,47 @@ def alignment_similarity(traces, score_matrix, gap):
 	return similarity
 
 
+def banded_alignment_similarity(traces, scores: numpy.ndarray, first: numpy.ndarray, last: numpy.ndarray, gap: float) -> float:
+	"""
+	Calculates similarity score between two alignments from a banded score
+		matrix
+
+	See :func:`alignment_similarity` and :func:`banded_score_matrix`.
+
+	:param traces: Traceback from DP algorithm
+	:type traces:
+	:param scores: Banded score matrix of the two alignments
+	:type scores: numpy.ndarray
+	:param first: The first column scored in each row
+	:type first: numpy.ndarray
+	:param last: The last column scored in each row
+	:type last: numpy.ndarray
+	:param gap: Gap penalty
+	:type gap: float
+
+	:return: Similarity score (i.e. more similar => higher score)
+	:rtype: float
+	"""
+
+	similarity = 0.
+	idx1 = idx2 = 0
+
+	for trace in traces:
+		if trace == 0:
+			if first[idx1] <= idx2 <= last[idx1]:
+				similarity = similarity + (1. - scores[idx1, idx2 - first[idx1]])
+			idx1 = idx1 + 1
+			idx2 = idx2 + 1
+		elif trace == 1:
+			similarity = similarity - gap
+			idx1 = idx1 + 1
+		elif trace == 2:
+			similarity = similarity - gap
+			idx2 = idx2 + 1
+
+	return similarity
+
+
 def alignment_compare(x, y):
 	"""
 	A helper function for sorting peak positions in a alignment
@@ -603,6 +1328,12 @@ def align_with_tree(T: PairwiseAlignment, min_peaks: int = 1) -> Alignment:
 	"""
 	Aligns a list of alignments using the supplied guide tree
 
+	Nodes of the guide tree whose two children have already been aligned do
+	not depend on each other. If ``T.workers`` is greater than 1 they are
+	aligned concurrently in a pool of worker processes, which are sent only the
+	packed retention times and mass spectra of the two children. Only the
+	alignments still waiting to be merged into their parent node are kept.
+
 	:param T: The pairwise alignment object
 	:type T: pyms.DPA.PairwiseAlignment.PairwiseAlignment
 	:param min_peaks:
@@ -624,21 +1355,82 @@ def align_with_tree(T: PairwiseAlignment, min_peaks: int = 1) -> Alignment:
 	#   nodes are numbered {-1, ... , -(n-1)}. Note that the number of nodes
 	#   is one less than the number of items.
 
-	# extend As to length 2n to hold the n items, n-1 nodes, and 1 root
-	As = copy.deepcopy(T.alignments) + [None for _ in range(len(T.alignments))]
+	nodes = list(T.tree[:])
 
-	# align the alignments into positions -1, ... ,-(n-1)
-	total = len(T.tree)
-	index = 0
+	if not nodes:
+		final_algt = copy.copy(T.alignments[0])
+		if min_peaks > 1:
+			final_algt.filter_min_peaks(min_peaks)
+		return final_algt
+
+	# The node that each item and node is merged into. The last node is the root.
+	parents = {}
+	for index, node in enumerate(nodes):
+		parents[node.left] = parents[node.right] = index
+
+	# The alignments waiting to be merged into their parent node, and their packed forms.
+	# The input alignments are not modified, so they are not copied.
+	pending = dict(enumerate(T.alignments))
+	packed = {item: pack_alignment(alignment) for item, alignment in pending.items()}
+
+	total = len(nodes)
+
+	def merge_node(index: int, trace: List[int], similarity: float):
+		nonlocal total
+
+		node = nodes[index]
+		ma, origins = _merge_alignments(pending.pop(node.left), pending.pop(node.right), trace)
+		ma.similarity = similarity
+		pending[-(index + 1)] = ma
+
+		packed1, packed2 = packed.pop(node.left), packed.pop(node.right)
+		if -(index + 1) in parents:
+			packed[-(index + 1)] = merge_packed(packed1, packed2, origins)
 
-	for node in T.tree[:]:
-		index = index - 1
-		As[index] = align(As[node.left], As[node.right], T.D, T.gap)
 		total = total - 1
 		print(f" -> {total:d} item(s) remaining")
 
+	workers = min(T.workers, total)
+
+	if workers > 1:
+		executor = ProcessPoolExecutor(max_workers=workers)
+
+		# The node each running task is aligning.
+		# If a worker process dies the futures raise BrokenProcessPool.
+		running = {}
+
+		def submit(index: int):
+			node = nodes[index]
+			future = executor.submit(_packed_trace, packed[node.left], packed[node.right], T.D, T.gap, T.banded)
+			running[future] = index
+
+		try:
+			for index, node in enumerate(nodes):
+				if node.left >= 0 and node.right >= 0:
+					submit(index)
+
+			while total:
+				done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+				for future in done:
+					index = running.pop(future)
+					merge_node(index, *future.result())
+
+					parent = parents.get(-(index + 1))
+					if parent is not None and nodes[parent].left in pending and nodes[parent].right in pending:
+						submit(parent)
+		finally:
+			for future in running:
+				future.cancel()
+			executor.shutdown()
+
+	else:
+		# Bio.Cluster lists each node after both of its children
+		for index, node in enumerate(nodes):
+			merge_node(index, *_packed_trace(packed[node.left], packed[node.right], T.D, T.gap, T.banded))
+
 	# the final alignment is in the root. Filter min peaks and return
-	final_algt = As[index]
+	final_algt = pending[-len(nodes)]
 
 	# useful for within state alignment only
 	if min_peaks > 1:
@@ -647,6 +1439,199 @@ def align_with_tree(T: PairwiseAlignment, min_peaks: int = 1) -> Alignment:
 	return final_algt
 
 
+def align_to_profile(
+		alignment: Alignment,
+		expr_list: List[Experiment],
+		D: float,
+		gap: float,
+		banded: bool = False,
+		state_file: Optional[Union[str, pathlib.Path]] = None,
+		) -> Alignment:
+	"""
+	Adds new experiments to an existing alignment, without realigning the
+	experiments already in it.
+
+	Each new experiment is aligned against a consensus profile of the alignment,
+	with one peak per position (see :func:`pack_profile`). This approximates the
+	score used by :func:`align`, which averages the similarities of the new peak to
+	every peak at the position, by its similarity to the mean retention time and
+	mean normalised mass spectrum of the position. The mean of the similarities is
+	not the similarity to the mean, so the result can differ from realigning all
+	the experiments with :func:`align_with_tree`.
+
+	The time taken for each new experiment depends on the number of alignment
+	positions and not on the number of experiments already aligned.
+
+	The alignment is usually the final alignment from :func:`align_with_tree`,
+	or the result of a previous call to this function loaded with
+	:func:`pyms.DPA.Alignment.load_alignment`.
+
+	:param alignment: The existing alignment. It is not modified.
+	:type alignment: pyms.DPA.Alignment.Alignment
+	:param expr_list: The experiments to add
+	:type expr_list: list of pyms.Experiment.Experiment
+	:param D: Retention time tolerance
+	:type D: float
+	:param gap: Gap penalty
+	:type gap: float
+	:param banded: Whether to use the banded alignment, which requires ``gap``
+		to be less than 0.5. Default :py:obj:`False`.
+	:type banded: bool, optional
+	:param state_file: If given, the updated alignment is stored to this file
+		with :meth:`pyms.DPA.Alignment.Alignment.store`
+	:type state_file: str or os.PathLike, optional
+
+	:return: The alignment including the new experiments
+	:rtype: pyms.DPA.Alignment.Alignment
+	"""
+
+	if not isinstance(alignment, Alignment):
+		raise TypeError("'alignment' must be an Alignment object")
+
+	if not is_sequence_of(expr_list, Experiment):
+		raise TypeError("'expr_list' must be a Sequence of Experiment objects")
+
+	if not isinstance(D, float):
+		raise TypeError("'D' must be a float")
+
+	if not isinstance(gap, float):
+		raise TypeError("'gap' must be a float")
+
+	if state_file is not None and not is_path(state_file):
+		raise TypeError("'state_file' must be a string or a PathLike object")
+
+	expr_codes = set(alignment.expr_code)
+	for expr in expr_list:
+		if expr.expr_code in expr_codes:
+			raise ValueError(f"Experiment '{expr.expr_code}' is already in the alignment")
+		expr_codes.add(expr.expr_code)
+
+	print(f" Aligning {len(expr_list):d} experiment(s) to profile (D={D:.2f}, gap={gap:.2f})")
+
+	total = len(expr_list)
+
+	# The profile is kept as sums over the experiments, so that it can be
+	# updated with each new experiment rather than recalculated.
+	profile_sums = _profile_sums(alignment)
+
+	for expr in expr_list:
+		new_alignment = Alignment(expr)
+		new_sums = _profile_sums(new_alignment)
+		trace, similarity = _packed_trace(
+				_sums_to_profile(*profile_sums),
+				pack_alignment(new_alignment),
+				D,
+				gap,
+				banded,
+				)
+
+		# The profile has the same positions as the alignment, so the trace
+		# applies to the alignment itself.
+		alignment, origins = _merge_alignments(alignment, new_alignment, trace)
+		alignment.similarity = similarity
+
+		profile_sums = tuple(
+				_take_positions(old, origins[:, 0]) + _take_positions(new, origins[:, 1])
+				for old, new in zip(profile_sums, new_sums)
+				)
+
+		total = total - 1
+		print(f" -> {total:d} experiment(s) remaining")
+
+	if state_file is not None:
+		alignment.store(state_file)
+
+	return alignment
+
+
+def pack_profile(alignment: Alignment) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Packs a profile of an alignment into arrays for :func:`packed_score_matrix`.
+
+	The profile has a single experiment. The retention time of each position is
+	the mean retention time of its peaks, and the mass spectrum is the mean of
+	their normalised mass spectra.
+
+	:param alignment: The alignment to make the profile of
+	:type alignment: pyms.DPA.Alignment.Alignment
+
+	:return: An array of retention times with shape (positions, 1), and an
+		array of mass spectra normalised to unit length with shape
+		(positions, 1, masses).
+	:rtype: tuple of numpy.ndarray
+	"""
+
+	return _sums_to_profile(*_profile_sums(alignment))
+
+
+def _profile_sums(alignment: Alignment) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Returns the sums of the retention times and of the normalised mass spectra
+	of the peaks at each position of an alignment, and the number of peaks.
+	"""
+
+	peak_index = alignment._peak_index
+	n_positions = len(peak_index)
+
+	rt_sums = numpy.zeros(n_positions, dtype='d')
+	spectra = None
+
+	for expr, peaks in enumerate(alignment._peak_store):
+		indices = peak_index[:, expr]
+		present = indices >= 0
+
+		if not present.any():
+			continue
+
+		if peaks.spectra is None or (spectra is not None and peaks.spectra.shape[1] != spectra.shape[1]):
+			raise ValueError("""Mass Spectra are of different lengths.
+Use `IntensityMatrix.crop_mass()` to set same length for all Mass Spectra""")
+
+		if spectra is None:
+			spectra = numpy.zeros((n_positions, peaks.spectra.shape[1]), dtype='d')
+
+		expr_spectra = peaks.spectra[indices[present]]
+		norms = numpy.sqrt(numpy.sum(expr_spectra ** 2, axis=1, keepdims=True))
+		numpy.divide(expr_spectra, norms, out=expr_spectra, where=norms > 0)
+
+		rt_sums[present] += peaks.rt[indices[present]]
+		spectra[present] += expr_spectra
+
+	if spectra is None:
+		spectra = numpy.zeros((n_positions, 0), dtype='d')
+
+	return rt_sums, spectra, numpy.count_nonzero(peak_index >= 0, axis=1)
+
+
+def _sums_to_profile(
+		rt_sums: numpy.ndarray,
+		spectrum_sums: numpy.ndarray,
+		counts: numpy.ndarray,
+		) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Returns the packed profile from the sums calculated by :func:`_profile_sums`.
+	"""
+
+	rts = rt_sums / counts
+	norms = numpy.sqrt(numpy.sum(spectrum_sums ** 2, axis=1, keepdims=True))
+	spectra = numpy.zeros_like(spectrum_sums)
+	numpy.divide(spectrum_sums, norms, out=spectra, where=norms > 0)
+
+	return rts[:, None], spectra[:, None, :]
+
+
+def _take_positions(values: numpy.ndarray, indices: numpy.ndarray) -> numpy.ndarray:
+	"""
+	Returns the rows of ``values`` at ``indices``, with zeros where the index is ``-1``.
+	"""
+
+	taken = numpy.zeros((len(indices), *values.shape[1:]), dtype=values.dtype)
+	present = indices >= 0
+	taken[present] = values[indices[present]]
+
+	return taken
+
+
 def align_with_tree_mpi(T: Alignment, min_peaks=1) -> Alignment:
 	"""
 	Aligns a list of alignments using the supplied guide tree
@@ -679,7 +1664,7 @@ def align_with_tree_mpi(T: Alignment, min_peaks=1) -> Alignment:
 	#   is one less than the number of items.
 
 	# extend As to length 2n to hold the n items, n-1 nodes, and 1 root
-	As = copy.deepcopy(T.alignments) + [None for _ in range(len(T.alignments))]
+	As = list(T.alignments) + [None for _ in range(len(T.alignments))]
 
 	# align the alignments into positions -1, ... ,-(n-1)
 	total = len(T.tree)
@@ -30,17 +30,18 @@ from numbers import Number
 from statistics import mean, median, stdev
 
 # 3rd party
-from typing import List, Any, Union, Optional
+from typing import Iterator, List, Any, Sequence, Union, Optional
 
 import deprecation  # type: ignore
 import numpy  # type: ignore
 
 # this package
 from pyms import __version__, Spectrum
+from pyms.Axis import as_axis
 from pyms.Base import pymsBaseClass
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Mixins import GetIndexTimeMixin, MaxMinMassMixin, TimeListMixin
-from pyms.Spectrum import MassSpectrum, Scan
+from pyms.Spectrum import MassSpectrum, Scan, sort_scan
 from pyms.Utils.IO import prepare_filepath
 from pyms.Utils.Time import time_str_secs
 from pyms.Utils.Utils import is_path, is_sequence_of
@@ -48,11 +49,83 @@ from pyms.Utils.Utils import is_path, is_sequence_of
 MassSpectrum = MassSpectrum  # For legacy imports. Stops PyCharm complaining TODO: Remove eventually
 
 
+class _ScanList(Sequence):
+	"""
+	A read-only sequence of the scans in a :class:`~pyms.GCMS.Class.GCMS_data` object.
+
+	The scans are created when they are accessed, as views on the flat mass and
+	intensity arrays, or by reading them from the file if the data has not been loaded.
+
+	:param mass_values: The mass values of all scans, one after the other
+	:type mass_values: numpy.ndarray
+	:param intensity_values: The intensity values of all scans, one after the other
+	:type intensity_values: numpy.ndarray
+	:param scan_offsets: The index of the first point of each scan in ``mass_values``
+		and ``intensity_values``, followed by the index after the last point
+	:type scan_offsets: numpy.ndarray
+	:param ascending: Whether the masses of each scan are known to be in ascending order.
+		If not each scan is sorted when it is accessed.
+	:type ascending: bool, optional
+	"""
+
+	def __init__(
+			self,
+			mass_values: numpy.ndarray,
+			intensity_values: numpy.ndarray,
+			scan_offsets: numpy.ndarray,
+			ascending: bool = True,
+			):
+		self._mass_values = mass_values
+		self._intensity_values = intensity_values
+		self._scan_offsets = scan_offsets
+		self._ascending = ascending
+
+	def __len__(self) -> int:
+		return len(self._scan_offsets) - 1
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("scan index out of range")
+
+		return self.__scan(self._scan_offsets[index], self._scan_offsets[index + 1])
+
+	def __iter__(self) -> Iterator[Scan]:
+		for start, end in zip(self._scan_offsets[:-1].tolist(), self._scan_offsets[1:].tolist()):
+			yield self.__scan(start, end)
+
+	def __scan(self, start: int, end: int) -> Scan:
+		mass_array = numpy.asarray(self._mass_values[start:end], dtype=float)
+		intensity_array = numpy.asarray(self._intensity_values[start:end], dtype=float)
+
+		if not self._ascending:
+			mass_array, intensity_array = sort_scan(mass_array, intensity_array)
+
+		return Scan._view(mass_array, intensity_array)
+
+
 class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin):
 	"""
 	Generic object for GC-MS data. Contains raw data
 		as a list of scans and times
 
+	The mass and intensity values of all scans are stored in two flat arrays,
+	in the same layout as an ANDI-MS file, with an index giving where each scan
+	starts. Use :meth:`~pyms.GCMS.Class.GCMS_data.from_arrays` to create the
+	object from data already in that layout without building
+	:class:`~pyms.Spectrum.Scan` objects.
+
+	The data can also be loaded lazily from a file, in which case only the
+	retention times and number of points in each scan are read up front. Scans
+	accessed with :meth:`~pyms.GCMS.Class.GCMS_data.get_scan` are read on
+	demand, and the remaining data is read when it is first needed.
+	:meth:`~pyms.GCMS.Class.GCMS_data.trim` can be used before then so only
+	the scans in the time window of interest are read.
+
 	:param time_list: List of scan retention times
 	:type time_list: list
 	:param scan_list: List of Scan objects
@@ -75,12 +148,167 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		if not is_sequence_of(scan_list, Scan):
 			raise TypeError("'scan_list' must be a Sequence of Scan objects")
 
-		self._time_list = time_list
-		self._scan_list = scan_list
+		mass_values = numpy.concatenate([numpy.asarray(scan._mass_list, dtype=float) for scan in scan_list] or [[]])
+		intensity_values = numpy.concatenate([numpy.asarray(scan._intensity_list, dtype=float) for scan in scan_list] or [[]])
+
+		self.__set_data(time_list, mass_values, intensity_values, [len(scan) for scan in scan_list])
+
+	@classmethod
+	def from_arrays(
+			cls,
+			time_list: Sequence[float],
+			mass_values: Union[Sequence[float], numpy.ndarray],
+			intensity_values: Union[Sequence[float], numpy.ndarray],
+			point_counts: Union[Sequence[int], numpy.ndarray],
+			lazy: bool = False,
+			source: Optional[Any] = None,
+			) -> "GCMS_data":
+		"""
+		Create a GCMS_data object from flat arrays of mass and intensity values
+
+		:param time_list: List of scan retention times
+		:type time_list: list
+		:param mass_values: The mass values of all scans, one scan after the other.
+			Scans that are not in ascending order of mass are reversed or sorted,
+			as for :func:`~pyms.Spectrum.sort_scan`.
+		:type mass_values: ~collections.abc.Sequence or numpy.ndarray
+		:param intensity_values: The intensity values of all scans, in the
+			same order as ``mass_values``
+		:type intensity_values: ~collections.abc.Sequence or numpy.ndarray
+		:param point_counts: The number of points in each scan
+		:type point_counts: ~collections.abc.Sequence or numpy.ndarray
+		:param lazy: If :py:obj:`True`, ``mass_values`` and ``intensity_values``
+			are only read from when the data is needed. They can be any objects
+			that support ``len()`` and slicing, such as :class:`netCDF4.Variable`
+			objects. Default :py:obj:`False`
+		:type lazy: bool, optional
+		:param source: An object with a ``close()`` method, such as a :class:`netCDF4.Dataset`,
+			that ``mass_values`` and ``intensity_values`` are read from. It is closed
+			once the data has been loaded.
+		:type source: any, optional
+
+		:rtype: pyms.GCMS.Class.GCMS_data
+		"""
+
+		if not is_sequence_of(time_list, Number):
+			raise TypeError("'time_list' must be a Sequence of numbers")
+
+		if not lazy:
+			mass_values = numpy.asarray(mass_values, dtype=float)
+			intensity_values = numpy.asarray(intensity_values, dtype=float)
+
+		data = cls.__new__(cls)
+		data.__set_data(time_list, mass_values, intensity_values, point_counts, lazy, source)
+
+		return data
+
+	def __set_data(self, time_list, mass_values, intensity_values, point_counts, lazy: bool = False, source=None):
+		"""
+		Sets the flat data arrays and the scan offset index, and the properties
+		derived from them
+
+		:author: Dominic Davis-Foster
+		"""
+
+		point_counts = numpy.asarray(point_counts, dtype=numpy.int64)
+
+		if len(mass_values) != len(intensity_values):
+			raise ValueError("The lengths of the mass and intensity lists differ!")
+
+		if len(point_counts) != len(time_list):
+			raise ValueError("number of time points does not equal the number of scans")
+
+		scan_offsets = numpy.zeros(len(point_counts) + 1, dtype=numpy.int64)
+		numpy.cumsum(point_counts, out=scan_offsets[1:])
+
+		if scan_offsets[-1] != len(mass_values):
+			raise ValueError("The number of points in the scans does not equal the number of mass values")
+
+		self._time_list = as_axis(time_list)
+		self._mass_values = mass_values
+		self._intensity_values = intensity_values
+		self._scan_offsets = scan_offsets
+		self._loaded = False
+		self._source = source
 		self.__set_time()
+
+		if not lazy:
+			self.load()
+
+	def load(self):
+		"""
+		Reads the mass and intensity values of the scans, if the data was
+		loaded lazily and they have not yet been read.
+
+		The file the values are read from is then closed.
+		"""
+
+		if self._loaded:
+			return
+
+		first_point = self._scan_offsets[0]
+		last_point = self._scan_offsets[-1]
+
+		try:
+			mass_values = numpy.asarray(self._mass_values[first_point:last_point], dtype=float)
+			intensity_values = numpy.asarray(self._intensity_values[first_point:last_point], dtype=float)
+		finally:
+			if self._source is not None:
+				self._source.close()
+				self._source = None
+		scan_offsets = self._scan_offsets - first_point
+
+		# Scans are stored in ascending order of mass
+		mass_values, intensity_values = self.__sort_scans(mass_values, intensity_values, scan_offsets)
+
+		# The scans are views on these arrays, so they must not be changed
+		mass_values.flags.writeable = False
+		intensity_values.flags.writeable = False
+
+		self._mass_values = mass_values
+		self._intensity_values = intensity_values
+		self._scan_offsets = scan_offsets
+		self._loaded = True
 		self.__set_min_max_mass()
 		self.__calc_tic()
 
+	@staticmethod
+	def __sort_scans(mass_values: numpy.ndarray, intensity_values: numpy.ndarray, scan_offsets: numpy.ndarray):
+		"""
+		Returns the mass and intensity values with each scan in ascending order of mass
+
+		:author: Dominic Davis-Foster
+		"""
+
+		# Decreasing masses, not counting the boundaries between scans
+		decreasing = numpy.diff(mass_values) < 0
+		boundaries = scan_offsets[1:-1]
+		boundaries = boundaries[(boundaries > 0) & (boundaries < len(mass_values))]
+		decreasing[boundaries - 1] = False
+
+		if not decreasing.any():
+			return mass_values, intensity_values
+
+		mass_values = mass_values.copy()
+		intensity_values = intensity_values.copy()
+
+		unsorted_scans = numpy.unique(numpy.searchsorted(scan_offsets, numpy.flatnonzero(decreasing), side="right") - 1)
+
+		for scan in unsorted_scans.tolist():
+			points = slice(scan_offsets[scan], scan_offsets[scan + 1])
+			mass_values[points], intensity_values[points] = sort_scan(mass_values[points], intensity_values[points])
+
+		return mass_values, intensity_values
+
+	@property
+	def _scan_list(self) -> _ScanList:
+		return _ScanList(self._mass_values, self._intensity_values, self._scan_offsets, ascending=self._loaded)
+
+	def __getstate__(self):
+		# The file the data is read from cannot be pickled.
+		self.load()
+		return self.__dict__
+
 	def __eq__(self, other: Any) -> bool:
 		"""
 		Return whether this GCMS_data object is equal to another object
@@ -92,8 +320,12 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		"""
 
 		if isinstance(other, self.__class__):
-			return self.scan_list == other.scan_list \
-					and self.time_list == other.time_list
+			self.load()
+			other.load()
+			return numpy.array_equal(self._scan_offsets, other._scan_offsets) \
+					and numpy.array_equal(self._mass_values, other._mass_values) \
+					and numpy.array_equal(self._intensity_values, other._intensity_values) \
+					and self._time_list == other._time_list
 
 		return NotImplemented
 
@@ -107,7 +339,7 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		return len(self._scan_list)
+		return len(self._scan_offsets) - 1
 
 	def __repr__(self):
 		return f"GCMS_data(rt range {self.min_rt} - {self.max_rt}, time_step {self.time_step}, length {len(self)})"
@@ -127,12 +359,15 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		intensities = []
-		for scan in self._scan_list:
-			intensities.append(sum(scan.intensity_list))
-		ia = numpy.array(intensities)
-		rt = copy.deepcopy(self._time_list)
-		tic = IonChromatogram(ia, rt)
+		ia = numpy.zeros(len(self), dtype=float)
+
+		# numpy.add.reduceat gives the value at the index for empty scans,
+		# so only the scans with data are summed.
+		not_empty = numpy.diff(self._scan_offsets) > 0
+		if not_empty.any():
+			ia[not_empty] = numpy.add.reduceat(self._intensity_values, self._scan_offsets[:-1][not_empty])
+
+		tic = IonChromatogram(ia, self._time_list)
 
 		self._tic = tic
 
@@ -146,11 +381,9 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		# calculate the time step, its spread, and along the way
 		# check that retention times are increasing
 		time_diff_list = []
+		time_list = self._time_list.tolist()
 
-		for index, t1 in enumerate(self._time_list):
-			if index == len(self._time_list) - 1:
-				break
-			t2 = self._time_list[index + 1]
+		for t1, t2 in zip(time_list, time_list[1:]):
 			if not t2 > t1:
 				raise ValueError("Retention times are not in ascending order!")
 			time_diff = t2 - t1
@@ -161,8 +394,8 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		self._time_step = time_step
 		self._time_step_std = time_step_std
-		self._min_rt = min(self._time_list)
-		self._max_rt = max(self._time_list)
+		self._min_rt = self._time_list.min
+		self._max_rt = self._time_list.max
 
 	def __set_min_max_mass(self):
 		"""
@@ -173,22 +406,12 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		mini = self._scan_list[0].min_mass
-		maxi = self._scan_list[0].max_mass
-		for scan in self._scan_list:
-
-			tmp_mini = scan.min_mass
-			if tmp_mini is not None:
-				if tmp_mini < mini:
-					mini = tmp_mini
-
-			tmp_maxi = scan.max_mass
-			if tmp_maxi is not None:
-				if tmp_maxi > maxi:
-					maxi = tmp_maxi
-
-		self._min_mass = mini
-		self._max_mass = maxi
+		if len(self._mass_values):
+			self._min_mass = float(self._mass_values.min())
+			self._max_mass = float(self._mass_values.max())
+		else:
+			self._min_mass = None
+			self._max_mass = None
 
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
 							current_version=__version__,
@@ -230,20 +453,19 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
+		self.load()
+
 		# print the summary of simply attributes
 		print(f" Data retention time range: {self._min_rt / 60.0:.3f} min -- {self._max_rt / 60:.3f} min")
 		print(f" Time step: {self._time_step:.3f} s (std={self._time_step_std:.3f} s)")
-		print(f" Number of scans: {len(self._scan_list):d}")
+		print(f" Number of scans: {len(self):d}")
 		print(f" Minimum m/z measured: {self._min_mass:.3f}")
 		print(f" Maximum m/z measured: {self._max_mass:.3f}")
 
 		# calculate median number of m/z values measured per scan
-		n_list = []
-		for ii in range(len(self._scan_list)):
-			scan = self._scan_list[ii]
-			n = len(scan)
-			n_list.append(n)
-			if print_scan_n:
+		n_list = numpy.diff(self._scan_offsets).tolist()
+		if print_scan_n:
+			for n in n_list:
 				print(n)
 		mz_mean = mean(n_list)
 		mz_median = median(n_list)
@@ -262,7 +484,39 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Vladimir Likic
 		"""
 
-		return copy.deepcopy(self._scan_list)
+		self.load()
+		return [copy.copy(scan) for scan in self._scan_list]
+
+	def get_scan(self, index: int) -> Scan:
+		"""
+		Returns the scan at the given index, without copying the data
+
+		The ``mass_list`` and ``intensity_list`` of the returned scan are
+		read-only numpy arrays sharing memory with this object. If the data
+		has not been loaded only this scan is read from the file.
+
+		:param index: The index of the scan
+		:type index: int
+
+		:rtype: pyms.Spectrum.Scan
+		"""
+
+		if not isinstance(index, int):
+			raise TypeError("'index' must be an integer")
+
+		return self._scan_list[index]
+
+	def iter_scans(self) -> Iterator[Scan]:
+		"""
+		Iterate over the scans, without copying the data
+
+		See :meth:`~pyms.GCMS.Class.GCMS_data.get_scan`.
+
+		:rtype: ~typing.Iterator[pyms.Spectrum.Scan]
+		"""
+
+		self.load()
+		return iter(self._scan_list)
 
 	@property
 	def time_list(self) -> List[float]:
@@ -272,7 +526,7 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:rtype: list of float
 		"""
 
-		return self._time_list[:]
+		return self._time_list.tolist()
 
 	@property
 	def tic(self) -> IonChromatogram:
@@ -284,8 +538,31 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		:author: Andrew Isaac
 		"""
 
+		self.load()
 		return self._tic
 
+	@property
+	def min_mass(self) -> Optional[float]:
+		"""
+		Returns the minimum m/z value in the data
+
+		:rtype: float
+		"""
+
+		self.load()
+		return self._min_mass
+
+	@property
+	def max_mass(self) -> Optional[float]:
+		"""
+		Returns the maximum m/z value in the data
+
+		:rtype: float
+		"""
+
+		self.load()
+		return self._max_mass
+
 	@property
 	def min_rt(self):
 		"""
@@ -340,6 +617,9 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		At least one of ``begin`` and ``end`` is required
 
+		If the data has not yet been loaded the scans outside the new time
+		range are never read.
+
 		:param begin: begin parameter designating start time or scan number
 		:type begin: int or str, optional
 		:param end: end parameter designating start time or scan number
@@ -352,7 +632,7 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		if begin is None and end is None:
 			raise SyntaxError("At least one of 'begin' and 'end' is required")
 
-		N = len(self._scan_list)
+		N = len(self)
 
 		# process 'begin' and 'end'
 		if begin is None:
@@ -385,21 +665,23 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		print(f"Trimming data to between {first_scan + 1:d} and {last_scan + 1:d} scans")
 
-		scan_list_new = []
-		time_list_new = []
-		for ii in range(len(self._scan_list)):
-			if first_scan <= ii <= last_scan:
-				scan = self._scan_list[ii]
-				time = self._time_list[ii]
-				scan_list_new.append(scan)
-				time_list_new.append(time)
+		if not self._loaded:
+			# Only the scans in the new range will be read when the data is loaded
+			self._time_list = self._time_list[first_scan:last_scan + 1]
+			self._scan_offsets = self._scan_offsets[first_scan:last_scan + 2]
+			self.__set_time()
+			return
+
+		first_point = self._scan_offsets[first_scan]
+		last_point = self._scan_offsets[last_scan + 1]
 
 		# update info
-		self._scan_list = scan_list_new
-		self._time_list = time_list_new
-		self.__set_time()
-		self.__set_min_max_mass()
-		self.__calc_tic()
+		self.__set_data(
+				self._time_list[first_scan:last_scan + 1],
+				self._mass_values[first_point:last_point].copy(),
+				self._intensity_values[first_point:last_point].copy(),
+				numpy.diff(self._scan_offsets[first_scan:last_scan + 2]),
+				)
 
 	def write(self, file_root: Union[str, pathlib.Path]):
 		"""
@@ -426,6 +708,8 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 		file_name1 = str(file_root) + ".I.csv"
 		file_name2 = str(file_root) + ".mz.csv"
 
+		self.load()
+
 		print(f" -> Writing intensities to '{file_name1}'")
 		print(f" -> Writing m/z values to '{file_name2}'")
 
@@ -471,6 +755,8 @@ class GCMS_data(pymsBaseClass, TimeListMixin, MaxMinMassMixin, GetIndexTimeMixin
 
 		# n = len(self._scan_list)
 
+		self.load()
+
 		print(" -> Writing scans to a file")
 
 		fp = file_name.open("w")
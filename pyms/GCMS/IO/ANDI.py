@@ -40,7 +40,6 @@ except ModuleNotFoundError:
 
 # this package
 from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
 
 
 # netCDF dimension names
@@ -54,12 +53,20 @@ __TIME_STRING = "scan_acquisition_time"
 __POINT_COUNT = "point_count"
 
 
-def ANDI_reader(file_name: Union[str, pathlib.Path]) -> GCMS_data:
+def ANDI_reader(file_name: Union[str, pathlib.Path], lazy: bool = False) -> GCMS_data:
 	"""
 	A reader for ANDI-MS NetCDF files
 
+	The file is opened read-only.
+
 	:param file_name: The path of the ANDI-MS file
 	:type file_name: str or os.PathLike
+	:param lazy: If :py:obj:`True` only the retention times and the number of
+		points in each scan are read when the file is opened. The mass and
+		intensity values are read when they are needed, and after
+		:meth:`GCMS_data.trim() <pyms.GCMS.Class.GCMS_data.trim>` only those in the
+		remaining time range are read. Default :py:obj:`False`
+	:type lazy: bool, optional
 
 	:return: GC-MS data object
 	:rtype: :class:`pyms.GCMS.Class.GCMS_data`
@@ -73,42 +80,35 @@ def ANDI_reader(file_name: Union[str, pathlib.Path]) -> GCMS_data:
 	if not isinstance(file_name, (str, pathlib.Path)):
 		raise TypeError("'file_name' must be a string or a pathlib.Path object")
 
-	rootgrp = Dataset(file_name, "r+", format='NETCDF3_CLASSIC')
+	rootgrp = Dataset(file_name, "r", format='NETCDF3_CLASSIC')
 	# TODO: find out if netCDF4 throws specific errors that we can use here
 
 	print(f" -> Reading netCDF file '{file_name}'")
 
-	scan_list = []
-	mass = rootgrp.variables[__MASS_STRING][:]
-	intensity = rootgrp.variables[__INTENSITY_STRING][:]
-
-	scan_lengths = rootgrp.variables["point_count"]  # The number of data points in each scan
-
-	mass_values = mass.tolist()
-	intensity_values = intensity.tolist()
+	mass_values = rootgrp.variables[__MASS_STRING]
+	intensity_values = rootgrp.variables[__INTENSITY_STRING]
 
 	if len(mass_values) != len(intensity_values):
 		raise ValueError("The lengths of the mass and intensity lists differ!")
 
-	offset = 0
-	for idx, length in enumerate(scan_lengths):
-		mass_list = mass_values[offset:offset + length]
-		assert len(mass_values[offset:offset + length]) == length
-		intensity_list = intensity_values[offset:offset + length]
-		assert len(intensity_values[offset:offset + length]) == length
-		scan_list.append(Scan(mass_list, intensity_list))
-		offset += length
-
-	assert offset == len(mass_values)
+	scan_lengths = rootgrp.variables[__POINT_COUNT][:]  # The number of data points in each scan
 
 	time = rootgrp.variables[__TIME_STRING][:]
 	time_list = time.tolist()
 
 	# sanity check
-	if not len(time_list) == len(scan_list):
+	if not len(time_list) == len(scan_lengths):
 		raise ValueError("number of time points does not equal the number of scans")
 
-	return GCMS_data(time_list, scan_list)
+	# The data is kept in the same layout as in the file, rather than being
+	# split into Scan objects.
+	# The file is closed once the data has been loaded
+	data = GCMS_data.from_arrays(time_list, mass_values, intensity_values, scan_lengths, lazy=True, source=rootgrp)
+
+	if not lazy:
+		data.load()
+
+	return data
 
 
 def ANDI_writer(file_name: str, im: IntensityMatrix):
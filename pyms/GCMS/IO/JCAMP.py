@@ -29,16 +29,16 @@ Functions for I/O of data in JCAMP-DX format
 
 # stdlib
 import os
-import pathlib
+from typing import Dict, Iterator, Optional, Tuple, Union
 
-# this package
-from typing import Union
+# 3rd party
+import numpy  # type: ignore
 
+# this package
 from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
+from pyms.Spectrum import Scan, sort_scan
 from pyms.Utils.IO import prepare_filepath
-from pyms.Utils.jcamp import header_info_fields, xydata_tags
-from pyms.Utils.Math import is_float
+from pyms.Utils.jcamp import iter_jcamp_pages
 from pyms.Utils.Utils import is_path
 
 
@@ -61,109 +61,77 @@ def JCAMP_reader(file_name: Union[str, os.PathLike]) -> GCMS_data:
 	file_name = prepare_filepath(file_name, mkdirs=False)
 
 	print(f" -> Reading JCAMP file '{file_name}'")
-	lines_list = file_name.open('r')
-	data = []
-	page_idx = 0
-	xydata_idx = 0
+
 	time_list = []
-	scan_list = []
-
-	header_info = {}  # Dictionary containing header information
-
-	for line in lines_list:
-
-		if len(line.strip()) != 0:
-			# prefix = line.find('#')
-			# if prefix == 0:
-			if line.startswith("##"):
-				# key word or information
-				fields = line.split('=', 1)
-				fields[0] = fields[0].lstrip("##").upper()
-				fields[1] = fields[1].strip()
-
-				if "PAGE" in fields[0]:
-					if "T=" in fields[1]:
-						# PAGE contains retention time starting with T=
-						# FileConverter Pro style
-						time = float(fields[1].lstrip("T="))  # rt for the scan to be submitted
-						time_list.append(time)
-					page_idx = page_idx + 1
-				elif "RETENTION_TIME" in fields[0]:
-					# OpenChrom style
-					time = float(fields[1])  # rt for the scan to be submitted
-
-					# Check to make sure time is not already in the time list;
-					# Can happen when both ##PAGE and ##RETENTION_TIME are specified
-					if time_list[-1] != time:
-						time_list.append(time)
-
-				elif fields[0] in xydata_tags:
-					xydata_idx = xydata_idx + 1
-
-				elif fields[0] in header_info_fields:
-					if fields[1].isdigit():
-						header_info[fields[0]] = int(fields[1])
-					elif is_float(fields[1]):
-						header_info[fields[0]] = float(fields[1])
-					else:
-						header_info[fields[0]] = fields[1]
-
-			# elif prefix == -1:
-			else:
-				# Line doesn't start with ##
-				# data
-				if page_idx > 1 or xydata_idx > 1:
-					if len(data) % 2 == 1:
-						# TODO: This means the data is not in x, y pairs
-						#  Make a better error message
-						raise ValueError("data not in pair !")
-					mass_list = []
-					intensity_list = []
-					for i in range(len(data) // 2):
-						mass_list.append(data[i * 2])
-						intensity_list.append(data[i * 2 + 1])
-					if len(mass_list) != len(intensity_list):
-						raise ValueError("len(mass_list) is not equal to len(intensity_list)")
-					scan_list.append(Scan(mass_list, intensity_list))
-					data = []
-					data_sub = line.strip().split(',')
-					for item in data_sub:
-						if not len(item.strip()) == 0:
-							data.append(float(item.strip()))
-					if page_idx > 1:
-						page_idx = 1
-					if xydata_idx > 1:
-						xydata_idx = 1
-				else:
-					data_sub = line.strip().split(',')
-					for item in data_sub:
-						if not len(item.strip()) == 0:
-							data.append(float(item.strip()))
-
-	if len(data) % 2 == 1:
-		# TODO: This means the data is not in x, y pairs
-		#  Make a better error message
-		raise ValueError("data not in pair !")
-
-	# get last scan
-	mass = []
-	intensity = []
-	for i in range(len(data) // 2):
-		mass.append(data[i * 2])
-		intensity.append(data[i * 2 + 1])
-
-	if len(mass) != len(intensity):
-		raise ValueError("len(mass) is not equal to len(intensity)")
-	scan_list.append(Scan(mass, intensity))
-
-	# sanity check
-	time_len = len(time_list)
-	scan_len = len(scan_list)
-	if time_len != scan_len:
-		print(time_list)
-		print(scan_list)
-		raise ValueError(f"Number of time points ({time_len}) does not equal the number of scans ({scan_len})")
-
-	data = GCMS_data(time_list, scan_list)
-
-	return data
+	mass_arrays = []
+	intensity_arrays = []
+
+	for time, mass_array, intensity_array in _iter_pages(file_name):
+		time_list.append(time)
+		mass_arrays.append(mass_array)
+		intensity_arrays.append(intensity_array)
+
+	return GCMS_data.from_arrays(
+			time_list,
+			numpy.concatenate(mass_arrays or [[]]),
+			numpy.concatenate(intensity_arrays or [[]]),
+			[len(mass_array) for mass_array in mass_arrays],
+			)
+
+
+def iter_JCAMP_scans(file_name: Union[str, os.PathLike]) -> Iterator[Tuple[float, Scan]]:
+	"""
+	Iterate over the scans in a JCAMP DX file as it is read, without reading
+	the whole file into memory
+
+	The ``mass_list`` and ``intensity_list`` of each scan are numpy arrays.
+
+	:param file_name: Path of the file to read
+	:type file_name: str or os.PathLike
+
+	:return: An iterator over tuples of retention time and scan
+	:rtype: ~typing.Iterator[tuple[float, pyms.Spectrum.Scan]]
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+
+	for time, mass_array, intensity_array in _iter_pages(file_name):
+		yield time, Scan._view(mass_array, intensity_array)
+
+
+def _iter_pages(file_name: os.PathLike) -> Iterator[Tuple[float, numpy.ndarray, numpy.ndarray]]:
+	"""
+	Iterate over the pages of a JCAMP DX file
+
+	:return: An iterator over tuples of retention time, and the masses
+		(in ascending order) and intensities of the page
+	"""
+
+	for page_number, (labels, mass_array, intensity_array) in enumerate(iter_jcamp_pages(file_name), start=1):
+		time = _page_time(labels)
+		if time is None:
+			raise ValueError(f"No retention time found for page {page_number}")
+
+		# Scans are stored in ascending order of mass
+		mass_array, intensity_array = sort_scan(mass_array, intensity_array)
+
+		yield time, mass_array, intensity_array
+
+
+def _page_time(labels: Dict[str, str]) -> Optional[float]:
+	"""
+	Returns the retention time of a page from its labels, or :py:obj:`None` if it has none
+	"""
+
+	if "T=" in labels.get("PAGE", ''):
+		# PAGE contains retention time starting with T=
+		# FileConverter Pro style
+		return float(labels["PAGE"].partition("T=")[2])
+	elif "RETENTION_TIME" in labels:
+		# OpenChrom style
+		return float(labels["RETENTION_TIME"])
+
+	return None
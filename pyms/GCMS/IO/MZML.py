@@ -24,30 +24,74 @@ Functions for reading mzML format data files
 ################################################################################
 
 # stdlib
+import base64
+import gzip
 import pathlib
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
 
 # 3rd party
-from typing import Union
-
-import pymzml  # type: ignore
-
-try:
-	from mpi4py import MPI  # type: ignore
-except ModuleNotFoundError:
-	pass
+import numpy  # type: ignore
 
 # this package
 from pyms.GCMS.Class import GCMS_data
-from pyms.Spectrum import Scan
-from pyms.Base import is_path
+from pyms.Spectrum import Scan, sort_scan
+from pyms.Utils.Time import time_str_secs
+from pyms.Utils.Utils import is_path
+
+
+# controlled vocabulary accessions
+__MS_LEVEL = "MS:1000511"
+__SCAN_START_TIME = "MS:1000016"
+__MZ_ARRAY = "MS:1000514"
+__INTENSITY_ARRAY = "MS:1000515"
+__ZLIB_COMPRESSION = "MS:1000574"
+__NO_COMPRESSION = "MS:1000576"
+__SECOND = "UO:0000010"
 
+# MS-Numpress compressions, mapped to whether the data is also zlib compressed
+__NUMPRESS_LINEAR = {"MS:1002312": False, "MS:1002746": True}
+__NUMPRESS_PIC = {"MS:1002313": False, "MS:1002747": True}
+__NUMPRESS_SLOF = {"MS:1002314": False, "MS:1002748": True}
 
-def mzML_reader(file_name: Union[str, pathlib.Path]) -> GCMS_data:
+# The first bytes of a gzip file
+__GZIP_MAGIC = b"\x1f\x8b"
+
+# the numpy data types of the binary data arrays
+__DATA_TYPES = {
+		"MS:1000519": "<i4",  # 32-bit integer
+		"MS:1000521": "<f4",  # 32-bit float
+		"MS:1000522": "<i8",  # 64-bit integer
+		"MS:1000523": "<f8",  # 64-bit float
+		}
+
+
+def mzML_reader(
+		file_name: Union[str, pathlib.Path],
+		ms_level: Optional[int] = None,
+		min_rt: Optional[Union[float, str]] = None,
+		max_rt: Optional[Union[float, str]] = None,
+		) -> GCMS_data:
 	"""
 	A reader for mzML files
 
+	Spectra without a scan start time are ignored. Gzip compressed files
+	(``.mzML.gz``) and MS-Numpress compressed binary data arrays are supported.
+
 	:param file_name: The name of the mzML file
 	:type file_name: str or os.PathLike
+	:param ms_level: If given, only read spectra with this MS level
+	:type ms_level: int, optional
+	:param min_rt: If given, only read spectra at or after this retention time.
+		Either a time in seconds or a time string (e.g. ``"6.5m"``)
+	:type min_rt: float or str, optional
+	:param max_rt: If given, only read spectra at or before this retention time.
+		Either a time in seconds or a time string. As the spectra of an mzML
+		file are stored in the order they were acquired, reading stops at the
+		first spectrum after this time.
+	:type max_rt: float or str, optional
 
 	:return: GC-MS data object
 	:rtype: :class:`pyms.GCMS.Class.GCMS_data`
@@ -59,55 +103,354 @@ def mzML_reader(file_name: Union[str, pathlib.Path]) -> GCMS_data:
 	if not is_path(file_name):
 		raise TypeError("'file_name' must be a string or a PathLike object")
 
-	mzml_file = pymzml.run.Reader(str(file_name))
+	print(f" -> Reading mzML file '{file_name}'")
+
+	time_list = []
+	mass_arrays = []
+	intensity_arrays = []
+
+	for rt, mass_array, intensity_array in _iter_spectra(file_name, ms_level, min_rt, max_rt):
+		time_list.append(rt)
+		mass_arrays.append(mass_array)
+		intensity_arrays.append(intensity_array)
+
+	return GCMS_data.from_arrays(
+			time_list,
+			numpy.concatenate(mass_arrays or [[]]),
+			numpy.concatenate(intensity_arrays or [[]]),
+			[len(mass_array) for mass_array in mass_arrays],
+			)
+
+
+def iter_mzML_scans(
+		file_name: Union[str, pathlib.Path],
+		ms_level: Optional[int] = None,
+		min_rt: Optional[Union[float, str]] = None,
+		max_rt: Optional[Union[float, str]] = None,
+		) -> Iterator[Tuple[float, Scan]]:
+	"""
+	Iterate over the scans in an mzML file as it is read, without reading the
+	whole file into memory
+
+	The ``mass_list`` and ``intensity_list`` of each scan are numpy arrays.
+
+	:param file_name: The name of the mzML file
+	:type file_name: str or os.PathLike
+	:param ms_level: If given, only read spectra with this MS level
+	:type ms_level: int, optional
+	:param min_rt: If given, only read spectra at or after this retention time.
+		Either a time in seconds or a time string (e.g. ``"6.5m"``)
+	:type min_rt: float or str, optional
+	:param max_rt: If given, only read spectra at or before this retention time.
+		Either a time in seconds or a time string. Reading stops at the first
+		spectrum after this time.
+	:type max_rt: float or str, optional
+
+	:return: An iterator over tuples of retention time in seconds and scan
+	:rtype: ~typing.Iterator[tuple[float, pyms.Spectrum.Scan]]
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	for rt, mass_array, intensity_array in _iter_spectra(file_name, ms_level, min_rt, max_rt):
+		yield rt, Scan._view(mass_array, intensity_array)
 
-	try:  # avoid printing from each rank
-		comm = MPI.COMM_WORLD
-		rank = comm.Get_rank()
-		size = comm.Get_size()
 
-		if rank == 0:
-			file_names = []
+def _iter_spectra(
+		file_name: Union[str, pathlib.Path],
+		ms_level: Optional[int] = None,
+		min_rt: Optional[Union[float, str]] = None,
+		max_rt: Optional[Union[float, str]] = None,
+		) -> Iterator[Tuple[float, numpy.ndarray, numpy.ndarray]]:
+	"""
+	Parse the spectra in an mzML file one at a time
+
+	The binary data arrays are only decoded for spectra that pass the filters.
+	The ``<indexList>`` of an indexed mzML file is not used: it gives the
+	offsets of the spectra by their ID rather than by retention time, so it
+	cannot locate a time range without reading the spectra. Instead, as
+	spectra are stored in the order they were acquired, parsing stops at the
+	first spectrum after ``max_rt``.
+
+	:return: An iterator over tuples of retention time in seconds, and
+		the m/z values (in ascending order) and intensities of the spectrum
+	"""
+
+	if isinstance(min_rt, str):
+		min_rt = time_str_secs(min_rt)
+	if isinstance(max_rt, str):
+		max_rt = time_str_secs(max_rt)
+
+	param_groups: Dict[str, Dict[str, Tuple[str, str]]] = {}
+	container = None
+
+	with open(file_name, "rb") as fp:
+		is_gzip = fp.read(2) == __GZIP_MAGIC
+
+	with (gzip.open if is_gzip else open)(file_name, "rb") as fp:
+		for event, element in ElementTree.iterparse(fp, events=("start", "end")):
+			name = _local_name(element.tag)
+
+			if event == "start":
+				if name in {"spectrumList", "chromatogramList"}:
+					container = element
+				continue
+
+			if name == "referenceableParamGroup":
+				param_groups[element.get("id")] = _cv_params(element, param_groups)
+
+			elif name in {"spectrum", "chromatogram"}:
+				if name == "spectrum":
+					rt = _scan_start_time(element, param_groups)
+					if rt is not None and max_rt is not None and rt > max_rt:
+						return
+
+					spectrum = _parse_spectrum(element, param_groups, rt, ms_level, min_rt)
+					if spectrum is not None:
+						yield spectrum
+
+				# Discard the parsed spectrum so the tree does not grow
+				element.clear()
+				if container is not None:
+					container.remove(element)
+
+
+def _scan_start_time(
+		element: ElementTree.Element,
+		param_groups: Dict[str, Dict[str, Tuple[str, str]]],
+		) -> Optional[float]:
+	"""
+	Returns the scan start time of a ``<spectrum>`` element in seconds,
+	or :py:obj:`None` if it has none
+	"""
+
+	for scan_list in _children(element, "scanList"):
+		for scan in _children(scan_list, "scan"):
+			start_time = _cv_params(scan, param_groups).get(__SCAN_START_TIME)
+			if start_time is not None:
+				value, unit = start_time
+				# We need time in seconds, and minutes are the usual unit
+				return float(value) if unit == __SECOND else 60 * float(value)
+
+	return None
+
+
+def _parse_spectrum(
+		element: ElementTree.Element,
+		param_groups: Dict[str, Dict[str, Tuple[str, str]]],
+		rt: Optional[float],
+		ms_level: Optional[int],
+		min_rt: Optional[float],
+		) -> Optional[Tuple[float, numpy.ndarray, numpy.ndarray]]:
+	"""
+	Parse a ``<spectrum>`` element with the scan start time ``rt``, returning
+	:py:obj:`None` if it has no scan start time or does not pass the filters
+	"""
+
+	if rt is None:
+		return None
+	if min_rt is not None and rt < min_rt:
+		return None
+
+	if ms_level is not None:
+		level = _cv_params(element, param_groups).get(__MS_LEVEL)
+		if level is None or int(level[0]) != ms_level:
+			return None
+
+	arrays = {}
+	for array_list in _children(element, "binaryDataArrayList"):
+		for array in _children(array_list, "binaryDataArray"):
+			params = _cv_params(array, param_groups)
+			for array_type in (__MZ_ARRAY, __INTENSITY_ARRAY):
+				if array_type in params:
+					arrays[array_type] = _decode_array(array, params)
+
+	mass_array = arrays.get(__MZ_ARRAY, numpy.empty(0))
+	intensity_array = arrays.get(__INTENSITY_ARRAY, numpy.empty(0))
+
+	if len(mass_array) != len(intensity_array):
+		raise ValueError("The lengths of the mass and intensity lists differ!")
+
+	# Scans are stored in ascending order of m/z
+	mass_array, intensity_array = sort_scan(mass_array, intensity_array)
+
+	return rt, mass_array, intensity_array
+
+
+def _decode_array(element: ElementTree.Element, params: Dict[str, Tuple[str, str]]) -> numpy.ndarray:
+	"""
+	Decode the ``<binary>`` data of a ``<binaryDataArray>`` element into a numpy array
+	"""
 
-			for i in range(1, size):
-				recv_buffer = ""
-				file_n = comm.recv(recv_buffer, i)
-				file_names.append(file_n)
+	binary = next(_children(element, "binary"), None)
+	if binary is None or not binary.text:
+		return numpy.empty(0)
 
-			print(" -> Reading mzML files:")
-			print(file_name)
-			for file_n in file_names:
-				print(file_n)
+	data = base64.b64decode(binary.text)
+
+	for numpress, decoder in (
+			(__NUMPRESS_LINEAR, _decode_numpress_linear),
+			(__NUMPRESS_PIC, _decode_numpress_pic),
+			(__NUMPRESS_SLOF, _decode_numpress_slof),
+			):
+		for accession, compressed in numpress.items():
+			if accession in params:
+				if compressed or __ZLIB_COMPRESSION in params:
+					data = zlib.decompress(data)
+				return decoder(data)
+
+	if __ZLIB_COMPRESSION in params:
+		data = zlib.decompress(data)
+	elif __NO_COMPRESSION not in params:
+		raise ValueError("Unsupported compression for mzML binary data array")
+
+	for accession, dtype in __DATA_TYPES.items():
+		if accession in params:
+			return numpy.frombuffer(data, dtype=dtype).astype(float)
+
+	raise ValueError("Unknown data type for mzML binary data array")
+
+
+def _numpress_fixed_point(data: bytes) -> float:
+	"""
+	Returns the fixed point stored in the first eight bytes of MS-Numpress data
+	"""
+
+	if len(data) < 8:
+		raise ValueError("Corrupt MS-Numpress data in mzML binary data array")
+
+	return struct.unpack(">d", data[:8])[0]
+
+
+def _numpress_ints(data: bytes) -> List[int]:
+	"""
+	Decode the variable length integers of MS-Numpress linear or pic data
+
+	Each integer starts with a half byte giving the number of leading half
+	bytes that are zero (0-8) or, less 8, that are all ones (9-15), followed
+	by the remaining half bytes of the integer, least significant first.
+	"""
+
+	half_bytes = numpy.empty(2 * len(data), dtype=numpy.uint8)
+	buffer = numpy.frombuffer(data, dtype=numpy.uint8)
+	half_bytes[0::2] = buffer >> 4
+	half_bytes[1::2] = buffer & 0xf
+	half_bytes = half_bytes.tolist()
+
+	ints = []
+	position = 0
+
+	while position < len(half_bytes):
+		head = half_bytes[position]
+
+		# An odd number of half bytes is padded with a zero
+		if position == len(half_bytes) - 1 and head == 0:
+			break
+
+		position += 1
+
+		if head <= 8:
+			n_leading = head
+			value = 0
 		else:
-			comm.send(file_name, dest=0)
-	# TODO: Find specific error
-	except Exception as e:
-		print(e)
-		print(f" -> Reading mzML file '{file_name}'")
+			n_leading = head - 8
+			value = (0xffffffff << (32 - 4 * n_leading)) & 0xffffffff
 
-	scan_list = []
-	time_list = []
+		n_remaining = 8 - n_leading
+		if position + n_remaining > len(half_bytes):
+			raise ValueError("Corrupt MS-Numpress data in mzML binary data array")
+
+		for shift, half_byte in enumerate(half_bytes[position:position + n_remaining]):
+			value |= half_byte << (4 * shift)
+		position += n_remaining
+
+		ints.append(value)
+
+	return ints
+
+
+def _decode_numpress_linear(data: bytes) -> numpy.ndarray:
+	"""
+	Decode MS-Numpress linear prediction compressed data (usually m/z values)
+	"""
 
-	for spectrum in mzml_file:
-		mass_list = []
-		intensity_list = []
+	if len(data) == 8:
+		return numpy.empty(0)
 
-		for mz, i in spectrum.peaks:
-			mass_list.append(mz)
-			intensity_list.append(i)
+	fixed_point = _numpress_fixed_point(data)
 
-		# scan_list.append(Scan(mass_list, intensity_list))
-		for element in spectrum.xmlTree:
-			# For some reason there are spectra with no time value,
-			# Ignore these????????????
-			if element.get('accession') == "MS:1000016":  # time value
-				# We need time in seconds not minutes
-				time_list.append(60 * float(element.get('value')))
-				scan_list.append(Scan(mass_list, intensity_list))
+	if len(data) < 12 or 12 < len(data) < 16:
+		raise ValueError("Corrupt MS-Numpress data in mzML binary data array")
 
-	# print("time:", len(time_list))
-	# print("scan:", len(scan_list))
+	first = numpy.frombuffer(data[8:16], dtype="<i4").astype(numpy.int64)
+	if len(first) == 1:
+		return first / fixed_point
 
-	data = GCMS_data(time_list, scan_list)
+	# Each value is stored as its difference from a linear extrapolation
+	# of the two values before it. The arithmetic wraps around as for the
+	# 32-bit integers that were encoded.
+	residuals = numpy.array(_numpress_ints(data[16:]), dtype=numpy.uint32).astype(numpy.int32)
+	steps = numpy.cumsum(numpy.concatenate([[first[1] - first[0]], residuals]), dtype=numpy.int64)
+	values = numpy.cumsum(numpy.concatenate([[first[0]], steps]), dtype=numpy.int64)
+
+	return values.astype(numpy.int32) / fixed_point
+
+
+def _decode_numpress_pic(data: bytes) -> numpy.ndarray:
+	"""
+	Decode MS-Numpress positive integer compressed data (usually intensities)
+	"""
+
+	return numpy.array(_numpress_ints(data), dtype=float)
+
+
+def _decode_numpress_slof(data: bytes) -> numpy.ndarray:
+	"""
+	Decode MS-Numpress short logged float compressed data (usually intensities)
+	"""
+
+	fixed_point = _numpress_fixed_point(data)
+
+	if len(data) % 2:
+		raise ValueError("Corrupt MS-Numpress data in mzML binary data array")
+
+	return numpy.expm1(numpy.frombuffer(data[8:], dtype="<u2") / fixed_point)
+
+
+def _cv_params(
+		element: ElementTree.Element,
+		param_groups: Dict[str, Dict[str, Tuple[str, str]]],
+		) -> Dict[str, Tuple[str, str]]:
+	"""
+	Returns the ``cvParam`` children of an element, including those from
+	referenced parameter groups, as a mapping of accessions to values and
+	unit accessions
+	"""
+
+	params = {}
+
+	for child in element:
+		name = _local_name(child.tag)
+		if name == "cvParam":
+			params[child.get("accession")] = (child.get("value"), child.get("unitAccession"))
+		elif name == "referenceableParamGroupRef":
+			params.update(param_groups.get(child.get("ref"), {}))
+
+	return params
+
+
+def _children(element: ElementTree.Element, name: str) -> Iterator[ElementTree.Element]:
+	"""
+	Iterate over the direct children of an element with the given name, ignoring namespaces
+	"""
+
+	return (child for child in element if _local_name(child.tag) == name)
+
+
+def _local_name(tag: str) -> str:
+	"""
+	Returns the tag name without its namespace
+	"""
 
-	return data
+	return tag.rpartition('}')[2]
@@ -38,7 +38,7 @@ from pyms.BillerBiemann import get_maxima_list_reduced
 from pyms.Gapfill.Class import MissingPeak, Sample
 from pyms.IntensityMatrix import build_intensity_matrix_i
 from pyms.Noise.SavitzkyGolay import savitzky_golay
-from pyms.Peak.Function import ion_area
+from pyms.Peak.Function import ion_areas
 from pyms.TopHat import tophat
 from pyms.Utils.IO import prepare_filepath
 
@@ -141,7 +141,7 @@ def missing_peak_finder(sample: Sample, file_name: str, points: int = 3, null_io
 
 	# smooth data
 	for ii in range(n_mz):
-		ic = im.get_ic_at_index(ii)
+		ic = im.get_ic_view(ii)
 		ic1 = savitzky_golay(ic, points)
 		ic_smooth = savitzky_golay(ic1, points)
 		ic_base = tophat(ic_smooth, struct="1.5m")
@@ -192,12 +192,8 @@ def missing_peak_finder(sample: Sample, file_name: str, points: int = 3, null_io
 
 		print(f'found {len(large_peaks):d} peaks above threshold')
 
-		areas = []
-		for peak in large_peaks:
-			apex = ci_ion_chrom.get_index_at_time(peak[0])
-			ia = ci_ion_chrom.get_intensity_array().tolist()
-			area, left, right, l_share, r_share = ion_area(ia, apex, 0)
-			areas.append(area)
+		apexes = ci_ion_chrom.indices_at_times([peak[0] for peak in large_peaks])
+		areas = ion_areas(ci_ion_chrom.intensity_array, apexes)[0].tolist()
 
 		########################
 
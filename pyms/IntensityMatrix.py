@@ -24,18 +24,23 @@ Class to model Intensity Matrix
 ################################################################################
 
 # stdlib
-import copy
+import json
+import os
 import pathlib
+import struct
+import zlib
 from numbers import Number
-from typing import List, Any, Iterator, Union, Optional
+from typing import List, Any, Callable, Iterator, Sequence, Union, Optional
 from warnings import warn
 
 # 3rd party
 import deprecation  # type: ignore
 import numpy  # type: ignore
+import scipy.sparse  # type: ignore
 
 # this package
 from pyms import __version__
+from pyms.Axis import Axis, as_axis
 from pyms.Base import pymsBaseClass
 from pyms.GCMS.Class import GCMS_data
 from pyms.IonChromatogram import IonChromatogram
@@ -62,6 +67,19 @@ class AsciiFiletypes(aenum.Enum):
 ASCII_DAT = AsciiFiletypes.ASCII_DAT
 ASCII_CSV = AsciiFiletypes.ASCII_CSV
 
+#: Version of the binary format written by :meth:`~pyms.IntensityMatrix.IntensityMatrix.save_binary`
+BINARY_FORMAT_VERSION = 1
+
+# File signature, followed by the format version and the length of the JSON header
+_BINARY_MAGIC = b"\x93PYMSIM\x00"
+_BINARY_PREAMBLE = struct.Struct("<8sII")
+
+# Data blocks are aligned to this many bytes
+_BINARY_ALIGNMENT = 64
+
+# Approximate number of bytes of intensity data processed at once when writing or verifying
+_BINARY_CHUNK_SIZE = 2 ** 24
+
 
 class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArrayMixin, GetIndexTimeMixin):
 	"""
@@ -74,7 +92,16 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 	:type mass_list: list
 
 	:param intensity_array: Binned intensity values per scan
-	:type intensity_array: List[~numbers.Number] or numpy.ndarray[~numbers.Number]
+	:type intensity_array: List[~numbers.Number] or numpy.ndarray[~numbers.Number] or scipy.sparse.spmatrix
+
+	If ``intensity_array`` is a :mod:`scipy.sparse` matrix the intensities are
+	stored sparsely, one scan per row, which uses much less memory when most
+	intensities are zero. Mass spectra, ion chromatograms, the TIC,
+	:meth:`~pyms.IntensityMatrix.IntensityMatrix.crop_mass`,
+	:meth:`~pyms.IntensityMatrix.IntensityMatrix.null_mass` and
+	:func:`~pyms.BillerBiemann.BillerBiemann` work without converting the intensities
+	to a dense array. Other processing functions, such as those in :mod:`pyms.Noise`,
+	require a dense intensity matrix; see :meth:`~pyms.IntensityMatrix.IntensityMatrix.to_dense`.
 
 	:authors: Andrew Isaac, Dominic Davis-Foster (type assertions and properties)
 	"""
@@ -85,34 +112,44 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		"""
 
 		# sanity check
-		if not is_sequence_of(time_list, Number):
+		if not isinstance(time_list, Axis) and not is_sequence_of(time_list, Number):
 			raise TypeError("'time_list' must be a Sequence of Numbers")
 
-		if not is_sequence_of(mass_list, Number):
+		if not isinstance(mass_list, Axis) and not is_sequence_of(mass_list, Number):
 			raise TypeError("'mass_list' must be a Sequence of Numbers")
 
-		if not is_sequence(intensity_array) or not is_sequence_of(intensity_array[0], Number):
+		if scipy.sparse.issparse(intensity_array):
+			if intensity_array.dtype.kind not in "biuf":
+				raise TypeError("'intensity_array' must contain Numbers")
+
+			intensity_array = intensity_array.tocsr()
+
+		elif not is_sequence(intensity_array) or not is_sequence_of(intensity_array[0], Number):
 			raise TypeError("'intensity_array' must be a Sequence, of Sequences, of Numbers")
 
-		if not isinstance(intensity_array, numpy.ndarray):
+		elif not isinstance(intensity_array, numpy.ndarray):
 			intensity_array = numpy.array(intensity_array)
 
-		if not len(time_list) == len(intensity_array):
+		if not len(time_list) == intensity_array.shape[0]:
 			raise ValueError("'time_list' is not the same length as 'intensity_array'")
 
-		if not len(mass_list) == len(intensity_array[0]):
+		if not len(mass_list) == intensity_array.shape[1]:
 			raise ValueError("'mass_list' is not the same size as 'intensity_array'")
 
-		self._time_list = time_list
-		self._mass_list = mass_list
+		# The axes are shared with the IonChromatograms taken from the matrix
+		self._time_list = as_axis(time_list)
+		self._mass_list = as_axis(mass_list)
 
 		self._intensity_array = intensity_array
 
-		self._min_rt = min(time_list)
-		self._max_rt = max(time_list)
+		# The intensities of a sparse matrix by column, for extracting ion chromatograms
+		self._column_cache = None
 
-		self._min_mass = min(mass_list)
-		self._max_mass = max(mass_list)
+		self._min_rt = self._time_list.min
+		self._max_rt = self._time_list.max
+
+		self._min_mass = self._mass_list.min
+		self._max_mass = self._mass_list.max
 
 		# Try to include parallelism.
 		try:
@@ -120,7 +157,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 			comm = MPI.COMM_WORLD
 			num_ranks = comm.Get_size()
 			rank = comm.Get_rank()
-			M, N = len(intensity_array), len(intensity_array[0])
+			M, N = intensity_array.shape
 			lrr = (rank * M / num_ranks, (rank + 1) * M / num_ranks)
 			lcr = (rank * N / num_ranks, (rank + 1) * N / num_ranks)
 			m, n = (lrr[1] - lrr[0], lcr[1] - lcr[0])
@@ -145,7 +182,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		:rtype: int
 		"""
 
-		return len(self.time_list)
+		return len(self._time_list)
 
 	def __eq__(self, other: Any) -> bool:
 		"""
@@ -158,12 +195,174 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		"""
 
 		if isinstance(other, self.__class__):
-			return self.time_list == other.time_list \
-					and self.mass_list == other.mass_list \
-					and numpy.array_equal(self.intensity_array, other.intensity_array)
+			if not (self._time_list == other._time_list and self._mass_list == other._mass_list):
+				return False
+
+			if self.is_sparse and other.is_sparse:
+				return (self._intensity_array != other._intensity_array).nnz == 0
+
+			return numpy.array_equal(self.intensity_array, other.intensity_array)
 
 		return NotImplemented
 
+	def __getstate__(self):
+		state = self.__dict__.copy()
+
+		# The column cache can be rebuilt from the intensities
+		state["_column_cache"] = None
+
+		return state
+
+	@property
+	def is_sparse(self) -> bool:
+		"""
+		Returns whether the intensities are stored as a sparse matrix
+
+		:rtype: bool
+
+		:author: Dominic Davis-Foster
+		"""
+
+		return scipy.sparse.issparse(self._intensity_array)
+
+	@property
+	def intensity_array(self) -> numpy.ndarray:
+		"""
+		Returns a copy of the intensity array
+
+		The intensities of a sparse intensity matrix are returned as a dense array.
+
+		:return: Matrix of intensity values
+		:rtype: numpy.ndarray
+
+		:author: Andrew Isaac
+		:author: Lewis Lee
+		"""
+
+		if self.is_sparse:
+			return self._intensity_array.toarray()
+
+		return numpy.copy(self._intensity_array)
+
+	@property
+	def intensity_array_list(self) -> List:
+		"""
+		Returns a copy of the intensity array as a list of lists of floats
+
+		:return: Matrix of intensity values
+		:rtype: list
+
+		:author: Andrew Isaac
+		"""
+
+		if self.is_sparse:
+			return self._intensity_array.toarray().tolist()
+
+		return self._intensity_array.tolist()
+
+	def to_sparse(self) -> "IntensityMatrix":
+		"""
+		Returns a copy of the intensity matrix with the intensities stored as a sparse matrix
+
+		The new intensity matrix shares the time and mass lists of this one.
+
+		:rtype: pyms.IntensityMatrix.IntensityMatrix
+
+		:author: Dominic Davis-Foster
+		"""
+
+		return IntensityMatrix(self._time_list, self._mass_list, scipy.sparse.csr_matrix(self._intensity_array, copy=True))
+
+	def to_dense(self) -> "IntensityMatrix":
+		"""
+		Returns a copy of the intensity matrix with the intensities stored as a dense array
+
+		The new intensity matrix shares the time and mass lists of this one.
+
+		:rtype: pyms.IntensityMatrix.IntensityMatrix
+
+		:author: Dominic Davis-Foster
+		"""
+
+		return IntensityMatrix(self._time_list, self._mass_list, self.intensity_array)
+
+	def _sparse_columns(self) -> scipy.sparse.csc_matrix:
+		"""
+		Returns the intensities of a sparse intensity matrix in column-major form.
+
+		The conversion is done once and kept until the intensities change.
+		"""
+
+		if self._column_cache is None or self._column_cache[0] is not self._intensity_array:
+			self._column_cache = (self._intensity_array, self._intensity_array.tocsc())
+
+		return self._column_cache[1]
+
+	def _sparse_column(self, ix: int) -> numpy.ndarray:
+		"""
+		Returns a dense copy of a column of a sparse intensity matrix
+		"""
+
+		columns = self._sparse_columns()
+		start, stop = columns.indptr[ix], columns.indptr[ix + 1]
+
+		column = numpy.zeros(columns.shape[0], dtype=columns.dtype)
+		column[columns.indices[start:stop]] = columns.data[start:stop]
+
+		return column
+
+	def _clear_sparse_column(self, ix: int):
+		"""
+		Sets the intensities in a column of a sparse intensity matrix to zero
+		"""
+
+		ia = self._intensity_array
+		ia.data[ia.indices == ix] = 0
+		ia.eliminate_zeros()
+
+		self._column_cache = None
+
+	def _map_sparse_columns(
+			self,
+			function: Callable[[numpy.ndarray], numpy.ndarray],
+			block_points: int,
+			dtype: numpy.dtype,
+			) -> scipy.sparse.csr_matrix:
+		"""
+		Applies a function to the ion chromatograms of a sparse intensity matrix.
+
+		The function is given blocks of columns as dense arrays of about
+		``block_points`` intensities, so the whole matrix is never converted
+		to a dense array. Ion chromatograms with no intensities are skipped,
+		so the function must leave columns of zeros unchanged.
+
+		:return: The results, with the given dtype
+		"""
+
+		columns = self._sparse_columns()
+		n_scan, n_mz = columns.shape
+		block_size = max(1, block_points // max(1, n_scan))
+
+		occupied = numpy.flatnonzero(numpy.diff(columns.indptr))
+
+		rows = [numpy.zeros(0, dtype=int)]
+		cols = [numpy.zeros(0, dtype=int)]
+		values = [numpy.zeros(0, dtype=dtype)]
+
+		for first in range(0, len(occupied), block_size):
+			block_ions = occupied[first:first + block_size]
+			block = scipy.sparse.coo_matrix(function(columns[:, block_ions].toarray()))
+
+			rows.append(block.row)
+			cols.append(block_ions[block.col])
+			values.append(block.data.astype(dtype, copy=False))
+
+		return scipy.sparse.csr_matrix(
+				(numpy.concatenate(values), (numpy.concatenate(rows), numpy.concatenate(cols))),
+				shape=(n_scan, n_mz),
+				dtype=dtype,
+				)
+
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
 							current_version=__version__,
 							details=f"Use :class:`pyms.IntensityMatrix.IntensityMatrix.local_size` instead")
@@ -223,8 +422,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		:authors: Qiao Wang, Andrew Isaac, Luke Hodkinson, Vladimir Likic
 		"""
 
-		n_scan = len(self._intensity_array)
-		n_mz = len(self._intensity_array[0])
+		n_scan, n_mz = self._intensity_array.shape
 
 		return n_scan, n_mz
 
@@ -248,7 +446,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		else:
 			# Iterate over global indices.
-			n_scan = len(self._intensity_array)
+			n_scan = self._intensity_array.shape[0]
 			for i in range(0, n_scan):
 				yield i
 
@@ -272,7 +470,7 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		else:
 			# Iterate over global indices.
-			n_mz = len(self._intensity_array[0])
+			n_mz = self._intensity_array.shape[1]
 			for i in range(0, n_mz):
 				yield i
 
@@ -298,22 +496,26 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(ic, IonChromatogram):
 			raise TypeError("'ic' must be an IonChromatogram object")
 
-		# this returns an numpy.array object
-		ia = ic.intensity_array
+		ia = ic._intensity_array
 
 		# check if the dimension is ok
-		if len(ia) != len(self._intensity_array):
+		if len(ia) != len(self):
 			raise ValueError("ion chromatogram incompatible with the intensity matrix")
 
-		# Convert 'ia' to a list. By convention, the attribute
-		# _intensity_array of the class IntensityMatrix is a list
-		# of lists. This makes pickling instances of IntensityMatrix
-		# practically possible, since pickling numpy.array objects
-		# produces ten times larger files compared to pickling python
-		# lists.
-		ial = ia.tolist()
-		for i in range(len(ia)):
-			self._intensity_array[i][ix] = ial[i]
+		if self.is_sparse:
+			self.get_mass_at_index(ix)  # check the index is in range
+			self._clear_sparse_column(ix)
+
+			ia = numpy.asarray(ia).astype(self._intensity_array.dtype)
+			rows = numpy.flatnonzero(ia)
+			column = scipy.sparse.csr_matrix(
+					(ia[rows], (rows, numpy.full(len(rows), ix))),
+					shape=self._intensity_array.shape,
+					)
+
+			self._intensity_array = self._intensity_array + column
+		else:
+			self._intensity_array[:, ix] = ia
 
 	def get_ic_at_index(self, ix: int) -> IonChromatogram:
 		"""
@@ -326,21 +528,77 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		:return: Ion chromatogram at given index
 		:rtype: pyms.IonChromatogram.IonChromatogram
 
+		The intensities are copied. Use :meth:`~pyms.IntensityMatrix.IntensityMatrix.get_ic_view`
+		to access them without copying.
+
 		:authors: Qiao Wang, Andrew Isaac, Vladimir Likic
 		"""
 
 		if not isinstance(ix, int):
 			raise TypeError("'ix' must be an integer")
 
-		ia = []
-		for i in range(len(self._intensity_array)):
-			ia.append(self._intensity_array[i][ix])
+		if self.is_sparse:
+			mass = self.get_mass_at_index(ix)
+			return IonChromatogram(self._sparse_column(ix), self._time_list, mass)
+
+		ic_ia = numpy.array(self._intensity_array[:, ix])
+		mass = self.get_mass_at_index(ix)
+
+		return IonChromatogram(ic_ia, self._time_list, mass)
+
+	def get_ic_view(self, ix: int, writeable: bool = False) -> IonChromatogram:
+		"""
+		Returns the ion chromatogram at the specified index as a view onto the
+		intensity matrix, without copying the intensities.
+
+		The ion chromatogram shares the time list of the intensity matrix.
+		Unless ``writeable`` is :py:obj:`True` its intensities cannot be changed.
+		Changes to the intensities of a writeable view, either in place or by
+		setting its :attr:`~pyms.IonChromatogram.IonChromatogram.intensity_array`,
+		change the intensity matrix.
+
+		The columns of a sparse intensity matrix are not stored contiguously,
+		so for a sparse matrix the intensities are copied and the ion
+		chromatogram is not a view. Writeable views of a sparse intensity
+		matrix are not available.
+
+		:param ix: Index of an ion chromatogram in the intensity data matrix
+		:type ix: int
+		:param writeable: Whether changes to the ion chromatogram should change the intensity matrix
+		:type writeable: bool, optional
+
+		:return: Ion chromatogram at given index
+		:rtype: pyms.IonChromatogram.IonChromatogram
+
+		:author: Dominic Davis-Foster
+		"""
+
+		if not isinstance(ix, int):
+			raise TypeError("'ix' must be an integer")
+
+		if not isinstance(writeable, bool):
+			raise TypeError("'writeable' must be a boolean")
 
-		ic_ia = numpy.array(ia)
 		mass = self.get_mass_at_index(ix)
-		rt = copy.deepcopy(self._time_list)
 
-		return IonChromatogram(ic_ia, rt, mass)
+		if self.is_sparse:
+			if writeable:
+				raise ValueError("Writeable views of a sparse intensity matrix are not available")
+
+			ic_ia = self._sparse_column(ix)
+			ic_ia.flags.writeable = False
+
+			return IonChromatogram(ic_ia, self._time_list, mass)
+
+		ic_ia = self._intensity_array[:, ix]
+		if not writeable:
+			# Only the view is made read-only, not the intensity matrix
+			ic_ia.flags.writeable = False
+
+		ic = IonChromatogram(ic_ia, self._time_list, mass)
+		ic._view = True
+
+		return ic
 
 	def get_ic_at_mass(self, mass=None):
 		"""
@@ -406,9 +664,12 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(ix, int):
 			raise TypeError("'ix' must be an an integer")
 
-		if ix < 0 or ix >= len(self._intensity_array):
+		if ix < 0 or ix >= len(self):
 			raise IndexError("index out of range")
 
+		if self.is_sparse:
+			return self._intensity_array[ix].toarray()[0].tolist()
+
 		return self._intensity_array[ix].tolist()
 
 	def get_mass_at_index(self, ix: int) -> int:
@@ -450,14 +711,32 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(mass, Number):
 			raise TypeError("'mass' must be a number")
 
-		best = self._max_mass
-		ix = 0
-		for ii in range(len(self._mass_list)):
-			tmp = abs(self._mass_list[ii] - mass)
-			if tmp < best:
-				best = tmp
-				ix = ii
-		return ix
+		return self._mass_list.nearest_index(mass)
+
+	def indices_of_masses(self, masses: Union[Sequence[float], numpy.ndarray]) -> numpy.ndarray:
+		"""
+		Returns the index of each of the given masses in the list of masses.
+
+		The nearest binned mass to each mass is used.
+
+		:param masses: Masses to lookup in list of masses
+		:type masses: ~collections.abc.Sequence of float or numpy.ndarray
+
+		:return: Index of the mass closest to each given mass
+		:rtype: numpy.ndarray
+
+		:author: Dominic Davis-Foster
+		"""
+
+		if not is_sequence(masses):
+			raise TypeError("'masses' must be a Sequence of numbers")
+
+		masses = numpy.asarray(masses)
+
+		if masses.size and masses.dtype.kind not in "iuf":
+			raise TypeError("'masses' must be a Sequence of numbers")
+
+		return self._mass_list.nearest_indices(masses)
 
 	def crop_mass(self, mass_min: float, mass_max: float):
 		"""
@@ -480,27 +759,17 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if mass_max > self._max_mass:
 			raise ValueError(f"'mass_max' is greater than the largest mass: {self._max_mass:.3f}")
 
-		# pre build mass_list and list of indecies
-		mass_list = self._mass_list
-		new_mass_list = []
-		ii_list = []
-		for ii, mass in enumerate(mass_list):
-			if mass_min <= mass <= mass_max:
-				new_mass_list.append(mass)
-				ii_list.append(ii)
-
-		# update intensity matrix
-		im = self._intensity_array.tolist()
-		for spec_jj in range(len(im)):
-			new_spec = []
-			for ii in ii_list:
-				new_spec.append(im[spec_jj][ii])
-			im[spec_jj] = new_spec
-		self._intensity_array = numpy.array(im)
-
-		self._mass_list = new_mass_list
-		self._min_mass = min(new_mass_list)
-		self._max_mass = max(new_mass_list)
+		# The indices of the masses to keep
+		masses = self._mass_list.values
+		columns = numpy.flatnonzero((mass_min <= masses) & (masses <= mass_max))
+
+		# update intensity matrix.
+		# This works the same way for both dense and sparse intensities.
+		self._intensity_array = self._intensity_array[:, columns]
+
+		self._mass_list = Axis(masses[columns])
+		self._min_mass = self._mass_list.min
+		self._max_mass = self._mass_list.max
 
 	def null_mass(self, mass: float):
 		"""
@@ -519,9 +788,27 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		ii = self.get_index_of_mass(mass)
 
-		im = self._intensity_array
-		for spec_jj in range(len(im)):
-			im[spec_jj][ii] = 0
+		if self.is_sparse:
+			self._clear_sparse_column(ii)
+		else:
+			self._intensity_array[:, ii] = 0
+
+	@property
+	def tic(self) -> IonChromatogram:
+		"""
+		Returns the total ion chromatogram, the sum of the intensities of each scan
+
+		:rtype: pyms.IonChromatogram.IonChromatogram
+
+		:author: Dominic Davis-Foster
+		"""
+
+		if self.is_sparse:
+			intensities = numpy.asarray(self._intensity_array.sum(axis=1)).ravel()
+		else:
+			intensities = self._intensity_array.sum(axis=1)
+
+		return IonChromatogram(intensities, self._time_list)
 
 	def reduce_mass_spectra(self, n_intensities: int = 5):
 		"""
@@ -537,6 +824,10 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		if not isinstance(n_intensities, Number):
 			raise TypeError("'n_intensities' must be a number")
 
+		if self.is_sparse:
+			self.__reduce_sparse_mass_spectra(n_intensities)
+			return
+
 		# loop over all mass spectral scans
 		for ii, intensity_list in enumerate(self._intensity_array):
 
@@ -559,6 +850,35 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 			self._intensity_array[ii] = intensity_list_new
 
+	def __reduce_sparse_mass_spectra(self, n_intensities: int):
+		"""
+		Reduces the mass spectra of a sparse intensity matrix, keeping the same
+		intensities as :meth:`~pyms.IntensityMatrix.IntensityMatrix.reduce_mass_spectra`
+		does for a dense one.
+		"""
+
+		ia = self._intensity_array
+
+		# Equal intensities are ranked by mass, as in the dense case
+		ia.sort_indices()
+		n_masses = ia.shape[1]
+
+		for ii in range(ia.shape[0]):
+			start, stop = ia.indptr[ii], ia.indptr[ii + 1]
+			intensity_list = ia.data[start:stop]
+
+			order = numpy.argsort(-intensity_list, kind="stable")
+			rank = numpy.empty(len(order), dtype=int)
+			rank[order] = numpy.arange(len(order))
+
+			# The zero intensities, which aren't stored, rank above any negative ones
+			rank[intensity_list < 0] += n_masses - len(intensity_list)
+
+			intensity_list[rank >= n_intensities] = 0
+
+		ia.eliminate_zeros()
+		self._column_cache = None
+
 	def export_ascii(self, root_name: Union[str, pathlib.Path], fmt: Union[AsciiFiletypes, int] = AsciiFiletypes.ASCII_DAT):
 		"""
 		Exports the intensity matrix, retention time vector, and m/z vector to the ascii format.
@@ -592,6 +912,8 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		# export 2D matrix of intensities
 		vals = self._intensity_array
+		if self.is_sparse:
+			vals = vals.toarray()
 		save_data(f"{root_name}.im.{extension}", vals, sep=separator)
 
 		# export 1D vector of m/z's, corresponding to rows of
@@ -625,6 +947,8 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 		mass_list = self._mass_list
 		time_list = self._time_list
 		vals = self._intensity_array
+		if self.is_sparse:
+			vals = vals.toarray()
 
 		fp = file_name.open("w")
 
@@ -657,6 +981,102 @@ class IntensityMatrix(pymsBaseClass, TimeListMixin, MassListMixin, IntensityArra
 
 		fp.close()
 
+	def save_binary(self, file_name: Union[str, pathlib.Path]):
+		"""
+		Saves the intensity matrix in PyMassSpec's binary format
+
+		The file consists of a short preamble (file signature, format version
+		and header length), a JSON header describing the data, and raw
+		little-endian blocks for the retention times, the masses and the
+		intensities. Intensities are stored one ion chromatogram after another
+		in their original dtype, so that :func:`~pyms.IntensityMatrix.load_binary`
+		can memory-map the file and read single ion chromatograms without
+		reading the whole matrix. Each block carries a CRC-32 checksum.
+
+		:param file_name: The name of the output file
+		:type file_name: str or os.PathLike
+
+		:author: Dominic Davis-Foster
+		"""
+
+		if not is_path(file_name):
+			raise TypeError("'file_name' must be a string or a PathLike object")
+
+		file_name = prepare_filepath(file_name)
+
+		if self.is_sparse:
+			intensity_array = self._sparse_columns()
+		else:
+			intensity_array = numpy.asarray(self._intensity_array)
+
+		if intensity_array.dtype.kind not in "biuf":
+			raise ValueError("'intensity_array' must contain real numbers")
+
+		n_scans, n_masses = intensity_array.shape
+		intensity_dtype = intensity_array.dtype.newbyteorder('<')
+
+		times = numpy.asarray(self._time_list, dtype='<f8')
+		masses = numpy.asarray(self._mass_list, dtype='<f8')
+
+		# Lay out the blocks, each aligned relative to the start of the data
+		blocks = {}
+		position = 0
+		for name, nbytes in (
+				("time", times.nbytes),
+				("mass", masses.nbytes),
+				("intensity", n_scans * n_masses * intensity_dtype.itemsize),
+				):
+			position = -(-position // _BINARY_ALIGNMENT) * _BINARY_ALIGNMENT
+			blocks[name] = [position, nbytes]
+			position += nbytes
+
+		def make_header(checksums):
+			header = json.dumps({
+					"version": BINARY_FORMAT_VERSION,
+					"pyms_version": __version__,
+					"n_scans": n_scans,
+					"n_masses": n_masses,
+					"intensity_dtype": intensity_dtype.str,
+					"order": 'F',
+					"blocks": blocks,
+					"crc32": {name: f"{checksum:08x}" for name, checksum in checksums.items()},
+					}).encode("UTF-8")
+
+			# Pad the header so the data starts on an aligned boundary
+			header_end = _BINARY_PREAMBLE.size + len(header)
+			header += b" " * (-header_end % _BINARY_ALIGNMENT)
+
+			return _BINARY_PREAMBLE.pack(_BINARY_MAGIC, BINARY_FORMAT_VERSION, len(header)) + header
+
+		# The checksums are fixed width, so the real header can overwrite the placeholder
+		checksums = {name: 0 for name in blocks}
+		preamble = make_header(checksums)
+		data_start = len(preamble)
+
+		with file_name.open("wb") as fp:
+			fp.write(preamble)
+
+			for name, values in (("time", times), ("mass", masses)):
+				fp.seek(data_start + blocks[name][0])
+				fp.write(values.tobytes())
+				checksums[name] = zlib.crc32(values)
+
+			# Write the intensities in column order, a few columns at a time
+			fp.seek(data_start + blocks["intensity"][0])
+			chunk_cols = max(1, _BINARY_CHUNK_SIZE // max(1, n_scans * intensity_dtype.itemsize))
+			checksum = 0
+			for start in range(0, n_masses, chunk_cols):
+				chunk = intensity_array[:, start:start + chunk_cols]
+				if self.is_sparse:
+					chunk = chunk.toarray()
+				chunk = numpy.ascontiguousarray(chunk.T, dtype=intensity_dtype)
+				fp.write(chunk.tobytes())
+				checksum = zlib.crc32(chunk, checksum)
+			checksums["intensity"] = checksum
+
+			fp.seek(0)
+			fp.write(make_header(checksums))
+
 
 def import_leco_csv(file_name: Union[str, pathlib.Path]) -> IntensityMatrix:
 	"""
@@ -753,7 +1173,116 @@ def import_leco_csv(file_name: Union[str, pathlib.Path]) -> IntensityMatrix:
 	return IntensityMatrix(time_list, mass_list, data)
 
 
-def build_intensity_matrix(data: GCMS_data, bin_interval: float = 1, bin_left: float = 0.5, bin_right: float = 0.5, min_mass: Optional[bool] = None) -> bool:
+def load_binary(
+		file_name: Union[str, pathlib.Path],
+		mmap: bool = True,
+		verify: bool = False,
+		) -> IntensityMatrix:
+	"""
+	Loads an intensity matrix saved with :meth:`~pyms.IntensityMatrix.IntensityMatrix.save_binary`
+
+	With ``mmap=True`` the intensities are memory-mapped copy-on-write,
+	so the file opens instantly and only the parts of the matrix that are
+	used are read from disk. Changes to the matrix are not written back to the file.
+
+	The checksums of the time and mass blocks are always checked. The checksum of the
+	intensity block is only checked if ``verify`` is :py:obj:`True`, as doing
+	so reads the whole file.
+
+	:param file_name: Path of the file to read
+	:type file_name: str or os.PathLike
+	:param mmap: Whether to memory-map the intensities rather than reading them into memory
+	:type mmap: bool, optional
+	:param verify: Whether to check the checksum of the intensities
+	:type verify: bool, optional
+
+	:return: Data as an IntensityMatrix
+	:rtype: pyms.IntensityMatrix.IntensityMatrix
+
+	:author: Dominic Davis-Foster
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+
+	with file_name.open("rb") as fp:
+		preamble = fp.read(_BINARY_PREAMBLE.size)
+
+		if len(preamble) < _BINARY_PREAMBLE.size:
+			raise IOError("The file is not a PyMassSpec binary intensity matrix")
+
+		magic, version, header_length = _BINARY_PREAMBLE.unpack(preamble)
+
+		if magic != _BINARY_MAGIC:
+			raise IOError("The file is not a PyMassSpec binary intensity matrix")
+
+		if version > BINARY_FORMAT_VERSION:
+			raise IOError(
+					f"Unsupported binary intensity matrix version {version}. "
+					f"This version of PyMassSpec supports up to version {BINARY_FORMAT_VERSION}"
+					)
+
+		header = json.loads(fp.read(header_length).decode("UTF-8"))
+		data_start = _BINARY_PREAMBLE.size + header_length
+
+		def read_block(name):
+			offset, nbytes = header["blocks"][name]
+			fp.seek(data_start + offset)
+			block = fp.read(nbytes)
+
+			if len(block) != nbytes or zlib.crc32(block) != int(header["crc32"][name], 16):
+				raise IOError(f"The {name} data in the file is corrupt")
+
+			return numpy.frombuffer(block, dtype='<f8')
+
+		time_list = read_block("time").tolist()
+		mass_list = read_block("mass").tolist()
+
+		shape = (header["n_scans"], header["n_masses"])
+		dtype = numpy.dtype(header["intensity_dtype"])
+		offset, nbytes = header["blocks"]["intensity"]
+
+		# Check the file is long enough before mapping or reading the intensities
+		if (
+				nbytes != shape[0] * shape[1] * dtype.itemsize
+				or data_start + offset + nbytes > os.fstat(fp.fileno()).st_size
+				):
+			raise IOError("The intensity data in the file is corrupt")
+
+		if mmap:
+			intensity_array = numpy.memmap(
+					fp, dtype=dtype, mode='c', offset=data_start + offset, shape=shape, order=header["order"]
+					)
+		else:
+			fp.seek(data_start + offset)
+			intensity_array = numpy.fromfile(fp, dtype=dtype, count=shape[0] * shape[1])
+			intensity_array = intensity_array.reshape(shape, order=header["order"])
+
+	if verify:
+		# The array is stored column by column, so its transpose is contiguous
+		columns = intensity_array.T
+		chunk_cols = max(1, _BINARY_CHUNK_SIZE // max(1, shape[0] * dtype.itemsize))
+		checksum = 0
+		for start in range(0, shape[1], chunk_cols):
+			checksum = zlib.crc32(numpy.ascontiguousarray(columns[start:start + chunk_cols]), checksum)
+
+		if checksum != int(header["crc32"]["intensity"], 16):
+			raise IOError("The intensity data in the file is corrupt")
+
+	return IntensityMatrix(time_list, mass_list, intensity_array)
+
+
+def build_intensity_matrix(
+		data: GCMS_data,
+		bin_interval: float = 1,
+		bin_left: float = 0.5,
+		bin_right: float = 0.5,
+		min_mass: Optional[bool] = None,
+		dtype=float,
+		sparse: bool = False,
+		) -> IntensityMatrix:
 	"""
 	Sets the full intensity matrix with flexible bins
 
@@ -767,6 +1296,12 @@ def build_intensity_matrix(data: GCMS_data, bin_interval: float = 1, bin_left: f
 	:type bin_right: float
 	:param min_mass: Minimum mass to bin (default minimum mass from data)
 	:type min_mass: bool
+	:param dtype: The data type of the intensity array. Use :class:`numpy.float32`
+		to halve the memory used. Default :class:`float`
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to store the intensities as a sparse matrix, which
+		uses much less memory for small bin intervals. Default :py:obj:`False`
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -788,14 +1323,23 @@ def build_intensity_matrix(data: GCMS_data, bin_interval: float = 1, bin_left: f
 	if not isinstance(bin_right, Number):
 		raise TypeError("'bin_right' must be a Number.")
 
+	if not isinstance(sparse, bool):
+		raise TypeError("'sparse' must be a boolean.")
+
 	if not min_mass:
 		min_mass = data.min_mass
 	max_mass = data.max_mass
 
-	return __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right)
+	return __fill_bins(data, min_mass, max_mass, bin_interval, bin_left, bin_right, dtype, sparse)
 
 
-def build_intensity_matrix_i(data: GCMS_data, bin_left: float = 0.3, bin_right: float = 0.7) -> IntensityMatrix:
+def build_intensity_matrix_i(
+		data: GCMS_data,
+		bin_left: float = 0.3,
+		bin_right: float = 0.7,
+		dtype=float,
+		sparse: bool = False,
+		) -> IntensityMatrix:
 	"""
 	Sets the full intensity matrix with integer bins
 
@@ -805,6 +1349,12 @@ def build_intensity_matrix_i(data: GCMS_data, bin_left: float = 0.3, bin_right:
 	:type bin_left: float
 	:param bin_right: right bin boundary offset. Default ``0.7``
 	:type bin_right: float
+	:param dtype: The data type of the intensity array. Use :class:`numpy.float32`
+		to halve the memory used. Default :class:`float`
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to store the intensities as a sparse matrix, which
+		uses much less memory for small bin intervals. Default :py:obj:`False`
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -823,6 +1373,9 @@ def build_intensity_matrix_i(data: GCMS_data, bin_left: float = 0.3, bin_right:
 	if not isinstance(bin_right, Number):
 		raise TypeError("'bin_right' must be a number.")
 
+	if not isinstance(sparse, bool):
+		raise TypeError("'sparse' must be a boolean.")
+
 	min_mass = data.min_mass
 	max_mass = data.max_mass
 
@@ -830,10 +1383,19 @@ def build_intensity_matrix_i(data: GCMS_data, bin_left: float = 0.3, bin_right:
 	bin_right = abs(bin_right)
 	min_mass = int(min_mass + 1 - bin_right)
 
-	return __fill_bins(data, min_mass, max_mass, 1, bin_left, bin_right)
+	return __fill_bins(data, min_mass, max_mass, 1, bin_left, bin_right, dtype, sparse)
 
 
-def __fill_bins(data: GCMS_data, min_mass: float, max_mass: float, bin_interval: Union[int, float], bin_left: float, bin_right: float) -> IntensityMatrix:
+def __fill_bins(
+		data: GCMS_data,
+		min_mass: float,
+		max_mass: float,
+		bin_interval: Union[int, float],
+		bin_left: float,
+		bin_right: float,
+		dtype=float,
+		sparse: bool = False,
+		) -> IntensityMatrix:
 	"""
 	Fills the intensity values for all bins
 
@@ -849,6 +1411,10 @@ def __fill_bins(data: GCMS_data, min_mass: float, max_mass: float, bin_interval:
 	:type bin_left: float
 	:param bin_right: right bin boundary offset
 	:type bin_right: float
+	:param dtype: The data type of the intensity array. Default :class:`float`
+	:type dtype: numpy.dtype, optional
+	:param sparse: Whether to store the intensities as a sparse matrix. Default :py:obj:`False`
+	:type sparse: bool, optional
 
 	:return: Binned IntensityMatrix object
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -871,24 +1437,117 @@ def __fill_bins(data: GCMS_data, min_mass: float, max_mass: float, bin_interval:
 	# initialise masses to bin centres
 	mass_list = [i * bin_interval + min_mass for i in range(num_bins)]
 
-	# Modified binning loops. I've replaced the deepcopy getting routines with
-	# the alias properties. This way we can avoid performing the copies when
-	# it is clear that we do not intend on modifying the contents of the arrays
-	# here.
-	#           - Luke Hodkinson, 18/05/2010
+	# The masses and intensities of all scans, and where each scan starts.
+	# These are used directly, as they are not modified here.
+	data.load()
+	masses = data._mass_values
+	intensities = data._intensity_values
+	scan_offsets = data._scan_offsets
+	n_scans = len(data)
+
+	# The bin of each point. Points outside the bins are left out.
+	bins = ((masses + bl - min_mass) / bin_interval).astype(int)
+	in_range = (bins >= 0) & (bins < num_bins)
+
+	if sparse:
+		intensity_matrix = __fill_sparse_bins(data, bins, in_range, num_bins, dtype)
+		return IntensityMatrix(data._time_list, mass_list, intensity_matrix)
 
 	# fill the bins
-	intensity_matrix = []
-	for scan in data.scan_list:  # use the alias, not the copy (Luke)
-		intensity_list = [0.0] * num_bins
-		masses = scan.mass_list  # use the alias, not the copy (Luke)
-		intensities = scan.intensity_list  # use the alias, not the copy (Luke)
-		for ii, mass in enumerate(masses):
-			mm = int((mass + bl - min_mass) / bin_interval)
-			intensity_list[mm] += intensities[ii]
-		intensity_matrix.append(intensity_list)
+	intensity_matrix = numpy.empty((n_scans, num_bins), dtype=dtype)
+
+	# The scans are binned in chunks so the intermediate float64 array stays
+	# small when a smaller dtype is requested.
+	chunk_size = max(1, 2**22 // max(num_bins, 1))
+
+	for first in range(0, n_scans, chunk_size):
+		last = min(first + chunk_size, n_scans)
+		points = slice(scan_offsets[first], scan_offsets[last])
+
+		scan_index = numpy.repeat(numpy.arange(last - first), numpy.diff(scan_offsets[first:last + 1]))
+		cells = scan_index * num_bins + bins[points]
+		keep = in_range[points]
+
+		intensity_matrix[first:last] = numpy.bincount(
+				cells[keep],
+				weights=intensities[points][keep],
+				minlength=(last - first) * num_bins,
+				).reshape(last - first, num_bins)
+
+	return IntensityMatrix(data._time_list, mass_list, intensity_matrix)
+
+
+def __fill_sparse_bins(
+		data: GCMS_data,
+		bins: numpy.ndarray,
+		in_range: numpy.ndarray,
+		num_bins: int,
+		dtype=float,
+		) -> scipy.sparse.csr_matrix:
+	"""
+	Fills a sparse matrix with the intensity values for all bins,
+	without creating the dense intensity matrix.
+
+	The intensities in each bin are summed in the same order as in the
+	dense case, so the values are identical.
+
+	:param data: Raw GCMS data
+	:type data: pyms.GCMS.Class.GCMS_data
+	:param bins: The bin of each point
+	:type bins: numpy.ndarray
+	:param in_range: Whether each point is in one of the bins
+	:type in_range: numpy.ndarray
+	:param num_bins: The number of bins
+	:type num_bins: int
+	:param dtype: The data type of the intensity array. Default :class:`float`
+	:type dtype: numpy.dtype, optional
+
+	:rtype: scipy.sparse.csr_matrix
+
+	:author: Dominic Davis-Foster
+	"""
 
-	return IntensityMatrix(data.time_list, mass_list, intensity_matrix)
+	intensities = data._intensity_values
+	scan_offsets = data._scan_offsets
+	n_scans = len(data)
+
+	rows = []
+	columns = []
+	values = []
+
+	# The scans are binned in chunks to limit the size of the intermediate arrays
+	chunk_size = max(1, 2**22 // max(1, scan_offsets[-1] // max(n_scans, 1)))
+
+	for first in range(0, n_scans, chunk_size):
+		last = min(first + chunk_size, n_scans)
+		points = slice(scan_offsets[first], scan_offsets[last])
+
+		scan_index = numpy.repeat(numpy.arange(first, last), numpy.diff(scan_offsets[first:last + 1]))
+		keep = in_range[points]
+
+		# The occupied cells, in row-major order, and the cell of each point
+		cells, cell_index = numpy.unique(
+				scan_index[keep] * num_bins + bins[points][keep],
+				return_inverse=True,
+				)
+		sums = numpy.bincount(cell_index, weights=intensities[points][keep]).astype(dtype)
+
+		nonzero = sums != 0
+		rows.append(cells[nonzero] // num_bins)
+		columns.append(cells[nonzero] % num_bins)
+		values.append(sums[nonzero])
+
+	rows = numpy.concatenate(rows) if rows else numpy.zeros(0, dtype=int)
+	indptr = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(rows, minlength=n_scans))])
+
+	return scipy.sparse.csr_matrix(
+			(
+					numpy.concatenate(values) if values else numpy.zeros(0, dtype=dtype),
+					numpy.concatenate(columns) if columns else numpy.zeros(0, dtype=int),
+					indptr,
+					),
+			shape=(n_scans, num_bins),
+			)
 
 
 def __fill_bins_old(data: GCMS_data, min_mass: float, max_mass: float, bin_interval: float, bin_left: float, bin_right: float) -> IntensityMatrix:
@@ -37,6 +37,7 @@ import numpy  # type: ignore
 
 # this package
 from pyms import __version__
+from pyms.Axis import Axis, as_axis
 from pyms.Base import pymsBaseClass
 from pyms.Mixins import GetIndexTimeMixin, IntensityArrayMixin, TimeListMixin
 from pyms.Utils.IO import prepare_filepath
@@ -56,6 +57,10 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 	the value of the attribute 'mass'. This is set to the m/z value of the
 	ion chromatogram, or to ``None`` for TIC.
 
+	An IonChromatogram returned by :meth:`IntensityMatrix.get_ic_view() <pyms.IntensityMatrix.IntensityMatrix.get_ic_view>`
+	is a view onto a column of the intensity matrix rather than a copy.
+	Setting the intensities of a writeable view changes the intensity matrix.
+
 	:authors: Lewis Lee, Vladimir Likic, Dominic Davis-Foster (type assertions and properties)
 	"""
 
@@ -63,8 +68,9 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		"""
 		:param ia: Ion chromatogram intensity values
 		:type ia: numpy.array
-		:param time_list: A list of ion chromatogram retention times
-		:type time_list: list
+		:param time_list: A list of ion chromatogram retention times.
+			If this is an :class:`~pyms.Axis.Axis` it is shared rather than copied.
+		:type time_list: list or pyms.Axis.Axis
 		:param mass: Mass of ion chromatogram (Null if TIC)
 		:type mass: int or float
 
@@ -74,7 +80,9 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		if not isinstance(ia, numpy.ndarray):
 			raise TypeError("'ia' must be a numpy array")
 
-		if not is_sequence(time_list) or not all(isinstance(time, Number) for time in time_list):
+		if not isinstance(time_list, Axis) and (
+				not is_sequence(time_list) or not all(isinstance(time, Number) for time in time_list)
+				):
 			raise TypeError("'time_list' must be a list of numbers")
 
 		if len(ia) != len(time_list):
@@ -84,11 +92,12 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 			raise TypeError("'mass' must be a number")
 
 		self._intensity_array = ia
-		self._time_list = time_list
+		self._time_list = as_axis(time_list)
 		self._mass = mass
-		self._time_step = self.__calc_time_step()
-		self._min_rt = min(time_list)
-		self._max_rt = max(time_list)
+		self._view = False
+		self._time_step = self._time_list.mean_step
+		self._min_rt = self._time_list.min
+		self._max_rt = self._time_list.max
 
 	def __len__(self) -> int:
 		"""
@@ -110,10 +119,9 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		:type other: pyms.GCMS.IonChromatogram
 		"""
 
-		ia_for_sub = other.intensity_array
+		ia_for_sub = other._intensity_array[:self._intensity_array.size]
 
-		for i in range(self._intensity_array.size):
-			self._intensity_array[i] = self._intensity_array[i] - ia_for_sub[i]
+		numpy.subtract(self._intensity_array, ia_for_sub, out=self._intensity_array, casting="unsafe")
 
 		return self
 
@@ -128,7 +136,7 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		"""
 
 		if isinstance(other, self.__class__):
-			return self.time_list == other.time_list \
+			return self._time_list == other._time_list \
 					and all(numpy.equal(self.intensity_array, other.intensity_array)) \
 					and self.mass == other.mass
 
@@ -142,13 +150,19 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		"""
 		return IonChromatogram(
 			ia=numpy.copy(self._intensity_array),
-			time_list=self._time_list[:],
+			time_list=self._time_list,
 			mass=copy.copy(self._mass)
 			)
 
 	def __deepcopy__(self, memodict={}):
 		return self.__copy__()
 
+	def __getstate__(self):
+		# A view is pickled with a copy of its intensities, so is no longer a view when loaded
+		state = self.__dict__.copy()
+		state["_view"] = False
+		return state
+
 	def get_intensity_at_index(self, ix: int) -> float:
 		"""
 		Returns intensity at given index
@@ -217,7 +231,14 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		if not isinstance(ia, numpy.ndarray):
 			ia = numpy.array(ia)
 
-		self._intensity_array = ia
+		if self._view:
+			# Write the new values into the intensity matrix
+			if len(ia) != len(self._intensity_array):
+				raise ValueError("Intensity array and time list differ in length")
+
+			self._intensity_array[:] = ia
+		else:
+			self._intensity_array = ia
 
 	def is_tic(self) -> bool:
 		"""
@@ -230,6 +251,19 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 
 		return self._mass is None
 
+	@property
+	def is_view(self) -> bool:
+		"""
+		Returns whether the ion chromatogram is a view onto a column of an
+		:class:`~pyms.IntensityMatrix.IntensityMatrix`, rather than a copy of it.
+
+		:rtype: bool
+
+		:author: Dominic Davis-Foster
+		"""
+
+		return self._view
+
 	@property
 	def mass(self) -> float:
 		"""
@@ -265,7 +299,14 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 		if not isinstance(ia, numpy.ndarray):
 			ia = numpy.array(ia)
 
-		self._intensity_array = ia
+		if self._view:
+			# Write the new values into the intensity matrix
+			if len(ia) != len(self._intensity_array):
+				raise ValueError("Intensity array and time list differ in length")
+
+			self._intensity_array[:] = ia
+		else:
+			self._intensity_array = ia
 
 	@property
 	def time_step(self) -> float:
@@ -280,26 +321,6 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 
 		return self._time_step
 
-	def __calc_time_step(self) -> float:
-		"""
-		Calculates the time step
-
-		:return: Time step value
-		:rtype: float
-
-		:authors: Lewis Lee, Vladimir Likic
-		"""
-
-		td_list = []
-		for ii in range(len(self._time_list) - 1):
-			td = self._time_list[ii + 1] - self._time_list[ii]
-			td_list.append(td)
-
-		td_array = numpy.array(td_list)
-		time_step = td_array.mean()
-
-		return time_step
-
 	def write(self, file_name : Union[str, pathlib.Path], minutes: bool = False, formatting: bool = True):
 		"""
 		Writes the ion chromatogram to the specified file
@@ -323,7 +344,7 @@ class IonChromatogram(pymsBaseClass, TimeListMixin, IntensityArrayMixin, GetInde
 
 		with file_name.open("w") as fp:
 
-			time_list = copy.deepcopy(self._time_list)
+			time_list = self.time_list
 
 			if minutes:
 				for ii in range(len(time_list)):
@@ -24,9 +24,8 @@ Mixins for pyms Classes
 ################################################################################
 
 # stdlib
-import math
 from numbers import Number
-from typing import List
+from typing import List, Sequence, Union
 from warnings import warn
 
 # 3rd party
@@ -35,6 +34,8 @@ import numpy  # type: ignore
 
 # this package
 from pyms import __version__
+from pyms.Axis import Axis
+from pyms.Utils.Utils import is_sequence
 
 
 class MaxMinMassMixin:
@@ -114,6 +115,9 @@ class MassListMixin(MaxMinMassMixin):
 		:author: Vladimir Likic
 		"""
 
+		if isinstance(self._mass_list, Axis):
+			return self._mass_list.tolist()
+
 		return self._mass_list[:]
 
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
@@ -149,7 +153,7 @@ class TimeListMixin:
 		:author: Vladimir Likic
 		"""
 
-		return self._time_list[:]
+		return list(self._time_list)
 
 	@deprecation.deprecated(deprecated_in="2.1.2", removed_in="2.2.0",
 							current_version=__version__,
@@ -278,19 +282,35 @@ class GetIndexTimeMixin:
 		if (time < self._min_rt) or (time > self._max_rt):
 			raise IndexError(f"time {time:.2f} is out of bounds (min: {self._min_rt:.2f}, max: {self._max_rt:.2f})")
 
-		time_list = self._time_list
-		time_diff_min = self._max_rt
-		ix_match = None
+		return self._time_list.nearest_index(time)
+
+	def indices_at_times(self, times: Union[Sequence[float], numpy.ndarray]) -> numpy.ndarray:
+		"""
+		Returns the nearest index corresponding to each of the given times
+
+		:param times: Times in seconds
+		:type times: ~collections.abc.Sequence of float or numpy.ndarray
+
+		:return: Nearest index corresponding to each time
+		:rtype: numpy.ndarray
+
+		:author: Dominic Davis-Foster
+		"""
 
-		for ix in range(len(time_list)):
+		if not is_sequence(times):
+			raise TypeError("'times' must be a Sequence of numbers")
 
-			time_diff = math.fabs(time - time_list[ix])
+		times = numpy.asarray(times)
 
-			if time_diff < time_diff_min:
-				ix_match = ix
-				time_diff_min = time_diff
+		if times.size and times.dtype.kind not in "iuf":
+			raise TypeError("'times' must be a Sequence of numbers")
+
+		out_of_bounds = (times < self._min_rt) | (times > self._max_rt)
+		if out_of_bounds.any():
+			time = times[out_of_bounds].flat[0]
+			raise IndexError(f"time {time:.2f} is out of bounds (min: {self._min_rt:.2f}, max: {self._max_rt:.2f})")
 
-		return ix_match
+		return self._time_list.nearest_indices(times)
 
 	def get_time_at_index(self, ix: int) -> float:
 		"""
@@ -30,6 +30,7 @@ import copy
 from typing import Union
 
 import numpy  # type: ignore
+from scipy import ndimage  # type: ignore
 
 # this package
 from pyms.GCMS.Function import ic_window_points
@@ -39,6 +40,9 @@ from pyms.IonChromatogram import IonChromatogram
 __DEFAULT_WINDOW = 7
 __DEFAULT_POLYNOMIAL_DEGREE = 2
 
+# Number of intensities smoothed at once by savitzky_golay_im
+__BLOCK_POINTS = 2 ** 22
+
 
 def savitzky_golay(ic: IonChromatogram, window: Union[int, str] = __DEFAULT_WINDOW, degree=__DEFAULT_POLYNOMIAL_DEGREE) -> IonChromatogram:
 	"""
@@ -88,11 +92,18 @@ def savitzky_golay(ic: IonChromatogram, window: Union[int, str] = __DEFAULT_WIND
 	return ic_denoise
 
 
-def savitzky_golay_im(im: IntensityMatrix, window: Union[int, str] = __DEFAULT_WINDOW, degree: int = __DEFAULT_POLYNOMIAL_DEGREE) -> IntensityMatrix:
+def savitzky_golay_im(
+		im: IntensityMatrix,
+		window: Union[int, str] = __DEFAULT_WINDOW,
+		degree: int = __DEFAULT_POLYNOMIAL_DEGREE,
+		inplace: bool = False,
+		) -> IntensityMatrix:
 	"""
 	Applies Savitzky-Golay filter on Intensity Matrix
 
-	Simply wraps around the Savitzky Golay function above
+	The filter is applied to every ion chromatogram at once, along the
+	time axis of the intensity array. The intensities of a sparse
+	intensity matrix are smoothed a block of columns at a time.
 
 	:param im: The input IntensityMatrix
 	:type im: pyms.IntensityMatrix.IntensityMatrix
@@ -101,6 +112,9 @@ def savitzky_golay_im(im: IntensityMatrix, window: Union[int, str] = __DEFAULT_W
 	:param degree: degree of the fitting polynomial for the Savitzky-Golay
 		filter
 	:type degree: int, optional
+	:param inplace: Whether to smooth the intensities of ``im`` in place
+		rather than returning a new IntensityMatrix
+	:type inplace: bool, optional
 
 	:return: Smoothed IntensityMatrix
 	:rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -119,16 +133,32 @@ def savitzky_golay_im(im: IntensityMatrix, window: Union[int, str] = __DEFAULT_W
 	if not isinstance(degree, int):
 		raise TypeError("'degree' must be an integer")
 
-	n_scan, n_mz = im.size
+	wing_length = ic_window_points(im.get_ic_view(0), window, half_window=True)
+	coeff = __calc_coeff(wing_length, degree)
+
+	ia = im._intensity_array
+
+	if im.is_sparse:
+		ia_denoise = im._map_sparse_columns(
+				lambda block: ndimage.convolve1d(block, coeff, axis=0, output=numpy.float64, mode="constant"),
+				__BLOCK_POINTS,
+				ia.dtype,
+				)
 
-	im_smooth = copy.deepcopy(im)
+		if inplace:
+			im._intensity_array = ia_denoise
+			return im
 
-	for ii in range(n_mz):
-		ic = im_smooth.get_ic_at_index(ii)
-		ic_smooth = savitzky_golay(ic, window, degree)
-		im_smooth.set_ic_at_index(ii, ic_smooth)
+		return IntensityMatrix(im.time_list, im.mass_list, ia_denoise)
 
-	return im_smooth
+	if inplace:
+		__smooth_columns(ia, coeff, ia)
+		return im
+
+	ia_denoise = numpy.empty_like(ia)
+	__smooth_columns(ia, coeff, ia_denoise)
+
+	return IntensityMatrix(im.time_list, im.mass_list, ia_denoise)
 
 
 def __calc_coeff(num_points: int, pol_degree: int, diff_order: int = 0) -> numpy.ndarray:
@@ -236,3 +266,28 @@ def __smooth(signal, coeff):
 	size = numpy.size(coeff - 1) // 2
 	res = numpy.convolve(signal, coeff)
 	return res[size:-size]
+
+
+def __smooth_columns(intensity_array, coeff, out):
+	"""
+	Applies coefficients calculated by __calc_coeff() along the time axis
+		of a 2-D intensity array, a block of columns at a time
+
+	Gives the same result as applying __smooth() to each column.
+
+	:param intensity_array:
+	:type intensity_array: numpy.ndarray
+	:param coeff:
+	:type coeff: numpy.ndarray
+	:param out: Array to store the result in. May be ``intensity_array``
+	:type out: numpy.ndarray
+	"""
+
+	n_scan, n_mz = intensity_array.shape
+	block_size = max(1, __BLOCK_POINTS // max(1, n_scan))
+
+	for start in range(0, n_mz, block_size):
+		columns = slice(start, start + block_size)
+		out[:, columns] = ndimage.convolve1d(
+				intensity_array[:, columns], coeff, axis=0, output=numpy.float64, mode="constant"
+				)
@@ -25,12 +25,12 @@ Moving window noise filter
 
 # stdlib
 import copy
-from statistics import median
 
 # 3rd party
 from typing import Union
 
 import numpy  # type: ignore
+from scipy import ndimage  # type: ignore
 
 # this package
 from pyms.GCMS.Function import ic_window_points
@@ -40,6 +40,9 @@ from pyms.IonChromatogram import IonChromatogram
 
 __DEFAULT_WINDOW = 3
 
+# Number of intensities smoothed at once by window_smooth_im
+__BLOCK_POINTS = 2 ** 22
+
 
 def window_smooth(ic: IonChromatogram, window: Union[int,str] = __DEFAULT_WINDOW, use_median: bool = False) -> IonChromatogram:
     """
@@ -87,11 +90,17 @@ def window_smooth(ic: IonChromatogram, window: Union[int,str] = __DEFAULT_WINDOW
     return ic_denoise
 
 
-def window_smooth_im(im: IntensityMatrix, window: Union[int,str] = __DEFAULT_WINDOW, use_median: bool = False) -> IntensityMatrix:
+def window_smooth_im(
+        im: IntensityMatrix,
+        window: Union[int, str] = __DEFAULT_WINDOW,
+        use_median: bool = False,
+        inplace: bool = False,
+        ) -> IntensityMatrix:
     """
     Applies window smoothing on Intensity Matrix
 
-              Simply wraps around the window smooth function above
+    Every ion chromatogram is smoothed at once, along the time axis of the intensity array.
+    The intensities of a sparse intensity matrix are smoothed a block of columns at a time.
 
     :param im: The input Intensity Matrix
     :type im: pyms.IntensityMatrix.IntensityMatrix
@@ -100,6 +109,10 @@ def window_smooth_im(im: IntensityMatrix, window: Union[int,str] = __DEFAULT_WIN
     :param use_median: An indicator whether the mean or median window smoothing
         to be used
     :type use_median: bool, optional
+    :param inplace: Whether to smooth the intensities of ``im`` in place
+        rather than returning a new IntensityMatrix. The intensities keep
+        the dtype of the matrix.
+    :type inplace: bool, optional
 
     :return: Smoothed Intensity Matrix
     :rtype: pyms.IntensityMatrix.IntensityMatrix
@@ -111,22 +124,73 @@ def window_smooth_im(im: IntensityMatrix, window: Union[int,str] = __DEFAULT_WIN
     if not isinstance(im, IntensityMatrix):
         raise TypeError("'im' must be an IntensityMatrix object")
 
-    n_scan, n_mz = im.size
+    if not isinstance(window, (int, str)):
+        raise TypeError("'window' must be a int or string")
+
+    if not isinstance(use_median, bool):
+        raise TypeError("'median' must be a Boolean")
+
+    wing_length = ic_window_points(im.get_ic_view(0), window, half_window=True)
+
+    if use_median:
+        smooth = __median_window
+    else:
+        smooth = __mean_window
+
+    ia = im._intensity_array
+
+    if im.is_sparse:
+        dtype = ia.dtype if inplace else __smoothed_dtype(ia)
+        ia_denoise = im._map_sparse_columns(lambda block: smooth(block, wing_length), __BLOCK_POINTS, dtype)
+
+        if inplace:
+            im._intensity_array = ia_denoise
+            return im
+
+        return IntensityMatrix(im.time_list, im.mass_list, ia_denoise)
+
+    if inplace:
+        ia_denoise = ia
+    else:
+        ia_denoise = numpy.empty(ia.shape, dtype=__smoothed_dtype(ia))
+
+    # Work on a block of columns at a time to limit the size of temporary arrays
+    n_scan, n_mz = ia.shape
+    block_size = max(1, __BLOCK_POINTS // max(1, n_scan))
+
+    for start in range(0, n_mz, block_size):
+        columns = slice(start, start + block_size)
+        ia_denoise[:, columns] = smooth(ia[:, columns], wing_length)
+
+    if inplace:
+        return im
+
+    return IntensityMatrix(im.time_list, im.mass_list, ia_denoise)
+
+
+def __smoothed_dtype(ia: numpy.ndarray) -> numpy.dtype:
+    """
+    Returns the dtype of the smoothed intensities; that of ``ia`` if it is floating point, otherwise float64.
+
+    :param ia: Intensity array
+    :type ia: numpy.core.ndarray
 
-    im_smooth = copy.deepcopy(im)
+    :rtype: numpy.dtype
+    """
 
-    for ii in range(n_mz):
-        ic = im_smooth.get_ic_at_index(ii)
-        ic_smooth = window_smooth(ic, window, use_median)
-        im_smooth.set_ic_at_index(ii, ic_smooth)
+    if ia.dtype.kind == 'f':
+        return ia.dtype
 
-    return im_smooth
+    return numpy.dtype(numpy.float64)
 
 
 def __mean_window(ia: numpy.core.ndarray, wing_length: int) -> numpy.core.ndarray:
     """
     Applies mean-window averaging on the array of intensities.
 
+    The window is truncated at the ends of the array.
+    If ``ia`` is 2-D each column is averaged separately.
+
     :param ia: Intensity array
     :type ia: numpy.core.ndarray
     :param wing_length: An integer value representing the number of
@@ -139,26 +203,30 @@ def __mean_window(ia: numpy.core.ndarray, wing_length: int) -> numpy.core.ndarra
     :author: Vladimir Likic
     """
 
-    ia_denoise = numpy.repeat([0], ia.size)
+    ia = numpy.asarray(ia)
+    size = len(ia)
 
-    index = 0
-    end = ia.size - 1
+    # cumulative[i] is the sum of the first i intensities
+    cumulative = numpy.zeros((size + 1,) + ia.shape[1:], dtype=numpy.float64)
+    numpy.cumsum(ia, axis=0, out=cumulative[1:])
 
-    while index <= end:
-        left = index - wing_length
-        right = index + wing_length + 1
-        if left < 0:
-            left = 0
-        ia_denoise[index] = ia[left:right].mean()
-        index = index + 1
+    index = numpy.arange(size)
+    left = numpy.maximum(index - wing_length, 0)
+    right = numpy.minimum(index + wing_length + 1, size)
+    counts = (right - left).reshape((size,) + (1,) * (ia.ndim - 1))
 
-    return ia_denoise
+    ia_denoise = (cumulative[right] - cumulative[left]) / counts
 
+    return ia_denoise.astype(__smoothed_dtype(ia), copy=False)
 
-def __median_window(ia: IntensityMatrix, wing_length: int) -> numpy.ndarray:
+
+def __median_window(ia: numpy.core.ndarray, wing_length: int) -> numpy.core.ndarray:
     """
     Applies median-window averaging on the array of intensities.
 
+    The window is truncated at the ends of the array.
+    If ``ia`` is 2-D each column is averaged separately.
+
     :param ia: Intensity array
     :type ia: numpy.core.ndarray
     :param wing_length: An integer value representing the number of
@@ -171,17 +239,18 @@ def __median_window(ia: IntensityMatrix, wing_length: int) -> numpy.ndarray:
     :author: Vladimir Likic
     """
 
-    ia_denoise = numpy.repeat([0], ia.size)
+    ia = numpy.asarray(ia, dtype=numpy.float64)
+    size = len(ia)
 
-    index = 0
-    end = ia.size - 1
+    footprint_size = (2 * wing_length + 1,) + (1,) * (ia.ndim - 1)
+    ia_denoise = ndimage.median_filter(ia, size=footprint_size, mode="nearest")
 
-    while index <= end:
-        left = index - wing_length
+    # median_filter pads the ends of the array, so recalculate the
+    # points whose windows would extend beyond it
+    edges = set(range(min(wing_length, size))) | set(range(max(size - wing_length, 0), size))
+    for index in edges:
+        left = max(index - wing_length, 0)
         right = index + wing_length + 1
-        if left < 0:
-            left = 0
-        ia_denoise[index] = median(ia[left:right])
-        index = index + 1
+        ia_denoise[index] = numpy.median(ia[left:right], axis=0)
 
     return ia_denoise
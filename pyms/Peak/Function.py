@@ -26,19 +26,62 @@ Functions related to Peak modification
 # stdlib
 import copy
 from math import ceil
-from numbers import Number
 from statistics import median
+from typing import Dict, List, NamedTuple, Sequence, Tuple
 
 # 3rd party
 import deprecation  # type: ignore
+import numpy  # type: ignore
 from numpy import percentile  # type: ignore
 
 # this package
 from pyms import __version__
 from pyms.IntensityMatrix import IntensityMatrix
 from pyms.Peak import Peak
+from pyms.Peak.List.Function import is_peak_list
 from pyms.Utils.Utils import is_sequence
 
+# Number of points averaged to find the edge of a peak in half_area()
+_EDGE_WIDTH = 3
+
+# Initial number of points searched outward from each apex in half_area()
+_WINDOW_WIDTH = 8
+
+# Number of intensities of a sparse intensity matrix converted to a dense array at once
+_BLOCK_POINTS = 2 ** 22
+
+
+class IonAreas(NamedTuple):
+	"""
+	Areas and boundaries of the ions of a list of peaks, one element per (peak, ion) pair.
+
+	Returned by :func:`~pyms.Peak.Function.peak_list_ion_areas`.
+	"""
+
+	#: Index of the peak in the peak list
+	peak_index: numpy.ndarray
+
+	#: The mass of the ion
+	mass: numpy.ndarray
+
+	#: Index of the ion chromatogram in the intensity matrix
+	column: numpy.ndarray
+
+	#: Area of the ion chromatogram between the boundaries
+	area: numpy.ndarray
+
+	#: Left boundary offset from the apex, in points
+	left: numpy.ndarray
+
+	#: Right boundary offset from the apex, in points
+	right: numpy.ndarray
+
+	#: Whether the ion is shared with a neighbouring peak on the left
+	left_shared: numpy.ndarray
+
+	#: Whether the ion is shared with a neighbouring peak on the right
+	right_shared: numpy.ndarray
+
 
 def peak_sum_area(im, peak, single_ion=False, max_bound=0):
 	"""
@@ -71,26 +114,14 @@ def peak_sum_area(im, peak, single_ion=False, max_bound=0):
 	if not isinstance(max_bound, int):
 		raise TypeError("'max_bound' must be an integer")
 
-	sum_area = 0
-	# Use internal values (not copy)
-	# mat = im.matrix_list
-	mat = im.intensity_array
-	ms = peak.mass_spectrum
-	rt = peak.rt
-	apex = im.get_index_at_time(rt)
-
-	# get peak masses with non-zero intensity
-	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
+	ion_areas = peak_list_ion_areas(im, [peak], max_bound)
+	mass_list = peak.mass_spectrum.mass_list
 
+	sum_area = 0
 	area_dict = {}
-	# get stats on boundaries
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex, max_bound)
+	for ii, area in zip(ion_areas.column.tolist(), ion_areas.area.tolist()):
 		# need actual mass for single ion areas
-		actual_mass = ms.mass_list[ii]
-		area_dict[actual_mass] = area
+		area_dict[mass_list[ii]] = area
 		sum_area += area
 
 	if single_ion:
@@ -122,31 +153,7 @@ def peak_pt_bounds(im, peak):
 	if not isinstance(peak, Peak):
 		raise TypeError("'peak' must be a Peak object")
 
-	# Use internal values (not copy)
-	# mat = im.matrix_list
-	mat = im.intensity_array
-	ms = peak.mass_spectrum
-	rt = peak.rt
-	apex = im.get_index_at_time(rt)
-
-	# get peak masses with non-zero intensity
-	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
-
-	left_list = []
-	right_list = []
-
-	# get stats on boundaries
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex, 0)
-		left_list.append(left)
-		right_list.append(right)
-
-	left_list.sort()
-	right_list.sort()
-
-	return int(ceil(percentile(left_list, 95))), int(ceil(percentile(right_list, 95)))
+	return peak_list_pt_bounds(im, [peak])[0]
 
 
 def peak_top_ion_areas(im, peak, n_top_ions=5, max_bound=0):
@@ -182,24 +189,362 @@ def peak_top_ion_areas(im, peak, n_top_ions=5, max_bound=0):
 	if not isinstance(max_bound, int):
 		raise TypeError("'max_bound' must be an integer")
 
-	# ms = peak.mass_spectrum
-	rt = peak.rt
-	apex = im.get_index_at_time(rt)
+	return _top_ion_areas(im, [peak], n_top_ions, max_bound)[0]
 
-	ion_areas = {}  # Dictionary to store ion:ion_area pairs
 
-	top_ions = peak.top_ions(n_top_ions)
-	# print(top_ions)
+def peak_list_ion_areas(im: IntensityMatrix, peak_list: Sequence[Peak], max_bound: int = 0, tol: float = 0.5) -> IonAreas:
+	"""
+	Calculate the areas and boundaries of the ions of every peak in a peak list at once.
 
-	for ion in top_ions:
-		ion_chrom = im.get_ic_at_mass(ion)
-		# need ia as a list not numpy array so use .tolist()
-		ia = ion_chrom.intensity_array.tolist()
-		area, left, right, l_share, r_share = ion_area(ia, apex, max_bound)
-		# need actual mass for single ion areas
-		ion_areas[ion] = area
+	As for :func:`~pyms.Peak.Function.peak_sum_area`, the ions of each peak
+	are those with non-zero intensity in its mass spectrum, and the boundaries
+	are found by :func:`~pyms.Peak.Function.ion_area`.
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param peak_list: The peaks to calculate ion areas for
+	:type peak_list: list of pyms.Peak.Class.Peak
+	:param max_bound: Optional value to limit size of detected bound, default 0
+	:type max_bound: int, optional
+	:param tol: Percentage tolerance of added area to current area, default 0.5
+	:type tol: float, optional
+
+	:return: The area, boundaries and shared flags of each (peak, ion) pair
+	:rtype: pyms.Peak.Function.IonAreas
+
+	:author: Dominic Davis-Foster
+	"""
+
+	if not isinstance(im, IntensityMatrix):
+		raise TypeError("'im' must be an IntensityMatrix object")
+
+	if not is_peak_list(peak_list):
+		raise TypeError("'peak_list' must be a list of Peak objects")
+
+	if not isinstance(max_bound, int):
+		raise TypeError("'max_bound' must be an integer")
+
+	if not isinstance(tol, float):
+		raise TypeError("'tol' must be a float")
+
+	apexes = im.indices_at_times([peak.rt for peak in peak_list])
+	peak_index, columns, masses = _apexing_ions(peak_list)
+
+	area, left, right, left_shared, right_shared = _im_ion_areas(im, apexes[peak_index], columns, max_bound, tol)
+
+	return IonAreas(peak_index, masses, columns, area, left, right, left_shared, right_shared)
+
+
+def peak_list_areas(im: IntensityMatrix, peak_list: Sequence[Peak], n_top_ions: int = 5, max_bound: int = 0) -> List[float]:
+	"""
+	Calculate the areas of every peak in a peak list, and the areas of their most abundant ions.
+
+	This is equivalent to setting ``peak.area`` to the result of
+	:func:`~pyms.Peak.Function.peak_sum_area` and ``peak.ion_areas`` to the
+	result of :func:`~pyms.Peak.Function.peak_top_ion_areas` for each peak,
+	but calculates the areas of all the peaks at once.
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param peak_list: The peaks to calculate areas for. Their ``area`` and ``ion_areas`` are set.
+	:type peak_list: list of pyms.Peak.Class.Peak
+	:param n_top_ions: Number of top ions to calculate areas for, default 5
+	:type n_top_ions: int, optional
+	:param max_bound: Optional value to limit size of detected bound, default 0
+	:type max_bound: int, optional
+
+	:return: The area of each peak
+	:rtype: list of float
+
+	:author: Dominic Davis-Foster
+	"""
+
+	if not isinstance(n_top_ions, int):
+		raise TypeError("'n_top_ions' must be an integer")
+
+	ion_areas = peak_list_ion_areas(im, peak_list, max_bound)
+
+	# Sum the ion areas of each peak, in the same order as peak_sum_area()
+	sum_areas = numpy.bincount(ion_areas.peak_index, weights=ion_areas.area, minlength=len(peak_list)).tolist()
+	top_ion_areas = _top_ion_areas(im, peak_list, n_top_ions, max_bound)
+
+	for peak, area, area_dict in zip(peak_list, sum_areas, top_ion_areas):
+		peak.area = area
+		peak.ion_areas = area_dict
+
+	return sum_areas
+
+
+def peak_list_pt_bounds(im: IntensityMatrix, peak_list: Sequence[Peak]) -> List[Tuple[int, int]]:
+	"""
+	Approximate the bounds (left and right offsets from apex) of every peak in a peak list.
+
+	This is equivalent to calling :func:`~pyms.Peak.Function.peak_pt_bounds`
+	for each peak, but calculates the bounds of all the peaks at once.
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param peak_list: The peaks to calculate bounds for
+	:type peak_list: list of pyms.Peak.Class.Peak
+
+	:return: The left and right bounds of each peak
+	:rtype: list of tuple of ints
+
+	:author: Dominic Davis-Foster
+	"""
+
+	ion_areas = peak_list_ion_areas(im, peak_list)
+
+	bounds = []
+	for index in range(len(peak_list)):
+		in_peak = ion_areas.peak_index == index
+		bounds.append((
+				int(ceil(percentile(ion_areas.left[in_peak], 95))),
+				int(ceil(percentile(ion_areas.right[in_peak], 95))),
+				))
+
+	return bounds
+
+
+def _top_ion_areas(im: IntensityMatrix, peak_list: Sequence[Peak], n_top_ions: int, max_bound: int) -> List[Dict]:
+	"""
+	Returns dictionaries of ion:ion_area pairs for the most abundant ions of each peak
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param peak_list: The peaks to calculate ion areas for
+	:type peak_list: list of pyms.Peak.Class.Peak
+	:param n_top_ions: Number of top ions to return areas for
+	:type n_top_ions: int
+	:param max_bound: Value to limit size of detected bound
+	:type max_bound: int
+
+	:rtype: list of dict
+	"""
+
+	apexes = im.indices_at_times([peak.rt for peak in peak_list])
+	top_ions = [peak.top_ions(n_top_ions) for peak in peak_list]
+
+	peak_index = numpy.array([index for index, ions in enumerate(top_ions) for _ in ions], dtype=int)
+	ions = numpy.array([ion for ions in top_ions for ion in ions], dtype=float)
+
+	if len(ions) and (ions.min() < im.min_mass or ions.max() > im.max_mass):
+		raise IndexError("mass is out of range")
+
+	columns = im.indices_of_masses(ions)
+	area = _im_ion_areas(im, apexes[peak_index], columns, max_bound, 0.5)[0].tolist()
+
+	area_dicts = [{} for _ in peak_list]
+	for index, ion, ion_area_value in zip(peak_index.tolist(), (ion for ions in top_ions for ion in ions), area):
+		area_dicts[index][ion] = ion_area_value
+
+	return area_dicts
+
+
+def _apexing_ions(peak_list: Sequence[Peak]) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+	"""
+	Returns the ions with non-zero intensity in the mass spectrum of each peak
+
+	:param peak_list: The peaks to find the ions of
+	:type peak_list: list of pyms.Peak.Class.Peak
+
+	:return: Arrays of the index of the peak, the index of the ion in the mass spectrum, and its mass
+	:rtype: tuple
+	"""
+
+	peak_index = [numpy.zeros(0, dtype=int)]
+	mass_index = [numpy.zeros(0, dtype=int)]
+	masses = [numpy.zeros(0)]
 
-	return ion_areas
+	for index, peak in enumerate(peak_list):
+		mass_ii = numpy.flatnonzero(numpy.asarray(peak.mass_spectrum.mass_spec) > 0)
+		peak_index.append(numpy.full(len(mass_ii), index, dtype=int))
+		mass_index.append(mass_ii)
+		masses.append(numpy.asarray(peak.mass_spectrum.mass_list, dtype=float)[mass_ii])
+
+	return numpy.concatenate(peak_index), numpy.concatenate(mass_index), numpy.concatenate(masses)
+
+
+def _im_ion_areas(im, apexes, columns, max_bound, tol):
+	"""
+	Applies :func:`~pyms.Peak.Function._ion_areas` to the intensities of an intensity matrix.
+
+	Only the ion chromatograms in ``columns`` of a sparse intensity matrix
+	are converted to dense arrays, a block at a time.
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param apexes: The index of the apex of each pair
+	:type apexes: numpy.ndarray
+	:param columns: The column of the ion chromatogram of each pair
+	:type columns: numpy.ndarray
+	:param max_bound: Value to limit size of detected bound
+	:type max_bound: int
+	:param tol: Percentage tolerance of added area to current area
+	:type tol: float
+
+	:return: Arrays of areas, left and right boundary offsets, shared left, shared right
+	:rtype: tuple
+	"""
+
+	if not im.is_sparse:
+		return _ion_areas(im._intensity_array, apexes, columns, max_bound, tol)
+
+	sparse_columns = im._sparse_columns()
+	n_scan = sparse_columns.shape[0]
+	block_size = max(1, _BLOCK_POINTS // max(1, n_scan))
+
+	apexes = numpy.asarray(apexes, dtype=int)
+	unique_columns, inverse = numpy.unique(numpy.asarray(columns, dtype=int), return_inverse=True)
+
+	# Group the pairs by ion chromatogram, so each block's pairs are contiguous
+	order = numpy.argsort(inverse, kind="mergesort")
+	sorted_inverse = inverse[order]
+
+	parts = []
+	for first in range(0, max(len(unique_columns), 1), block_size):
+		block = sparse_columns[:, unique_columns[first:first + block_size]].toarray()
+		lo, hi = numpy.searchsorted(sorted_inverse, [first, first + block_size])
+		pairs = order[lo:hi]
+		parts.append(_ion_areas(block, apexes[pairs], inverse[pairs] - first, max_bound, tol))
+
+	results = []
+	for values in zip(*parts):
+		values = numpy.concatenate(values)
+		result = numpy.empty_like(values)
+		result[order] = values
+		results.append(result)
+
+	return tuple(results)
+
+
+def _ion_areas(intensity_array, apexes, columns, max_bound, tol):
+	"""
+	Applies :func:`~pyms.Peak.Function.ion_area` to many (apex, ion chromatogram) pairs at once,
+	without checking the arguments.
+
+	:param intensity_array: Intensities, with one ion chromatogram per column
+	:type intensity_array: numpy.ndarray
+	:param apexes: The index of the apex of each pair
+	:type apexes: numpy.ndarray
+	:param columns: The column of the ion chromatogram of each pair
+	:type columns: numpy.ndarray
+	:param max_bound: Value to limit size of detected bound
+	:type max_bound: int
+	:param tol: Percentage tolerance of added area to current area
+	:type tol: float
+
+	:return: Arrays of areas, left and right boundary offsets, shared left, shared right
+	:rtype: tuple
+	"""
+
+	intensity_array = numpy.asarray(intensity_array)
+	apexes = numpy.asarray(apexes, dtype=int)
+	columns = numpy.asarray(columns, dtype=int)
+
+	l_area, left, l_share = _half_areas(intensity_array, apexes, columns, -1, max_bound, tol)
+	r_area, right, r_share = _half_areas(intensity_array, apexes, columns, 1, max_bound, tol)
+
+	# counted apex twice for tolerance, now ignore
+	r_area -= intensity_array[apexes, columns]
+
+	return l_area + r_area, left, right, l_share, r_share
+
+
+def _half_areas(intensity_array, apexes, columns, direction, max_bound, tol):
+	"""
+	Applies :func:`~pyms.Peak.Function.half_area` to many (apex, ion chromatogram) pairs at once.
+
+	The intensities in a window of points outward from each apex are gathered
+	into a matrix. The running areas are then its cumulative sums and the edge
+	values its moving averages, so the boundary of every pair is found with a
+	single comparison. Pairs whose boundary lies outside the window are
+	searched again with a window twice the size.
+
+	The sums are accumulated outward from the apex in the same order as
+	:func:`~pyms.Peak.Function.half_area`, so the results are identical.
+
+	:param intensity_array: Intensities, with one ion chromatogram per column
+	:type intensity_array: numpy.ndarray
+	:param apexes: The index of the apex of each pair
+	:type apexes: numpy.ndarray
+	:param columns: The column of the ion chromatogram of each pair
+	:type columns: numpy.ndarray
+	:param direction: ``-1`` to search to the left of the apexes, ``1`` to search to the right
+	:type direction: int
+	:param max_bound: Value to limit size of detected bound
+	:type max_bound: int
+	:param tol: Percentage tolerance of added area to current area
+	:type tol: float
+
+	:return: Arrays of half peak areas, boundary offsets, and shared flags
+	:rtype: tuple
+	"""
+
+	tol = tol / 200.0  # halve and convert from percent
+
+	n_scans = len(intensity_array)
+	n_pairs = len(apexes)
+
+	# Number of points from each apex to the end of the chromatogram, inclusive
+	if direction < 0:
+		lengths = apexes + 1
+	else:
+		lengths = n_scans - apexes
+
+	if max_bound < 1:
+		limits = lengths
+	else:
+		limits = numpy.minimum(max_bound + 1, lengths)
+
+	area_out = numpy.zeros(n_pairs, dtype=numpy.zeros(0, dtype=intensity_array.dtype).cumsum().dtype)
+	offset_out = numpy.zeros(n_pairs, dtype=int)
+	shared_out = numpy.zeros(n_pairs, dtype=bool)
+
+	pairs = numpy.arange(n_pairs)
+	width = _WINDOW_WIDTH
+
+	while len(pairs):
+		# There is no need to look beyond the furthest limit
+		width = min(width, int(limits[pairs].max()))
+
+		# Intensities from each apex outwards, or zero beyond the end of the chromatogram
+		offsets = numpy.arange(width + _EDGE_WIDTH - 1)
+		inside = offsets < lengths[pairs, None]
+		rows = (apexes[pairs, None] + direction * offsets).clip(0, n_scans - 1)
+		values = numpy.where(inside, intensity_array[rows, columns[pairs, None]], 0)
+
+		area = numpy.cumsum(values[:, :width], axis=1)
+
+		edge = values[:, :width].copy()
+		for shift in range(1, _EDGE_WIDTH):
+			edge += values[:, shift:width + shift]
+		edge = edge / _EDGE_WIDTH
+
+		# The initial old edge is bigger than the expected edge
+		old_edge = numpy.empty_like(edge)
+		old_edge[:, 0] = 2 * edge[:, 0]
+		old_edge[:, 1:] = edge[:, :-1]
+
+		# Keep moving outwards until:
+		# i) tolerance reached
+		# ii) edge area starts increasing
+		# iii) bound reached
+		stop = ~((area * tol < edge) & (edge < old_edge))
+		stop |= numpy.arange(1, width + 1) >= limits[pairs, None]
+
+		found = stop.any(axis=1)
+		rows = numpy.flatnonzero(found)
+		index = stop[rows].argmax(axis=1)
+
+		area_out[pairs[rows]] = area[rows, index]
+		offset_out[pairs[rows]] = index
+		shared_out[pairs[rows]] = edge[rows, index] >= old_edge[rows, index]
+
+		pairs = pairs[~found]
+		width *= 2
+
+	return area_out, offset_out, shared_out
 
 
 @deprecation.deprecated(deprecated_in="2.0.0", removed_in="2.2.0",
@@ -287,8 +632,8 @@ def ion_area(ia, apex, max_bound=0, tol=0.5):
 	"""
 	Find bounds of peak by summing intensities until change in sum is less than 'tol' percent of the current area.
 
-	:param ia: List of intensities for a given mass
-	:type ia: list
+	:param ia: List or array of intensities for a given mass
+	:type ia: list or numpy.ndarray
 	:param apex: Index of the peak apex.
 	:type apex: int
 	:param max_bound: Optional value to limit size of detected bound, default 0
@@ -302,27 +647,73 @@ def ion_area(ia, apex, max_bound=0, tol=0.5):
 	:authors: Andrew Isaac, Dominic Davis-Foster (type assertions)
 	"""
 
-	if not isinstance(ia, list) or not isinstance(ia[0], Number):
-		raise TypeError("'ia' must be a list of numbers")
-	if not isinstance(apex, int):
+	ia = _as_intensities(ia, ndim=1)
+
+	if not isinstance(apex, (int, numpy.integer)):
 		raise TypeError("'apex' must be an integer")
+
+	area, left, right, l_share, r_share = ion_areas(ia, apex, max_bound=max_bound, tol=tol)
+
+	return area.item(), left.item(), right.item(), l_share.item(), r_share.item()
+
+
+def ion_areas(ia, apexes, columns=0, max_bound=0, tol=0.5):
+	"""
+	Find the bounds and areas of many peaks at once, using the same rule as
+	:func:`~pyms.Peak.Function.ion_area`.
+
+	``apexes`` and ``columns`` are broadcast against each other, so the areas of
+	several apexes in one ion chromatogram, one apex in several ion chromatograms,
+	or every combination of the two (e.g. ``apexes[:, None]`` and ``columns[None, :]``)
+	can be found in one call.
+
+	:param ia: Intensities for a single mass, or a 2D array with one ion chromatogram
+		per column, such as :attr:`IntensityMatrix.intensity_array <pyms.IntensityMatrix.IntensityMatrix.intensity_array>`
+	:type ia: list or numpy.ndarray
+	:param apexes: Index of each peak apex
+	:type apexes: int or array_like
+	:param columns: Column of ``ia`` containing each peak, default 0
+	:type columns: int or array_like, optional
+	:param max_bound: Optional value to limit size of detected bound, default 0
+	:type max_bound: int, optional
+	:param tol: Percentage tolerance of added area to current area, default 0.5
+	:type tol: float, optional
+
+	:return: Arrays of areas, left and right boundary offsets, shared left, shared right,
+		with the broadcast shape of ``apexes`` and ``columns``
+	:rtype: tuple of numpy.ndarray
+
+	:author: Dominic Davis-Foster
+	"""
+
+	ia = _as_intensities(ia)
+	if ia.ndim == 1:
+		ia = ia[:, None]
+
+	apexes = numpy.asarray(apexes)
+	columns = numpy.asarray(columns)
+
+	# An empty list gives a float array
+	if apexes.dtype.kind not in "iu" and apexes.size:
+		raise TypeError("'apexes' must be integers")
+	if columns.dtype.kind not in "iu" and columns.size:
+		raise TypeError("'columns' must be integers")
 	if not isinstance(max_bound, int):
 		raise TypeError("'max_bound' must be an integer")
 	if not isinstance(tol, float):
 		raise TypeError("'tol' must be a float")
 
-	# Left area
-	lhs = ia[:apex + 1]
-	lhs.reverse()  # reverse, as search to right is bounds safe
-	l_area, left, l_share = half_area(lhs, max_bound, tol)
+	apexes, columns = numpy.broadcast_arrays(apexes.astype(int), columns.astype(int))
+	shape = apexes.shape
 
-	# Right area
-	rhs = ia[apex:]
-	r_area, right, r_share = half_area(rhs, max_bound, tol)
-	r_area -= ia[apex]  # counted apex twice for tollerence, now ignore
+	if apexes.size and (apexes.min() < 0 or apexes.max() >= ia.shape[0]):
+		raise IndexError("'apexes' out of range")
+	if columns.size and (columns.min() < 0 or columns.max() >= ia.shape[1]):
+		raise IndexError("'columns' out of range")
 
-	# Put it all together
-	return l_area + r_area, left, right, l_share, r_share
+	results = _ion_areas(ia, apexes.ravel(), columns.ravel(), max_bound, tol)
+
+	return tuple(result.reshape(shape) for result in results)
 
 
 def half_area(ia, max_bound=0, tol=0.5):
@@ -330,8 +721,8 @@ def half_area(ia, max_bound=0, tol=0.5):
 	Find bound of peak by summing intensities until change in sum is less than
 	'tol' percent of the current area.
 
-	:param ia: List of intensities from Peak apex for a given mass
-	:type ia: list
+	:param ia: List or array of intensities from Peak apex for a given mass
+	:type ia: list or numpy.ndarray
 	:param max_bound: Optional value to limit size of detected bound, default 0
 	:type max_bound: int, optional
 	:param tol: Percentage tolerance of added area to current area, default 0.5
@@ -343,47 +734,46 @@ def half_area(ia, max_bound=0, tol=0.5):
 	:authors: Andrew Isaac, Dominic Davis-Foster (type assertions)
 	"""
 
-	if not isinstance(ia, list) or not isinstance(ia[0], Number):
-		raise TypeError("'ia' must be a list of numbers")
+	ia = _as_intensities(ia, ndim=1)
+
 	if not isinstance(max_bound, int):
 		raise TypeError("'max_bound' must be an integer")
 	if not isinstance(tol, float):
 		raise TypeError("'tol' must be a float")
 
-	tol = tol / 200.0  # halve and convert from percent
+	origin = numpy.zeros(1, dtype=int)
+	area, index, shared = _half_areas(ia[:, None], origin, origin, 1, max_bound, tol)
 
-	# Default number of points to sum new area across, for smoothing
-	wide = 3
-
-	# start at 0, compare average value of 'wide' points to the right,
-	# centre 'wide' points on edge point,
-	# and keep moving right until:
-	# i) tollerence reached
-	# ii) edge area starts increasing
-	# iii) bound reached
-
-	#
-	# initialise areas and bounds
-	shared = False
-	area = ia[0]
-	edge = float(sum(ia[0:wide])) / wide
-	old_edge = 2 * edge  # bigger than expected edge
-	index = 1
-	if max_bound < 1:
-		limit = len(ia)
-	else:
-		limit = min(max_bound + 1, len(ia))
-	# while edge > area * tol and edge < old_edge and index < limit:
-	while area * tol < edge < old_edge and index < limit:
-		old_edge = edge
-		area += ia[index]
-		edge = float(sum(ia[index:index + wide])) / wide  # bounds safe
-		index += 1
-	if edge >= old_edge:
-		shared = True
-	index -= 1
+	return area.item(), index.item(), shared.item()
+
+
+def _as_intensities(ia, ndim=None) -> numpy.ndarray:
+	"""
+	Returns ``ia`` as a non-empty numpy array of numbers
+
+	:param ia: List or array of intensities
+	:type ia: list or numpy.ndarray
+	:param ndim: The required number of dimensions. If :py:obj:`None` either 1 or 2 dimensions are allowed.
+	:type ndim: int, optional
 
-	return area, index, shared
+	:rtype: numpy.ndarray
+	"""
+
+	if not isinstance(ia, (list, numpy.ndarray)):
+		raise TypeError("'ia' must be a list or array of numbers")
+
+	ia = numpy.asarray(ia)
+
+	if ia.dtype.kind not in "iuf":
+		raise TypeError("'ia' must be a list or array of numbers")
+	if ndim is None and ia.ndim not in {1, 2}:
+		raise ValueError("'ia' must be a one or two dimensional array")
+	if ndim is not None and ia.ndim != ndim:
+		raise ValueError(f"'ia' must be a {ndim} dimensional array")
+	if not ia.size:
+		raise ValueError("'ia' must not be empty")
+
+	return ia
 
 
 def median_bounds(im, peak, shared=True):
@@ -410,37 +800,70 @@ def median_bounds(im, peak, shared=True):
 	if not isinstance(shared, bool):
 		raise TypeError("'shared' must be a boolean")
 
-	mat = im.intensity_array
-	ms = peak.mass_spectrum
-	rt = peak.rt
-	apex = im.get_index_at_time(rt)
+	return peak_list_median_bounds(im, [peak], shared)[0]
+
+
+def peak_list_median_bounds(im: IntensityMatrix, peak_list: Sequence[Peak], shared: bool = True) -> List[Tuple]:
+	"""
+	Calculates the median of the left and right bounds found for each apexing peak mass,
+	for every peak in a peak list.
+
+	This is equivalent to calling :func:`~pyms.Peak.Function.median_bounds`
+	for each peak, but calculates the bounds of all the peaks at once.
+
+	:param im: The originating IntensityMatrix object
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param peak_list: The peaks to calculate bounds for
+	:type peak_list: list of pyms.Peak.Class.Peak
+	:param shared: Include shared ions shared with neighbouring peak, default True
+	:type shared: bool, optional
+
+	:return: Median left and right boundary offset in points for each peak
+	:rtype: list of tuple
+
+	:author: Dominic Davis-Foster
+	"""
+
+	if not isinstance(im, IntensityMatrix):
+		raise TypeError("'im' must be an IntensityMatrix object")
+
+	if not is_peak_list(peak_list):
+		raise TypeError("'peak_list' must be a list of Peak objects")
+
+	if not isinstance(shared, bool):
+		raise TypeError("'shared' must be a boolean")
+
+	apexes = im.indices_at_times([peak.rt for peak in peak_list])
+
 	# check if RT based index is similar to stored index
-	tmp = peak.bounds
-	if is_sequence(tmp) and apex - 1 < tmp[1] < apex + 1:
-		apex = tmp[1]
-
-	# get peak masses with non-zero intensity
-	mass_ii = [ii for ii in range(len(ms.mass_list)) if ms.mass_spec[ii] > 0]
-
-	# get stats on boundaries
-	left_list = []
-	right_list = []
-	for ii in mass_ii:
-		# get ion chromatogram as list
-		ia = [mat[scan][ii] for scan in range(len(mat))]
-		area, left, right, l_share, r_share = ion_area(ia, apex)
-		if shared or not l_share:
-			left_list.append(left)
-		if shared or not r_share:
-			right_list.append(right)
-
-	# return medians
-	# NB if shared=True, lists maybe empty
-	l_med = 0
-	r_med = 0
-	if len(left_list) > 0:
-		l_med = median(left_list)
-	if len(right_list) > 0:
-		r_med = median(right_list)
-
-	return l_med, r_med
+	for index, peak in enumerate(peak_list):
+		tmp = peak.bounds
+		if is_sequence(tmp) and apexes[index] - 1 < tmp[1] < apexes[index] + 1:
+			apexes[index] = tmp[1]
+
+	peak_index, columns, masses = _apexing_ions(peak_list)
+	area, left, right, l_share, r_share = _im_ion_areas(im, apexes[peak_index], columns, 0, 0.5)
+
+	bounds = []
+	for index in range(len(peak_list)):
+		in_peak = peak_index == index
+
+		if shared:
+			left_list = left[in_peak].tolist()
+			right_list = right[in_peak].tolist()
+		else:
+			left_list = left[in_peak & ~l_share].tolist()
+			right_list = right[in_peak & ~r_share].tolist()
+
+		# return medians
+		# NB if shared=True, lists maybe empty
+		l_med = 0
+		r_med = 0
+		if len(left_list) > 0:
+			l_med = median(left_list)
+		if len(right_list) > 0:
+			r_med = median(right_list)
+
+		bounds.append((l_med, r_med))
+
+	return bounds
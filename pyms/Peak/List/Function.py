@@ -24,6 +24,7 @@ Functions related to Peak modification
 ################################################################################
 
 # stdlib
+import copy
 import math
 
 # 3rd party
@@ -45,7 +46,9 @@ def composite_peak(peak_list: List, ignore_outliers: bool = False) -> Peak:
 
     :param peak_list: A list of peak objects
     :type peak_list: list
-    :param ignore_outliers:
+    :param ignore_outliers: Whether to leave out peaks whose retention times
+        are outliers. The outlying peaks are replaced in ``peak_list`` with
+        copies marked as outliers, leaving the original peaks unchanged.
     :type ignore_outliers: bool, optional
 
     :return: The composite peak
@@ -72,9 +75,12 @@ def composite_peak(peak_list: List, ignore_outliers: bool = False) -> Peak:
 
             is_outlier = median_outliers(rts)
 
+            # The peaks may be shared with other peak lists and alignments,
+            # so the outliers are replaced with marked copies.
             for i, val in enumerate(is_outlier):
                 if val:
-                    peak_list[i].isoutlier = True
+                    peak_list[i] = copy.copy(peak_list[i])
+                    peak_list[i].is_outlier = True
 
     # DK: the average RT and average mass spec for the compound peak is now calculated from peaks that are NOT outliers.
     # This should improve the ability to order peaks and figure out badly aligned entries
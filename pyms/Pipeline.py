@@ -0,0 +1,407 @@
+"""
+Processing pipelines with on-disk caching of intermediate results
+"""
+
+################################################################################
+#                                                                              #
+#    PyMassSpec software for processing of mass-spectrometry data              #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                              #
+#                                                                              #
+#    This program is free software; you can redistribute it and/or modify      #
+#    it under the terms of the GNU General Public License version 2 as         #
+#    published by the Free Software Foundation.                                #
+#                                                                              #
+#    This program is distributed in the hope that it will be useful,           #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#    GNU General Public License for more details.                              #
+#                                                                              #
+#    You should have received a copy of the GNU General Public License         #
+#    along with this program; if not, write to the Free Software               #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.                 #
+#                                                                              #
+################################################################################
+
+# stdlib
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+# this package
+from pyms import __version__
+from pyms.Utils.IO import prepare_filepath
+from pyms.Utils.Utils import is_path
+
+# Returned by Pipeline._load_cached when there is no cached result
+_MISSING = object()
+
+
+class Stage(NamedTuple):
+	"""
+	A single named step in a :class:`~pyms.Pipeline.Pipeline`
+	"""
+
+	#: The name of the stage
+	name: str
+
+	#: The function called with the output of the previous stage
+	function: Callable
+
+	#: Additional positional arguments for the function
+	args: Tuple
+
+	#: Keyword arguments for the function
+	kwargs: Dict[str, Any]
+
+
+class Pipeline:
+	"""
+	A chain of processing functions, applied one after another, whose
+	intermediate results are cached on disk.
+
+	Each stage calls its function with the result of the previous stage as
+	the first argument, followed by the stage's own arguments. The first stage
+	is given the pipeline's input, typically the path of a raw data file
+	which is read by a function such as :func:`~pyms.GCMS.IO.ANDI.ANDI_reader`.
+
+	The result of each stage is stored in the cache under a key derived from
+	the contents of the input and the functions and arguments of that stage and
+	all stages before it. When the pipeline is run again, processing resumes from
+	the last stage whose result is in the cache, so changing the arguments of
+	a late stage (e.g. the ``percent`` of :func:`~pyms.BillerBiemann.rel_threshold`)
+	does not repeat the earlier ones.
+
+	When the total size of the cache exceeds ``max_cache_size`` the least
+	recently used results are removed.
+
+	:param cache_dir: Directory to store cached results in.
+		If :py:obj:`None` results are not cached.
+	:type cache_dir: str or os.PathLike or None, optional
+	:param max_cache_size: Maximum total size of the cache, in bytes.
+		If :py:obj:`None` the size of the cache is not limited. Default 1 GiB.
+	:type max_cache_size: int or None, optional
+
+	:author: Dominic Davis-Foster
+	"""
+
+	def __init__(
+			self,
+			cache_dir: Optional[Union[str, pathlib.Path]] = None,
+			max_cache_size: Optional[int] = 2 ** 30,
+			):
+		"""
+		Initialize the Pipeline
+		"""
+
+		if cache_dir is not None:
+			if not is_path(cache_dir):
+				raise TypeError("'cache_dir' must be a string or a PathLike object")
+
+			cache_dir = prepare_filepath(cache_dir, mkdirs=False)
+
+		if max_cache_size is not None and not isinstance(max_cache_size, int):
+			raise TypeError("'max_cache_size' must be an integer")
+
+		self.cache_dir = cache_dir
+		self.max_cache_size = max_cache_size
+
+		self._stages: List[Stage] = []
+
+		# Hashes of input files, keyed by path, size and modification time
+		self._file_hashes: Dict[Tuple, str] = {}
+
+	def __len__(self) -> int:
+		"""
+		Returns the number of stages in the pipeline
+
+		:rtype: int
+		"""
+
+		return len(self._stages)
+
+	@property
+	def stages(self) -> List[Stage]:
+		"""
+		Returns a copy of the stages of the pipeline
+
+		:rtype: list of :class:`~pyms.Pipeline.Stage`
+		"""
+
+		return self._stages[:]
+
+	@property
+	def stage_names(self) -> List[str]:
+		"""
+		Returns the names of the stages of the pipeline
+
+		:rtype: list of str
+		"""
+
+		return [stage.name for stage in self._stages]
+
+	def add_stage(self, name: str, function: Callable, *args, **kwargs) -> "Pipeline":
+		"""
+		Add a stage to the end of the pipeline
+
+		:param name: A unique name for the stage
+		:type name: str
+		:param function: The function to call with the result of the previous stage.
+			This must be defined at the top level of a module.
+		:type function: Callable
+		:param args: Additional positional arguments for the function
+		:param kwargs: Keyword arguments for the function
+
+		:return: The pipeline, so calls can be chained
+		:rtype: pyms.Pipeline.Pipeline
+		"""
+
+		if not isinstance(name, str):
+			raise TypeError("'name' must be a string")
+
+		if name in self.stage_names:
+			raise ValueError(f"A stage named '{name}' already exists")
+
+		if not callable(function):
+			raise TypeError("'function' must be callable")
+
+		stage = Stage(name, function, args, kwargs)
+
+		# Fail now, rather than part way through a run, if the stage can't be hashed
+		self._stage_key('', stage)
+
+		self._stages.append(stage)
+
+		return self
+
+	def set_params(self, name: str, *args, **kwargs):
+		"""
+		Change the arguments of a stage
+
+		Keyword arguments are merged with the stage's existing keyword arguments.
+		Positional arguments, if given, replace the existing ones.
+
+		:param name: The name of the stage
+		:type name: str
+		:param args: New positional arguments for the function
+		:param kwargs: New keyword arguments for the function
+		"""
+
+		index = self._index_of(name)
+		stage = self._stages[index]
+
+		stage = stage._replace(
+				args=args or stage.args,
+				kwargs={**stage.kwargs, **kwargs},
+				)
+		self._stage_key('', stage)
+
+		self._stages[index] = stage
+
+	def run(self, source: Any, stop: Optional[str] = None) -> Any:
+		"""
+		Run the pipeline, reusing cached results where possible
+
+		:param source: The input to the first stage, such as the path of a data file
+		:type source: any
+		:param stop: The name of the stage to stop after.
+			If :py:obj:`None` all stages are run.
+		:type stop: str, optional
+
+		:return: The result of the last stage run
+		"""
+
+		stages = self._stages
+
+		if stop is not None:
+			stages = stages[:self._index_of(stop) + 1]
+
+		# Find the latest stage with a cached result
+		result = source
+		start = 0
+
+		if self.cache_dir is None:
+			keys = [None] * len(stages)
+		else:
+			keys = self.stage_keys(source)[:len(stages)]
+
+			for index in reversed(range(len(stages))):
+				cached = self._load_cached(keys[index])
+				if cached is not _MISSING:
+					result = cached
+					start = index + 1
+					break
+
+		for stage, key in zip(stages[start:], keys[start:]):
+			result = stage.function(result, *stage.args, **stage.kwargs)
+
+			if self.cache_dir is not None:
+				self._store_cached(key, result)
+
+		if self.cache_dir is not None and start < len(stages):
+			self._prune_cache()
+
+		return result
+
+	def stage_keys(self, source: Any) -> List[str]:
+		"""
+		Returns the cache keys for each stage of the pipeline for the given input
+
+		:param source: The input to the first stage
+		:type source: any
+
+		:rtype: list of str
+		"""
+
+		key = self._source_key(source)
+		keys = []
+
+		for stage in self._stages:
+			key = self._stage_key(key, stage)
+			keys.append(key)
+
+		return keys
+
+	def clear_cache(self):
+		"""
+		Remove all cached results
+		"""
+
+		for file_name in self._cache_files():
+			file_name.unlink()
+
+	def _index_of(self, name: str) -> int:
+		"""
+		Returns the index of the stage with the given name
+		"""
+
+		names = self.stage_names
+
+		if name not in names:
+			raise ValueError(f"No stage named '{name}'")
+
+		return names.index(name)
+
+	def _source_key(self, source: Any) -> str:
+		"""
+		Returns the hash of the contents of the pipeline's input
+		"""
+
+		if not is_path(source):
+			return hashlib.sha256(pickle.dumps(source, protocol=4)).hexdigest()
+
+		source = prepare_filepath(source, mkdirs=False)
+		stat = source.stat()
+		token = (str(source.resolve()), stat.st_size, stat.st_mtime_ns)
+
+		if token not in self._file_hashes:
+			digest = hashlib.sha256()
+
+			with source.open("rb") as fp:
+				for block in iter(lambda: fp.read(2 ** 20), b''):
+					digest.update(block)
+
+			self._file_hashes[token] = digest.hexdigest()
+
+		return self._file_hashes[token]
+
+	@staticmethod
+	def _stage_key(previous_key: str, stage: Stage) -> str:
+		"""
+		Returns the cache key for a stage, given the key of the previous stage
+		"""
+
+		function_name = f"{stage.function.__module__}.{stage.function.__qualname__}"
+
+		try:
+			params = pickle.dumps((stage.args, sorted(stage.kwargs.items())), protocol=4)
+		except (pickle.PicklingError, TypeError, AttributeError):
+			raise TypeError(f"The arguments of stage '{stage.name}' cannot be pickled")
+
+		digest = hashlib.sha256()
+		digest.update(previous_key.encode("UTF-8"))
+		digest.update(f"{__version__}:{stage.name}:{function_name}".encode("UTF-8"))
+		digest.update(params)
+
+		return digest.hexdigest()
+
+	def _cache_files(self) -> List[pathlib.Path]:
+		"""
+		Returns the files in the cache
+		"""
+
+		if self.cache_dir is None or not self.cache_dir.is_dir():
+			return []
+
+		return list(self.cache_dir.glob("*.pickle"))
+
+	def _load_cached(self, key: str) -> Any:
+		"""
+		Returns the cached result with the given key, or ``_MISSING`` if there isn't one
+		"""
+
+		file_name = self.cache_dir / f"{key}.pickle"
+
+		try:
+			with file_name.open("rb") as fp:
+				result = pickle.load(fp)
+		except FileNotFoundError:
+			return _MISSING
+		except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+			# The file is damaged or from an incompatible version
+			file_name.unlink()
+			return _MISSING
+
+		# Mark the result as recently used
+		os.utime(str(file_name))
+
+		return result
+
+	def _store_cached(self, key: str, result: Any):
+		"""
+		Store a result in the cache
+		"""
+
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+		# Write to a temporary file first so other processes never see a partial result
+		fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=str(self.cache_dir))
+
+		try:
+			with os.fdopen(fd, "wb") as fp:
+				pickle.dump(result, fp, protocol=4)
+			os.replace(tmp_name, str(self.cache_dir / f"{key}.pickle"))
+		except BaseException:
+			os.unlink(tmp_name)
+			raise
+
+	def _prune_cache(self):
+		"""
+		Remove the least recently used results until the cache is within ``max_cache_size``
+		"""
+
+		if self.max_cache_size is None:
+			return
+
+		entries = []
+		for file_name in self._cache_files():
+			try:
+				stat = file_name.stat()
+			except FileNotFoundError:
+				continue
+			entries.append((stat.st_mtime, stat.st_size, file_name))
+
+		total_size = sum(size for _, size, _ in entries)
+
+		for _, size, file_name in sorted(entries, key=lambda entry: entry[0]):
+			if total_size <= self.max_cache_size:
+				break
+
+			try:
+				file_name.unlink()
+			except FileNotFoundError:
+				pass
+
+			total_size -= size
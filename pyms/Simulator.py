@@ -50,12 +50,9 @@ def add_gaussc_noise(im: IntensityMatrix, scale: float):
     :author: Sean O'Callaghan
     """
 
-    n_scan, n_mz = im.size
-
-    for i in range(n_mz):
-        ic = im.get_ic_at_index(i)
-        add_gaussc_noise_ic(ic, scale)
-        im.set_ic_at_index(i, ic)
+    for i in im.iter_ic_indices():
+        # The noise is added to the intensity matrix through the view
+        add_gaussc_noise_ic(im.get_ic_view(i, writeable=True), scale)
 
 
 def add_gaussc_noise_ic(ic: IonChromatogram,  scale: float):
@@ -72,8 +69,8 @@ def add_gaussc_noise_ic(ic: IonChromatogram,  scale: float):
 
     noise = numpy.random.normal(0.0, scale, (len(ic)))
 
-    i_array_with_noise = ic.get_intensity_array() + noise
-    ic.set_intensity_array(i_array_with_noise)
+    i_array_with_noise = ic.intensity_array + noise
+    ic.intensity_array = i_array_with_noise
 
 
 def add_gaussv_noise(im: IntensityMatrix, scale: float, cutoff: int, prop: float):
@@ -96,12 +93,9 @@ def add_gaussv_noise(im: IntensityMatrix, scale: float, cutoff: int, prop: float
     :author: Sean O'Callaghan
     """
 
-    n_scan, n_mz = im.size
-
-    for i in range(n_mz):
-        ic = im.get_ic_at_index(i)
-        add_gaussv_noise_ic(ic, scale, cutoff, prop)
-        im.set_ic_at_index(i, ic)
+    for i in im.iter_ic_indices():
+        # The noise is added to the intensity matrix through the view
+        add_gaussv_noise_ic(im.get_ic_view(i, writeable=True), scale, cutoff, prop)
 
 
 def add_gaussv_noise_ic(ic: IonChromatogram, scale: int, cutoff: int, prop: float):
@@ -125,19 +119,14 @@ def add_gaussv_noise_ic(ic: IonChromatogram, scale: int, cutoff: int, prop: floa
     :author: Sean O'Callaghan
     """
 
-    noise = numpy.zeros(len(ic))
-
-    i_array = ic.get_intensity_array()
-    # time_list = ic.get_time_list()
+    i_array = ic.intensity_array
 
-    for i in range(len(ic)):
-        if i_array[i] < cutoff:
-            noise[i] = numpy.random.normal(0.0, scale, 1)
-        else:
-            noise[i] = numpy.random.normal(0.0, scale * i_array[i] * prop, 1)
+    # The noise for each point is drawn in turn, as it would be one point at a time
+    noise_scale = numpy.where(i_array < cutoff, scale, scale * i_array * prop)
+    noise = numpy.random.normal(0.0, noise_scale)
 
     i_array_with_noise = noise + i_array
-    ic.set_intensity_array(i_array_with_noise)
+    ic.intensity_array = i_array_with_noise
 
 
 def chromatogram(n_scan: int, x_zero: int, sigma: float,peak_scale: float) -> List:
@@ -25,7 +25,6 @@ Classes to model Mass Spectra and Scans
 
 # stdlib
 import pathlib
-import re
 import warnings
 from collections.abc import Sequence
 
@@ -42,7 +41,7 @@ from pyms.Base import pymsBaseClass
 from pyms.GCMS.Class import MassSpectrum
 from pyms.Mixins import MassListMixin
 from pyms.Utils.IO import prepare_filepath
-from pyms.Utils.jcamp import xydata_tags
+from pyms.Utils.jcamp import iter_jcamp_pages
 from pyms.Utils.Utils import is_path, is_sequence
 
 
@@ -72,6 +71,43 @@ def array_as_numeric(array: Union[Sequence, numpy.ndarray]) -> numpy.ndarray:
 	return array
 
 
+def sort_scan(mass_array: numpy.ndarray, intensity_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Returns the mass and intensity values of a scan in ascending order of mass.
+
+	Scans in descending order are reversed. Scans in neither order are sorted,
+	with a warning. Scans already in ascending order are returned unchanged.
+
+	:param mass_array: The mass values of the scan
+	:type mass_array: numpy.ndarray
+	:param intensity_array: The intensity values of the scan
+	:type intensity_array: numpy.ndarray
+
+	:return: The mass and intensity values
+	:rtype: tuple of numpy.ndarray
+
+	:author: Dominic Davis-Foster
+	"""
+
+	if len(mass_array) < 2:
+		return mass_array, intensity_array
+
+	mass_diff = numpy.diff(mass_array)
+
+	if (mass_diff >= 0).all():
+		return mass_array, intensity_array
+	elif (mass_diff <= 0).all():
+		return mass_array[::-1], intensity_array[::-1]
+
+	warnings.warn("""Unknown sort order for mass list; it doesn't appear to be in either ascending or descending order.
+Please report this at https://github.com/domdfcoding/pymassspec/issues and upload an example data file if possible.
+""")
+
+	order = numpy.argsort(mass_array, kind="mergesort")
+
+	return mass_array[order], intensity_array[order]
+
+
 class Scan(pymsBaseClass, MassListMixin):
 	"""
 	Generic object for a single Scan's raw data
@@ -130,7 +166,7 @@ Please report this at https://github.com/domdfcoding/pymassspec/issues and uploa
 		return len(self._mass_list)
 
 	def __bool__(self):
-		return bool(self._mass_list)
+		return len(self._mass_list) > 0
 
 	def __eq__(self, other: Any) -> bool:
 		"""
@@ -252,6 +288,38 @@ Please report this at https://github.com/domdfcoding/pymassspec/issues and uploa
 	def from_dict(cls, dictionary):
 		return cls(**dictionary)
 
+	@classmethod
+	def _view(cls, mass_array: numpy.ndarray, intensity_array: numpy.ndarray) -> "Scan":
+		"""
+		Create a Scan backed directly by the given numpy arrays, without copying
+		or re-sorting them. Use :func:`~pyms.Spectrum.sort_scan` first if the
+		masses might not be in ascending order.
+
+		The ``mass_list`` and ``intensity_list`` of the returned Scan are numpy
+		arrays sharing memory with ``mass_array`` and ``intensity_array``.
+		Copying the Scan gives an ordinary, list-backed, Scan.
+
+		:param mass_array: Mass values, in ascending order
+		:type mass_array: numpy.ndarray
+		:param intensity_array: Intensity values
+		:type intensity_array: numpy.ndarray
+
+		:rtype: Scan
+		"""
+
+		scan = cls.__new__(cls)
+		scan._mass_list = mass_array
+		scan._intensity_list = intensity_array
+
+		if len(mass_array):
+			scan._min_mass = float(mass_array.min())
+			scan._max_mass = float(mass_array.max())
+		else:
+			scan._min_mass = None
+			scan._max_mass = None
+
+		return scan
+
 
 class MassSpectrum(Scan):
 	"""
@@ -463,40 +531,17 @@ class MassSpectrum(Scan):
 		file_name = prepare_filepath(file_name, mkdirs=False)
 
 		print(f" -> Reading JCAMP file '{file_name}'")
-		lines_list = file_name.open('r')
-		xydata = []
-		last_tag = None
-
-		for line in lines_list:
-
-			if line.strip():
-				if line.startswith("##"):
-					# key word or information
-					fields = line.split('=', 1)
-					current_tag = fields[0] = fields[0].lstrip("##").upper()
-					last_tag = fields[0]
-
-					if current_tag.upper().startswith("END"):
-						break
-
-				else:
-					if last_tag in xydata_tags:
-						line_sub = re.split(r",| ", line.strip())
-						for item in line_sub:
-							if not len(item.strip()) == 0:
-								xydata.append(float(item.strip()))
-
-		# By this point we should have all of the xydata
-		if len(xydata) % 2 == 1:
-			# TODO: This means the data is not in x, y pairs
-			#  Make a better error message
-			raise ValueError("data not in pair !")
 
 		mass_list = []
 		intensity_list = []
-		for i in range(len(xydata) // 2):
-			mass_list.append(xydata[i * 2])
-			intensity_list.append(xydata[i * 2 + 1])
+
+		# Read the data tables up to the end of the first block
+		for labels, mass_array, intensity_array in iter_jcamp_pages(file_name):
+			if any(label.startswith("END") for label in labels):
+				break
+
+			mass_list.extend(mass_array.tolist())
+			intensity_list.extend(intensity_array.tolist())
 
 		return cls(mass_list, intensity_list)
 
@@ -25,6 +25,7 @@ Top-hat baseline corrector
 
 # stdlib
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 # 3rd party
 from typing import Optional, Union
@@ -41,6 +42,9 @@ from pyms.IonChromatogram import IonChromatogram
 # default structural element as a fraction of total number of points
 _STRUCT_ELM_FRAC = 0.2
 
+# Number of intensities corrected at once by tophat_im
+_BLOCK_POINTS = 2 ** 22
+
 
 def tophat(ic: IonChromatogram, struct: Optional[Union[int, str]] = None):
     """
@@ -80,33 +84,87 @@ def tophat(ic: IonChromatogram, struct: Optional[Union[int, str]] = None):
     return ic_bc
 
 
-def tophat_im(im, struct=None):
+def tophat_im(
+        im: IntensityMatrix,
+        struct: Optional[Union[int, str]] = None,
+        inplace: bool = False,
+        n_jobs: int = 1,
+        ) -> IntensityMatrix:
     """
     Top-hat baseline correction on Intensity Matrix
 
-    Wraps around the TopHat function above
+    Every ion chromatogram is corrected at once, by applying a top-hat
+    filter along the time axis of the intensity array. The columns
+    are processed in blocks to limit the memory used. The blocks of
+    a sparse intensity matrix are processed in one thread.
 
     :param im: The input Intensity Matrix
     :type im: pyms.IntensityMatrix.IntensityMatrix
     :param struct: Top-hat structural element as time string
-    :type struct: str
+    :type struct: int or str or NoneType, optional
+    :param inplace: Whether to correct the intensities of ``im`` in place
+        rather than returning a new IntensityMatrix
+    :type inplace: bool, optional
+    :param n_jobs: The number of threads to process blocks of columns with
+    :type n_jobs: int, optional
 
     :return: Top-hat corrected IntensityMatrix Matrix
     :rtype: pyms.IntensityMatrix.IntensityMatrix
 
-    :author: Sean O'Callaghan
+    :authors: Sean O'Callaghan, Dominic Davis-Foster
     """
 
     if not isinstance(im, IntensityMatrix):
         raise TypeError("'im' must be an IntensityMatrix object")
 
-    n_scan, n_mz = im.size
+    if not isinstance(n_jobs, int):
+        raise TypeError("'n_jobs' must be an integer")
+
+    if n_jobs < 1:
+        raise ValueError("'n_jobs' must be at least 1")
+
+    ia = im._intensity_array
+    n_scan, n_mz = ia.shape
+
+    if struct:
+        struct_pts = ic_window_points(im.get_ic_view(0), struct)
+    else:
+        struct_pts = int(round(n_scan * _STRUCT_ELM_FRAC))
+
+    if im.is_sparse:
+        ia_bc = im._map_sparse_columns(
+                lambda block: ndimage.white_tophat(block, size=(struct_pts, 1)),
+                _BLOCK_POINTS,
+                ia.dtype,
+                )
 
-    im_smooth = copy.deepcopy(im)
+        if inplace:
+            im._intensity_array = ia_bc
+            return im
+
+        return IntensityMatrix(im.time_list, im.mass_list, ia_bc)
+
+    if inplace:
+        ia_bc = ia
+    else:
+        ia_bc = numpy.empty_like(ia)
+
+    # Split the columns into blocks, with at least one block per thread
+    block_size = max(1, min(_BLOCK_POINTS // max(1, n_scan), -(-n_mz // n_jobs)))
+    blocks = [slice(start, start + block_size) for start in range(0, n_mz, block_size)]
+
+    def correct_block(columns):
+        ia_bc[:, columns] = ndimage.white_tophat(ia[:, columns], size=(struct_pts, 1))
+
+    if n_jobs == 1:
+        for columns in blocks:
+            correct_block(columns)
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            # Consume the results so exceptions are raised
+            list(executor.map(correct_block, blocks))
 
-    for ii in range(n_mz):
-        ic = im_smooth.get_ic_at_index(ii)
-        ic_smooth = tophat(ic, struct)
-        im_smooth.set_ic_at_index(ii, ic_smooth)
+    if inplace:
+        return im
 
-    return im_smooth
+    return IntensityMatrix(im.time_list, im.mass_list, ia_bc)
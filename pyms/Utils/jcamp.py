@@ -1,5 +1,5 @@
 """
-Constants required for reading JCAMP files
+Functions and constants for reading JCAMP-DX files
 """
 
 ################################################################################
@@ -22,6 +22,15 @@ Constants required for reading JCAMP files
 #                                                                              #
 ################################################################################
 
+# stdlib
+import pathlib
+import re
+import warnings
+from typing import Dict, Iterator, List, Tuple, Union
+
+# 3rd party
+import numpy  # type: ignore
+
 
 header_info_fields = [
 		"TITLE",
@@ -69,3 +78,212 @@ class JcampTagWarning(UserWarning):
 
 	def __str__(self):
 		return f"Unrecognised tag {self.tag}."
+
+
+# ASDF compression characters, and the digit or repeat count they stand for
+_SQZ_DIGITS = {'@': 0, **{c: i for i, c in enumerate("ABCDEFGHI", 1)}, **{c: -i for i, c in enumerate("abcdefghi", 1)}}
+_DIF_DIGITS = {'%': 0, **{c: i for i, c in enumerate("JKLMNOPQR", 1)}, **{c: -i for i, c in enumerate("jklmnopqr", 1)}}
+_DUP_COUNTS = {**{c: i for i, c in enumerate("STUVWXYZ", 1)}, 's': 9}
+
+# A number with an exponent. As 'E' and 'e' are also SQZ characters (5 and -5),
+# which usually follow a number directly, the 'E' or 'e' is only taken as an
+# exponent after a mantissa with a decimal point, in a value between separators.
+_AFFN_EXPONENT = r"(?<![^\s,;])[+-]?\d*\.\d*[Ee][+-]?\d+(?![^\s,;])"
+
+_asdf_token = re.compile(rf"({_AFFN_EXPONENT})|([@A-Ia-i%J-Rj-rS-Zs]|[+-]?)(\d*\.?\d*)")
+_asdf_character = re.compile(r"[@A-Ia-i%J-Rj-rS-Zs]")
+_affn_exponent = re.compile(_AFFN_EXPONENT)
+
+
+def iter_jcamp_pages(
+		file_name: Union[str, pathlib.Path],
+		) -> Iterator[Tuple[Dict[str, str], numpy.ndarray, numpy.ndarray]]:
+	"""
+	Iterate over the data tables in a JCAMP-DX file as the file is read
+
+	Each data table (e.g. a page of a GC-MS file, or a spectrum in a library)
+	is returned with the labelled data records that precede it, back to the
+	previous data table. The data lines of each table are tokenized together.
+	Tables in the ``(XY..XY)`` form, and in the ``(X++(Y..Y))`` form using
+	either plain numbers or the compressed ASDF forms (SQZ, DIF and DUP),
+	are supported.
+
+	:param file_name: Path of the file to read
+	:type file_name: str or os.PathLike
+
+	:return: An iterator over tuples of the labels (upper case, without the
+		leading ``##``) mapped to their values, and the x and y values of the table
+	:rtype: ~typing.Iterator[tuple[dict, numpy.ndarray, numpy.ndarray]]
+	"""
+
+	labels: Dict[str, str] = {}
+	data_lines = None
+
+	with open(file_name, 'r') as fp:
+		for line in fp:
+			if line.startswith("##"):
+				if data_lines is not None:
+					yield (labels, *_parse_data_table(labels, data_lines))
+					labels = {}
+					data_lines = None
+
+				label, _, value = line[2:].partition('=')
+				label = label.strip().upper()
+				labels[label] = value.strip()
+
+				if label in xydata_tags:
+					data_lines = []
+
+			elif data_lines is not None:
+				data_lines.append(line.partition("$$")[0])
+
+	if data_lines is not None:
+		yield (labels, *_parse_data_table(labels, data_lines))
+
+
+def _parse_data_table(labels: Dict[str, str], data_lines: List[str]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+	Parse the lines of a data table into arrays of x and y values
+
+	:param labels: The labelled data records preceding the table
+	:param data_lines: The lines of the table
+
+	:rtype: tuple[numpy.ndarray, numpy.ndarray]
+	"""
+
+	form = next(labels[tag] for tag in labels if tag in xydata_tags)
+
+	x_factor = float(labels.get("XFACTOR", 1) or 1)
+	y_factor = float(labels.get("YFACTOR", 1) or 1)
+
+	if "++" in form:
+		# (X++(Y..Y)): the x value of the first point on each line, followed by y values
+		y_values = _decode_y_lines(data_lines) * y_factor
+
+		try:
+			first_x = float(labels["FIRSTX"])
+			last_x = float(labels["LASTX"])
+		except KeyError:
+			raise ValueError("'FIRSTX' and 'LASTX' are required for (X++(Y..Y)) data") from None
+
+		n_points = int(labels.get("NPOINTS", len(y_values)))
+		if n_points != len(y_values):
+			raise ValueError(f"Expected {n_points} points but found {len(y_values)}")
+
+		x_values = numpy.linspace(first_x, last_x, n_points)
+
+	else:
+		# (XY..XY): x, y pairs
+		values = _tokenize(" ".join(data_lines))
+
+		if len(values) % 2 == 1:
+			raise ValueError(f"Odd number of values ({len(values)}) in (XY..XY) data table")
+
+		x_values = values[0::2] * x_factor
+		y_values = values[1::2] * y_factor
+
+	return x_values, y_values
+
+
+def _tokenize(text: str) -> numpy.ndarray:
+	"""
+	Convert a block of numbers, separated by whitespace, commas or semicolons, into an array
+
+	:rtype: numpy.ndarray
+	"""
+
+	text = text.replace(',', ' ').replace(';', ' ')
+
+	with warnings.catch_warnings():
+		# numpy < 2 warns rather than raising when it cannot parse the whole string
+		warnings.simplefilter("error", DeprecationWarning)
+		try:
+			return numpy.fromstring(text, sep=' ')
+		except (DeprecationWarning, ValueError):
+			raise ValueError("Unable to parse JCAMP-DX data") from None
+
+
+def _decode_y_lines(data_lines: List[str]) -> numpy.ndarray:
+	"""
+	Decode the lines of an ``(X++(Y..Y))`` data table, which may use ASDF compression
+
+	The x value at the start of each line is discarded. In DIF form, the
+	last y value of a line is repeated at the start of the next line as a
+	check, and the repeat is removed.
+
+	:rtype: numpy.ndarray
+	"""
+
+	y_values: List[float] = []
+	y_check = False
+
+	for line in data_lines:
+		if not line.strip():
+			continue
+
+		if _asdf_character.search(_affn_exponent.sub(' ', line)):
+			line_values, ends_with_dif = _decode_asdf_line(line)
+		else:
+			line_values = _tokenize(line).tolist()
+			ends_with_dif = False
+
+		line_y = line_values[1:]
+
+		if y_check and line_y:
+			if line_y[0] != y_values[-1]:
+				raise ValueError("JCAMP-DX y value check failed")
+			line_y = line_y[1:]
+
+		y_values.extend(line_y)
+		y_check = ends_with_dif
+
+	return numpy.array(y_values, dtype=float)
+
+
+def _decode_asdf_line(line: str) -> Tuple[List[float], bool]:
+	"""
+	Decode a line of ASDF compressed data
+
+	:return: The values on the line, and whether the last value was in DIF form
+	:rtype: tuple[list[float], bool]
+	"""
+
+	values: List[float] = []
+	difference = None
+
+	for number, prefix, digits in _asdf_token.findall(line):
+		if number:
+			values.append(float(number))
+			difference = None
+
+		elif not prefix and not digits:
+			continue
+
+		elif prefix in _DUP_COUNTS:
+			count = int(str(_DUP_COUNTS[prefix]) + digits)
+			for _ in range(count - 1):
+				values.append(values[-1] + difference if difference is not None else values[-1])
+
+		elif prefix in _DIF_DIGITS:
+			difference = _asdf_value(_DIF_DIGITS[prefix], digits)
+			values.append(values[-1] + difference)
+
+		elif prefix in _SQZ_DIGITS:
+			values.append(_asdf_value(_SQZ_DIGITS[prefix], digits))
+			difference = None
+
+		else:
+			values.append(float(prefix + digits))
+			difference = None
+
+	return values, difference is not None
+
+
+def _asdf_value(first_digit: int, digits: str) -> float:
+	"""
+	Returns the value of a SQZ or DIF token, given the digit its character stands for
+	and the digits that follow it
+	"""
+
+	value = float(str(abs(first_digit)) + digits)
+	return -value if first_digit < 0 else value
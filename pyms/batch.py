@@ -0,0 +1,461 @@
+"""
+Process many data files in parallel
+
+The batch runner applies a :class:`~pyms.Pipeline.Pipeline` to each file in a
+process pool, saving the resulting :class:`~pyms.Experiment.Experiment`
+objects to disk as they are completed.
+
+It can also be run from the command line::
+
+	python -m pyms.batch data/*.cdf --output-dir experiments --jobs 4
+"""
+
+################################################################################
+#                                                                              #
+#    PyMassSpec software for processing of mass-spectrometry data              #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                              #
+#                                                                              #
+#    This program is free software; you can redistribute it and/or modify      #
+#    it under the terms of the GNU General Public License version 2 as         #
+#    published by the Free Software Foundation.                                #
+#                                                                              #
+#    This program is distributed in the hope that it will be useful,           #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of            #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the             #
+#    GNU General Public License for more details.                              #
+#                                                                              #
+#    You should have received a copy of the GNU General Public License         #
+#    along with this program; if not, write to the Free Software               #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.                 #
+#                                                                              #
+################################################################################
+
+# stdlib
+import argparse
+import csv
+import importlib
+import pathlib
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, NamedTuple, Optional, Sequence, Union
+
+# this package
+from pyms.BillerBiemann import BillerBiemann, num_ions_threshold, rel_threshold
+from pyms.Experiment import Experiment
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.ANDI import ANDI_reader
+from pyms.GCMS.IO.JCAMP import JCAMP_reader
+from pyms.GCMS.IO.MZML import mzML_reader
+from pyms.IntensityMatrix import IntensityMatrix, build_intensity_matrix_i
+from pyms.Noise.SavitzkyGolay import savitzky_golay_im
+from pyms.Peak.Class import Peak
+from pyms.Peak.Function import peak_list_areas
+from pyms.Pipeline import Pipeline
+from pyms.TopHat import tophat_im
+from pyms.Utils.IO import prepare_filepath
+from pyms.Utils.Utils import is_path
+
+# Readers for each supported file extension
+_READERS = {
+		".cdf": ANDI_reader,
+		".nc": ANDI_reader,
+		".jdx": JCAMP_reader,
+		".dx": JCAMP_reader,
+		".mzml": mzML_reader,
+		}
+
+
+class BatchResult(NamedTuple):
+	"""
+	The outcome of processing one file with :func:`~pyms.batch.run_batch`
+	"""
+
+	#: The file that was processed
+	file_name: pathlib.Path
+
+	#: The file the Experiment was saved to, or :py:obj:`None` if processing failed
+	output_file: Optional[pathlib.Path]
+
+	#: The number of peaks in the Experiment
+	n_peaks: int
+
+	#: The time taken to process the file, in seconds
+	elapsed: float
+
+	#: The traceback of the exception raised while processing the file, if any
+	error: Optional[str] = None
+
+	@property
+	def ok(self) -> bool:
+		"""
+		Returns whether the file was processed successfully
+
+		:rtype: bool
+		"""
+
+		return self.error is None
+
+
+def read_data(file_name: Union[str, pathlib.Path]) -> GCMS_data:
+	"""
+	Read a raw data file with the reader appropriate for its extension
+
+	Supported formats are ANDI-MS (``.cdf``, ``.nc``), JCAMP-DX (``.jdx``, ``.dx``) and mzML (``.mzML``).
+
+	:param file_name: The name of the data file
+	:type file_name: str or os.PathLike
+
+	:return: The data read from the file
+	:rtype: pyms.GCMS.Class.GCMS_data
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name, mkdirs=False)
+	suffix = file_name.suffix.lower()
+
+	if suffix not in _READERS:
+		raise ValueError(f"Unsupported file type '{file_name.suffix}'")
+
+	return _READERS[suffix](file_name)
+
+
+def detect_peaks(
+		im: IntensityMatrix,
+		points: int = 9,
+		scans: int = 2,
+		percent: float = 2,
+		n: int = 3,
+		cutoff: float = 3000,
+		) -> List[Peak]:
+	"""
+	Detect peaks in an intensity matrix with the Biller and Biemann algorithm,
+	filter them, and calculate their areas.
+
+	The peaks are filtered with :func:`~pyms.BillerBiemann.rel_threshold` and
+	:func:`~pyms.BillerBiemann.num_ions_threshold`, and their ``area`` and ``ion_areas``
+	are set by :func:`~pyms.Peak.Function.peak_list_areas`.
+
+	:param im: The intensity matrix
+	:type im: pyms.IntensityMatrix.IntensityMatrix
+	:param points: Number of scans over which to consider a maxima to be a peak. Default ``9``
+	:type points: int, optional
+	:param scans: Number of scans to combine peaks from to compensate for spectra skewing. Default ``2``
+	:type scans: int, optional
+	:param percent: Threshold for relative percentage of intensity. Default ``2``
+	:type percent: float, optional
+	:param n: The minimum number of ions that must have intensities above the cutoff. Default ``3``
+	:type n: int, optional
+	:param cutoff: The minimum intensity threshold. Default ``3000``
+	:type cutoff: float, optional
+
+	:return: The peaks, with their areas set
+	:rtype: list of pyms.Peak.Class.Peak
+	"""
+
+	peak_list = BillerBiemann(im, points=points, scans=scans)
+	peak_list = rel_threshold(peak_list, percent=percent, copy_peaks=False)
+	peak_list = num_ions_threshold(peak_list, n=n, cutoff=cutoff, copy_peaks=False)
+	peak_list_areas(im, peak_list)
+
+	return peak_list
+
+
+def default_pipeline(
+		cache_dir: Optional[Union[str, pathlib.Path]] = None,
+		struct: str = "1.5m",
+		points: int = 9,
+		scans: int = 2,
+		percent: float = 2,
+		n: int = 3,
+		cutoff: float = 3000,
+		) -> Pipeline:
+	"""
+	Returns a pipeline which reads a file, builds an intensity matrix, smooths and baseline
+	corrects it, and detects peaks and calculates their areas with :func:`~pyms.batch.detect_peaks`.
+
+	:param cache_dir: Directory to cache intermediate results in.
+	:type cache_dir: str or os.PathLike or None, optional
+	:param struct: Top-hat structural element as time string. Default ``'1.5m'``
+	:type struct: str, optional
+	:param points: Number of scans over which to consider a maxima to be a peak. Default ``9``
+	:type points: int, optional
+	:param scans: Number of scans to combine peaks from to compensate for spectra skewing. Default ``2``
+	:type scans: int, optional
+	:param percent: Threshold for relative percentage of intensity. Default ``2``
+	:type percent: float, optional
+	:param n: The minimum number of ions that must have intensities above the cutoff. Default ``3``
+	:type n: int, optional
+	:param cutoff: The minimum intensity threshold. Default ``3000``
+	:type cutoff: float, optional
+
+	:rtype: pyms.Pipeline.Pipeline
+	"""
+
+	pipeline = Pipeline(cache_dir)
+	pipeline.add_stage("read", read_data)
+	pipeline.add_stage("bin", build_intensity_matrix_i)
+	pipeline.add_stage("smooth", savitzky_golay_im)
+	pipeline.add_stage("baseline", tophat_im, struct=struct)
+	pipeline.add_stage(
+			"peaks", detect_peaks, points=points, scans=scans, percent=percent, n=n, cutoff=cutoff,
+			)
+
+	return pipeline
+
+
+def process_file(
+		file_name: Union[str, pathlib.Path],
+		pipeline: Pipeline,
+		output_dir: Union[str, pathlib.Path],
+		) -> BatchResult:
+	"""
+	Run the pipeline on one file and save the resulting peak list as an
+	:class:`~pyms.Experiment.Experiment` named after the file.
+
+	Exceptions raised during processing are recorded in the returned
+	:class:`~pyms.batch.BatchResult` rather than propagated.
+
+	:param file_name: The name of the data file
+	:type file_name: str or os.PathLike
+	:param pipeline: The pipeline to run. The last stage must return a list of peaks.
+	:type pipeline: pyms.Pipeline.Pipeline
+	:param output_dir: The directory to save the Experiment in
+	:type output_dir: str or os.PathLike
+
+	:rtype: pyms.batch.BatchResult
+	"""
+
+	file_name = pathlib.Path(file_name)
+	output_file = pathlib.Path(output_dir) / f"{file_name.stem}.expr"
+
+	start_time = time.perf_counter()
+
+	try:
+		peak_list = pipeline.run(file_name)
+		Experiment(file_name.stem, peak_list).dump(output_file)
+	except Exception:
+		return BatchResult(file_name, None, 0, time.perf_counter() - start_time, traceback.format_exc())
+
+	return BatchResult(file_name, output_file, len(peak_list), time.perf_counter() - start_time)
+
+
+def run_batch(
+		file_names: Sequence[Union[str, pathlib.Path]],
+		pipeline: Pipeline,
+		output_dir: Union[str, pathlib.Path],
+		max_workers: Optional[int] = None,
+		) -> List[BatchResult]:
+	"""
+	Process a set of data files in parallel
+
+	Each file is processed by :func:`~pyms.batch.process_file` in a pool of worker processes.
+	Each worker handles one file at a time, and the Experiments are saved
+	by the workers, so only one file per worker is held in memory.
+	A failure in one file does not stop the others from being processed.
+	If a worker process dies, every file that had not finished is recorded as failed.
+
+	:param file_names: The data files to process
+	:type file_names: list of str or os.PathLike
+	:param pipeline: The pipeline to run on each file. The last stage must return a list of peaks.
+	:type pipeline: pyms.Pipeline.Pipeline
+	:param output_dir: The directory to save the Experiments in
+	:type output_dir: str or os.PathLike
+	:param max_workers: The number of worker processes. If :py:obj:`None`, the number of CPUs is used.
+		If ``1`` the files are processed in this process.
+	:type max_workers: int or None, optional
+
+	:return: The result for each file, in the same order as ``file_names``
+	:rtype: list of pyms.batch.BatchResult
+	"""
+
+	if not isinstance(pipeline, Pipeline):
+		raise TypeError("'pipeline' must be a Pipeline object")
+
+	if not is_path(output_dir):
+		raise TypeError("'output_dir' must be a string or a PathLike object")
+
+	for file_name in file_names:
+		if not is_path(file_name):
+			raise TypeError("'file_names' must be a list of strings or PathLike objects")
+
+	if max_workers is not None and (not isinstance(max_workers, int) or max_workers < 1):
+		raise ValueError("'max_workers' must be a positive integer")
+
+	file_names = [pathlib.Path(file_name) for file_name in file_names]
+
+	stems = [file_name.stem for file_name in file_names]
+	duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+	if duplicates:
+		raise ValueError(f"Files would produce Experiments with the same name: {', '.join(duplicates)}")
+
+	output_dir = prepare_filepath(output_dir, mkdirs=False)
+	output_dir.mkdir(parents=True, exist_ok=True)
+
+	results = {}
+
+	if max_workers == 1:
+		for file_name in file_names:
+			results[file_name] = process_file(file_name, pipeline, output_dir)
+			_print_result(results[file_name])
+
+	else:
+		start_time = time.perf_counter()
+
+		with ProcessPoolExecutor(max_workers=max_workers) as executor:
+			futures = {
+					executor.submit(process_file, file_name, pipeline, output_dir): file_name
+					for file_name in file_names
+					}
+
+			for future in as_completed(futures):
+				try:
+					result = future.result()
+				except BrokenProcessPool:
+					# A worker died, e.g. from running out of memory. This and the other
+					# unfinished files are failed, but those already processed are kept.
+					result = BatchResult(
+							futures[future], None, 0, time.perf_counter() - start_time, traceback.format_exc()
+							)
+
+				results[result.file_name] = result
+				_print_result(result)
+
+	return [results[file_name] for file_name in file_names]
+
+
+def _print_result(result: BatchResult):
+	"""
+	Print a one-line summary of a :class:`~pyms.batch.BatchResult`
+	"""
+
+	if result.ok:
+		print(f" -> Processed '{result.file_name}': {result.n_peaks} peaks in {result.elapsed:.1f} s")
+	else:
+		print(f" -> Failed to process '{result.file_name}' after {result.elapsed:.1f} s")
+
+
+def write_report(results: Sequence[BatchResult], file_name: Union[str, pathlib.Path]):
+	"""
+	Write the file names, timings and errors from a batch to a CSV file
+
+	:param results: The results from :func:`~pyms.batch.run_batch`
+	:type results: list of pyms.batch.BatchResult
+	:param file_name: The name of the CSV file
+	:type file_name: str or os.PathLike
+	"""
+
+	if not is_path(file_name):
+		raise TypeError("'file_name' must be a string or a PathLike object")
+
+	file_name = prepare_filepath(file_name)
+
+	with file_name.open('w', newline='') as fp:
+		writer = csv.writer(fp)
+		writer.writerow(["File", "Output", "Peaks", "Time (s)", "Error"])
+
+		for result in results:
+			error = result.error.strip().splitlines()[-1] if result.error else ''
+			writer.writerow([
+					result.file_name,
+					result.output_file or '',
+					result.n_peaks,
+					f"{result.elapsed:.3f}",
+					error,
+					])
+
+
+def _load_recipe(recipe: str) -> Pipeline:
+	"""
+	Load a pipeline given as ``'module:attribute'``, where the attribute is
+	either a :class:`~pyms.Pipeline.Pipeline` or a function returning one
+	"""
+
+	module_name, _, attribute = recipe.partition(':')
+
+	if not attribute:
+		raise ValueError("The recipe must be given as 'module:attribute'")
+
+	pipeline = getattr(importlib.import_module(module_name), attribute)
+
+	if callable(pipeline) and not isinstance(pipeline, Pipeline):
+		pipeline = pipeline()
+
+	if not isinstance(pipeline, Pipeline):
+		raise TypeError(f"'{recipe}' is not a Pipeline")
+
+	return pipeline
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+	"""
+	Entry point for ``python -m pyms.batch``
+
+	:param argv: The command line arguments. If :py:obj:`None`, :py:data:`sys.argv` is used.
+	:type argv: list of str, optional
+
+	:return: The exit code; ``1`` if any file failed, otherwise ``0``.
+	:rtype: int
+	"""
+
+	parser = argparse.ArgumentParser(
+			prog="python -m pyms.batch",
+			description="Detect peaks in a set of GC-MS data files in parallel.",
+			)
+	parser.add_argument("files", nargs='+', type=pathlib.Path, help="The data files to process.")
+	parser.add_argument(
+			"-o", "--output-dir", type=pathlib.Path, required=True,
+			help="The directory to save the Experiments in.",
+			)
+	parser.add_argument("-j", "--jobs", type=int, default=None, help="The number of worker processes.")
+	parser.add_argument(
+			"--recipe", default=None,
+			help="A Pipeline, or a function returning one, given as 'module:attribute'. "
+				 "If not given, the default recipe is used with the options below.",
+			)
+	parser.add_argument("--cache-dir", type=pathlib.Path, default=None, help="Directory to cache intermediate results in.")
+	parser.add_argument("--report", type=pathlib.Path, default=None, help="CSV file to write timings and errors to.")
+	parser.add_argument("--struct", default="1.5m", help="Top-hat structural element.")
+	parser.add_argument("--points", type=int, default=9, help="Peak detection window, in scans.")
+	parser.add_argument("--scans", type=int, default=2, help="Number of scans to combine peaks over.")
+	parser.add_argument("--percent", type=float, default=2, help="Relative intensity threshold, in percent.")
+	parser.add_argument("--n-ions", type=int, default=3, help="Minimum number of ions above the cutoff.")
+	parser.add_argument("--cutoff", type=float, default=3000, help="Minimum ion intensity.")
+	args = parser.parse_args(argv)
+
+	if args.recipe is None:
+		pipeline = default_pipeline(
+				cache_dir=args.cache_dir,
+				struct=args.struct,
+				points=args.points,
+				scans=args.scans,
+				percent=args.percent,
+				n=args.n_ions,
+				cutoff=args.cutoff,
+				)
+	else:
+		pipeline = _load_recipe(args.recipe)
+		if args.cache_dir is not None:
+			pipeline.cache_dir = args.cache_dir
+
+	start_time = time.perf_counter()
+	results = run_batch(args.files, pipeline, args.output_dir, max_workers=args.jobs)
+	elapsed = time.perf_counter() - start_time
+
+	write_report(results, args.report or args.output_dir / "batch_report.csv")
+
+	failed = [result for result in results if not result.ok]
+	for result in failed:
+		print(f"\n{result.file_name}:\n{result.error}", file=sys.stderr)
+
+	print(f" -> Processed {len(results) - len(failed)} of {len(results)} files in {elapsed:.1f} s")
+
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
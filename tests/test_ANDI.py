@@ -25,6 +25,7 @@ from copy import deepcopy
 
 # 3rd party
 import deprecation  # type: ignore
+import numpy  # type: ignore
 import pytest  # type: ignore
 
 # pyms
@@ -225,6 +226,117 @@ def test_scan_list(andi):
 	assert scans[0].max_mass == 599.4000244140625
 
 
+def test_get_scan(andi):
+	scan = andi.get_scan(0)
+	assert isinstance(scan, Scan)
+	assert scan == andi.scan_list[0]
+	assert scan.min_mass == 50.099998474121094
+	assert scan.max_mass == 599.4000244140625
+
+	# The scan is a read-only view on the data
+	assert isinstance(scan.mass_list, numpy.ndarray)
+	assert numpy.shares_memory(scan.intensity_list, andi.get_scan(0).intensity_list)
+	with pytest.raises(ValueError):
+		scan.intensity_list[0] = 0
+
+	assert andi.get_scan(-1) == andi.scan_list[-1]
+	assert all(a == b for a, b in zip(andi.iter_scans(), andi.scan_list))
+
+	with pytest.raises(IndexError):
+		andi.get_scan(len(andi))
+	with pytest.raises(TypeError):
+		andi.get_scan(test_float)
+
+
+def test_from_arrays(andi):
+	scans = andi.scan_list
+	data = GCMS_data.from_arrays(
+			andi.time_list,
+			numpy.concatenate([scan.mass_list for scan in scans]),
+			numpy.concatenate([scan.intensity_list for scan in scans]),
+			[len(scan) for scan in scans],
+			)
+	assert data == andi
+	assert data.tic.intensity_array.tolist() == andi.tic.intensity_array.tolist()
+
+	with pytest.raises(ValueError):
+		GCMS_data.from_arrays(andi.time_list, [50.0, 51.0], [1.0], [2])
+	with pytest.raises(ValueError):
+		GCMS_data.from_arrays(andi.time_list[:2], [50.0, 51.0], [1.0, 2.0], [2])
+	with pytest.raises(ValueError):
+		GCMS_data.from_arrays(andi.time_list[:2], [50.0, 51.0], [1.0, 2.0], [1, 2])
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_from_arrays_order(lazy):
+	# An ascending scan, a descending scan, an empty scan and an unordered scan
+	masses = numpy.array([50.0, 51.0, 52.0, 62.0, 61.0, 60.0, 71.0, 70.0, 72.0])
+	intensities = numpy.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0])
+
+	with pytest.warns(UserWarning, match="Unknown sort order"):
+		data = GCMS_data.from_arrays([1.0, 2.0, 3.0, 4.0], masses, intensities, [3, 3, 0, 3], lazy=lazy)
+
+		assert data.get_scan(1).mass_list.tolist() == [60.0, 61.0, 62.0]
+		assert data.get_scan(1).intensity_list.tolist() == [6.0, 5.0, 4.0]
+		assert data.get_scan(1).min_mass == 60.0
+		assert data.get_scan(3).mass_list.tolist() == [70.0, 71.0, 72.0]
+		assert data.get_scan(3).intensity_list.tolist() == [8.0, 7.0, 9.0]
+
+		data.load()
+
+	assert [scan.mass_list.tolist() for scan in data.iter_scans()] == [
+			[50.0, 51.0, 52.0], [60.0, 61.0, 62.0], [], [70.0, 71.0, 72.0],
+			]
+	assert data.get_scan(1).intensity_list.tolist() == [6.0, 5.0, 4.0]
+	assert data.tic.intensity_array.tolist() == [6.0, 15.0, 0.0, 24.0]
+
+	# The arrays given are not changed
+	assert masses[3] == 62.0
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_from_arrays_source(lazy):
+
+	class Source:
+		closed = False
+
+		def close(self):
+			self.closed = True
+
+	source = Source()
+	data = GCMS_data.from_arrays(
+			[1.0, 2.0, 3.0], [50.0, 51.0, 52.0, 53.0], [1.0, 2.0, 3.0, 4.0], [2, 1, 1], lazy=lazy, source=source
+			)
+	assert source.closed is not lazy
+
+	data.load()
+	assert source.closed
+	assert data.get_scan(1).mass_list.tolist() == [52.0]
+
+
+def test_lazy(datadir, andi):
+	data = ANDI_reader(datadir / "gc01_0812_066.cdf", lazy=True)
+	assert len(data) == len(andi)
+	assert data.time_list == andi.time_list
+	assert data.get_scan(44) == andi.get_scan(44)
+	assert data._source.isopen()
+
+	data.trim("6.5m", "21m")
+	trimmed = deepcopy(andi)
+	trimmed.trim("6.5m", "21m")
+
+	assert data.time_list == trimmed.time_list
+	assert data.min_mass == trimmed.min_mass
+	assert data.max_mass == trimmed.max_mass
+	assert data.tic.intensity_array.tolist() == trimmed.tic.intensity_array.tolist()
+	assert data == trimmed
+
+	assert ANDI_reader(datadir / "gc01_0812_066.cdf", lazy=True) == andi
+
+	# The file is closed once the data has been read
+	assert data._source is None
+
+
 def test_tic(andi):
 	tic = andi.tic
 	assert isinstance(tic, IonChromatogram)
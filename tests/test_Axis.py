@@ -0,0 +1,157 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+import copy
+import pickle
+
+# 3rd party
+import numpy  # type: ignore
+import pytest  # type: ignore
+
+# pyms
+from pyms.Axis import Axis, as_axis
+
+# tests
+from .constants import *
+
+
+def linear_search(values, value):
+	# The nearest value, found the way get_index_at_time used to
+	best_index = 0
+	for index, item in enumerate(values):
+		if abs(item - value) < abs(values[best_index] - value):
+			best_index = index
+	return best_index
+
+
+uniform = (1.05 + 0.376 * numpy.arange(200)).tolist()
+jittered = (uniform + numpy.random.RandomState(1).normal(0, 0.01, 200)).tolist()
+irregular = numpy.cumsum(numpy.random.RandomState(2).random_sample(200) * 5).tolist()
+repeated = [1.0, 2.0, 2.0, 2.0, 3.0, 5.0, 5.0, 8.0]
+unsorted = [5.0, 1.0, 3.0, 3.0, 9.0, 2.0]
+
+
+class TestAxis:
+
+	def test_init(self):
+		axis = Axis(uniform)
+		assert len(axis) == 200
+		assert axis.min == uniform[0]
+		assert axis.max == uniform[-1]
+		assert axis.values.flags.writeable is False
+
+		# The values are copied
+		values = numpy.array(uniform)
+		axis = Axis(values)
+		values[0] = 0
+		assert axis[0] == uniform[0]
+
+	@pytest.mark.parametrize("obj, expects", [
+			(test_string, TypeError),
+			(test_list_strs, TypeError),
+			([[1, 2], [3, 4]], TypeError),
+			([], ValueError),
+			])
+	def test_init_errors(self, obj, expects):
+		with pytest.raises(expects):
+			Axis(obj)
+
+	def test_sequence(self):
+		axis = Axis(uniform)
+
+		assert isinstance(axis[0], float)
+		assert axis[-1] == uniform[-1]
+		assert list(axis) == uniform
+		assert axis.tolist() == uniform
+		assert axis == uniform
+		assert axis == Axis(uniform)
+		assert axis != Axis(jittered)
+
+		# ints are kept as ints
+		assert isinstance(Axis([50, 51, 52])[0], int)
+
+	def test_slice(self):
+		axis = Axis(uniform)
+		part = axis[10:20]
+
+		assert isinstance(part, Axis)
+		assert part == uniform[10:20]
+		assert part.min == uniform[10]
+		assert numpy.shares_memory(part.values, axis.values)
+
+	def test_immutable(self):
+		axis = Axis(uniform)
+
+		with pytest.raises(ValueError):
+			axis.values[0] = 0
+
+		with pytest.raises(TypeError):
+			axis[0] = 0  # type: ignore
+
+		assert copy.copy(axis) is axis
+		assert copy.deepcopy(axis) is axis
+
+	def test_pickle(self):
+		axis = Axis(jittered)
+		loaded = pickle.loads(pickle.dumps(axis))
+		assert loaded == axis
+		assert loaded.step == axis.step
+		assert loaded.values.flags.writeable is False
+
+	def test_step(self):
+		assert Axis(uniform).step == pytest.approx(0.376)
+		assert Axis(jittered).step == pytest.approx(0.376, rel=1e-3)
+		assert Axis(irregular).step is None
+		assert Axis(unsorted).step is None
+		assert Axis(uniform).mean_step == pytest.approx(0.376)
+
+	@pytest.mark.parametrize("values", [uniform, jittered, irregular, repeated, unsorted, [4.2], [1.0, 3.0]])
+	def test_nearest_index(self, values):
+		axis = Axis(values)
+
+		midpoints = [(a + b) / 2 for a, b in zip(values, values[1:])]
+		targets = [*values, *midpoints, *numpy.linspace(min(values) - 1, max(values) + 1, 101)]
+
+		expected = [linear_search(values, target) for target in targets]
+
+		assert [axis.nearest_index(target) for target in targets] == expected
+		assert axis.nearest_indices(targets).tolist() == expected
+
+	def test_nearest_index_numpy(self):
+		axis = Axis(uniform)
+		assert axis.nearest_index(numpy.float64(uniform[3] + 0.1)) == 3
+		assert axis.nearest_index(numpy.int64(2)) == linear_search(uniform, 2)
+
+	def test_nearest_indices_shape(self):
+		axis = Axis(uniform)
+		indices = axis.nearest_indices(numpy.array([[2.0, 3.0], [4.0, 5.0]]))
+		assert indices.shape == (2, 2)
+		assert axis.nearest_indices([]).shape == (0, )
+
+	def test_nearest_index_errors(self):
+		for obj in [test_string, test_dict, *test_lists]:
+			with pytest.raises(TypeError):
+				Axis(uniform).nearest_index(obj)
+
+	def test_as_axis(self):
+		axis = Axis(uniform)
+		assert as_axis(axis) is axis
+		assert as_axis(uniform) == axis
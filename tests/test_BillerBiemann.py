@@ -24,12 +24,14 @@ import copy
 # 3rd party
 import numpy  # type: ignore
 import pytest  # type: ignore
+import scipy.sparse  # type: ignore
 
 # pyms
 from pyms.BillerBiemann import (
 	BillerBiemann, get_maxima_indices, get_maxima_list, get_maxima_list_reduced,
 	get_maxima_matrix, num_ions_threshold, rel_threshold, sum_maxima,
 	)
+from pyms.IntensityMatrix import IntensityMatrix
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Noise.Analysis import window_analyzer
 from pyms.Noise.SavitzkyGolay import savitzky_golay
@@ -70,6 +72,18 @@ class TestBillerBiemann:
 
 		assert len(peak_list2) <= len(peak_list)
 
+	@pytest.mark.parametrize("points, scans", [(3, 1), (9, 2), (5, 3)])
+	def test_sparse(self, im_i, points, scans):
+		peak_list = BillerBiemann(im_i, points, scans)
+		sparse_peak_list = BillerBiemann(im_i.to_sparse(), points, scans)
+
+		assert len(sparse_peak_list) == len(peak_list)
+
+		for peak, sparse_peak in zip(peak_list, sparse_peak_list):
+			assert sparse_peak.rt == peak.rt
+			assert sparse_peak.bounds == peak.bounds
+			assert numpy.allclose(sparse_peak.mass_spectrum.mass_spec, peak.mass_spectrum.mass_spec)
+
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, *test_sequences, test_dict])
 	def test_im_errors(self, obj):
 		with pytest.raises(TypeError):
@@ -189,11 +203,108 @@ class Test_sum_maxima:
 			sum_maxima(im, scans=obj)
 
 
+def _reference_maxima_indices(ion_intensities, points):
+	# The original window-by-window implementation of get_maxima_indices()
+	peak_point = []
+	edge = -1
+	half = int(points / 2)
+	points = 2 * half + 1
+
+	for index in range(len(ion_intensities) - points + 1):
+		left = ion_intensities[index:index + half]
+		mid = ion_intensities[index + half]
+		right = ion_intensities[index + half + 1:index + points]
+		if mid > max(left) and mid > max(right):
+			peak_point.append(index + half)
+			edge = -1
+		if mid > max(left) and mid == max(right):
+			edge = index + half
+		if mid == max(left) and mid > max(right):
+			if edge > -1:
+				peak_point.append(int((edge + index + half) / 2))
+			edge = -1
+
+	return peak_point
+
+
+def _reference_maxima_matrix(raw_im, points, scans):
+	# The original column-by-column implementation of get_maxima_matrix()
+	numrows, numcols = raw_im.shape
+	maxima_im = numpy.zeros((numrows, numcols))
+
+	for col in range(numcols):
+		for row in _reference_maxima_indices(list(raw_im[:, col]), points):
+			maxima_im[row, col] = raw_im[row, col]
+
+	half = int(scans / 2)
+
+	for row in range(numrows):
+		best = 0
+		loc = 0
+
+		for ii in range(scans):
+			if 0 <= row - half + ii < numrows:
+				tic = maxima_im[row - half + ii].sum()
+				if tic > best:
+					best = tic
+					loc = ii
+
+		for ii in range(scans):
+			if 0 <= row - half + ii < numrows and ii != loc:
+				for col in range(numcols):
+					maxima_im[row - half + loc, col] += maxima_im[row - half + ii, col]
+					maxima_im[row - half + ii, col] = 0
+
+	return maxima_im
+
+
 class Test_get_maxima_indices:
-	@pytest.mark.skip(reason="TODO")
+
 	def test_get_maxima_indices(self):
-		# TODO: main test
-		pass
+		intensities = [0, 1, 5, 1, 0, 2, 2, 2, 1, 0, 3, 3, 0]
+		assert get_maxima_indices(intensities) == [2, 6, 10]
+		assert get_maxima_indices(numpy.array(intensities, dtype=float)) == [2, 6, 10]
+		assert get_maxima_indices(intensities, points=5) == [2, 6]
+		assert get_maxima_indices(intensities[:2]) == []
+
+		rng = numpy.random.RandomState(5)
+		for points in [2, 3, 4, 7, 9]:
+			intensities = list(rng.randint(0, 4, 200))
+			assert get_maxima_indices(intensities, points) == _reference_maxima_indices(intensities, points)
+
+	@pytest.mark.parametrize("points, scans", [(3, 1), (3, 2), (9, 2), (5, 3), (4, 4)])
+	def test_get_maxima_matrix(self, points, scans):
+		rng = numpy.random.RandomState(points * 10 + scans)
+		intensity_array = rng.randint(0, 5, (300, 12)) * rng.uniform(0.5, 1.0, (300, 12))
+		im = IntensityMatrix(list(numpy.arange(300.0)), list(range(50, 62)), intensity_array)
+
+		numpy.testing.assert_array_equal(
+				get_maxima_matrix(im, points, scans),
+				_reference_maxima_matrix(intensity_array, points, scans),
+				)
+
+	@pytest.mark.parametrize("scans", [2, 3, 5, 7])
+	def test_get_maxima_matrix_dense(self, scans):
+		# Maxima in most scans, so that the scan windows overlap and chain.
+		# The maxima are summed in a different order, hence the tolerance.
+		rng = numpy.random.RandomState(scans)
+		intensity_array = rng.uniform(0, 1, (400, 12)) * (rng.uniform(0, 1, (400, 12)) > 0.2)
+		im = IntensityMatrix(list(numpy.arange(400.0)), list(range(50, 62)), intensity_array)
+
+		expected = _reference_maxima_matrix(intensity_array, 2, scans)
+		numpy.testing.assert_allclose(get_maxima_matrix(im, 2, scans), expected)
+		numpy.testing.assert_allclose(get_maxima_matrix(im.to_sparse(), 2, scans).toarray(), expected)
+
+	@pytest.mark.parametrize("points, scans", [(3, 1), (3, 2), (9, 2), (5, 3), (4, 4)])
+	def test_get_maxima_matrix_sparse(self, points, scans):
+		rng = numpy.random.RandomState(points * 10 + scans)
+		intensity_array = rng.randint(0, 5, (300, 12)) * (rng.uniform(0, 1, (300, 12)) > 0.6)
+		intensity_array[:, 5] = 0
+		im = IntensityMatrix(list(numpy.arange(300.0)), list(range(50, 62)), intensity_array)
+
+		maxima_im = get_maxima_matrix(im.to_sparse(), points, scans)
+		assert scipy.sparse.issparse(maxima_im)
+		numpy.testing.assert_array_equal(maxima_im.toarray(), get_maxima_matrix(im, points, scans))
 
 	@pytest.mark.parametrize("obj", [test_string, *test_numbers, test_list_strs, test_dict])
 	def test_ion_intensities_errors(self, obj):
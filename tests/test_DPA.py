@@ -19,20 +19,38 @@
 #############################################################################
 
 # stdlib
+import copy
 import csv
 import math
 import operator
+import os
+from concurrent.futures.process import BrokenProcessPool
 from numbers import Number
 
 # 3rd party
 import numpy  # type: ignore
+import pandas  # type: ignore
 
 import pytest  # type: ignore
 
 # pyms
 from pyms.BillerBiemann import BillerBiemann, num_ions_threshold, rel_threshold
-from pyms.DPA.Alignment import Alignment, exprl2alignment
-from pyms.DPA.PairwiseAlignment import align_with_tree, PairwiseAlignment
+from pyms.DPA.Alignment import Alignment, exprl2alignment, load_alignment
+from pyms.DPA.PairwiseAlignment import (
+		_merge_alignments,
+		_packed_trace,
+		align,
+		align_to_profile,
+		align_with_tree,
+		banded_dp,
+		banded_score_matrix,
+		dp,
+		merge_packed,
+		pack_alignment,
+		PairwiseAlignment,
+		position_similarity,
+		score_matrix,
+		)
 from pyms.Experiment import Experiment, load_expr
 from pyms.GCMS.IO.JCAMP import JCAMP_reader
 from pyms.IntensityMatrix import build_intensity_matrix_i
@@ -315,6 +333,114 @@ def test_write_common_ion_csv(A1, outputdir):
 # TODO: read the csv and check values
 
 
+def test_alignment_peak_store(expr_list, F1):
+	# The peaks are shared with the experiment rather than copied
+	for expr, alignment in zip(expr_list, F1):
+		assert len(alignment) == len(expr.peak_list)
+		assert all(a is b for a, b in zip(alignment.peakpos[0], expr.peak_list))
+
+	with pytest.raises(ValueError):
+		F1[0].peakalgt[0, 0] = None
+
+	ma = align(F1[0], F1[1], Dw, Gw)
+	assert ma._peak_store[0] is F1[0]._peak_store[0]
+	assert ma._peak_store[1] is F1[1]._peak_store[0]
+	assert (ma._peak_index >= 0).sum(axis=0).tolist() == [len(F1[0]), len(F1[1])]
+
+	# Setting the peaks by position refers back to the peak store
+	copied = Alignment(None)
+	copied.expr_code = ma.expr_code
+	copied.peakalgt = list(ma.peakalgt)
+	numpy.testing.assert_array_equal(copied._peak_index, ma._peak_index)
+	assert [peaks.peaks for peaks in copied._peak_store] == [peaks.peaks for peaks in ma._peak_store]
+
+
+def test_alignment_arrays(A1):
+	peakalgt = A1.peakalgt
+
+	for position, peak in zip(peakalgt, A1.aligned_peaks()):
+		expected = composite_peak([p for p in position if p is not None])
+		assert peak.UID == expected.UID
+		assert peak.rt == expected.rt
+		numpy.testing.assert_array_equal(peak.mass_spectrum.mass_spec, expected.mass_spectrum.mass_spec)
+
+	for require_all_expr in [True, False]:
+		rows = [position for position in peakalgt if all(position) or not require_all_expr]
+
+		expected_rts = pandas.DataFrame(
+				[[None if p is None else p.rt for p in position] for position in rows],
+				columns=A1.expr_code,
+				)
+		expected_rts = expected_rts.reindex(sorted(expected_rts.columns), axis=1)
+		pandas.testing.assert_frame_equal(
+				A1.get_peak_alignment(minutes=False, require_all_expr=require_all_expr),
+				expected_rts,
+				)
+
+		expected_areas = pandas.DataFrame(
+				[[None if p is None else p.area for p in position] for position in rows],
+				columns=A1.expr_code,
+				)
+		expected_areas = expected_areas.reindex(sorted(expected_areas.columns), axis=1)
+		pandas.testing.assert_frame_equal(A1.get_area_alignment(require_all_expr=require_all_expr), expected_areas)
+
+
+def test_align_to_profile(expr_list, F1, outputdir):
+	profile = align(F1[0], F1[1], Dw, Gw)
+	state_file = outputdir / "profile_alignment.dat"
+
+	A = align_to_profile(profile, expr_list[2:4], Dw, Gw, state_file=state_file)
+	assert isinstance(A, Alignment)
+	assert A.expr_code == [expr.expr_code for expr in expr_list[:4]]
+	assert len(profile.expr_code) == 2
+
+	# Every peak of each experiment is in the alignment exactly once
+	for expr, indices in zip(expr_list, A._peak_index.T):
+		assert sorted(indices[indices >= 0]) == list(range(len(expr.peak_list)))
+
+	loaded = load_alignment(state_file)
+	assert loaded.expr_code == A.expr_code
+	numpy.testing.assert_array_equal(loaded._peak_index, A._peak_index)
+
+	# Adding one experiment to another is the same as aligning them
+	numpy.testing.assert_array_equal(align_to_profile(F1[0], [expr_list[1]], Dw, Gw)._peak_index, profile._peak_index)
+
+	with pytest.raises(ValueError):
+		align_to_profile(A, [expr_list[0]], Dw, Gw)
+	with pytest.raises(TypeError):
+		align_to_profile(A, expr_list[4], Dw, Gw)
+	with pytest.raises(TypeError):
+		align_to_profile(A, expr_list[4:], Dw, Gw, state_file=test_int)
+	with pytest.raises(TypeError):
+		load_alignment(test_int)
+
+
+def _positions(alignment):
+	# The peaks aligned at each position, identified by experiment and peak index
+	return {
+			frozenset((code, index) for code, index in zip(alignment.expr_code, row.tolist()) if index >= 0)
+			for row in alignment._peak_index
+			}
+
+
+def test_align_to_profile_difference(expr_list, F1, T1):
+	# Adding the last experiment to an alignment of the others, rather than
+	# realigning them all, gives a slightly different alignment, as the
+	# profile only approximates the score used by align()
+	full = align_with_tree(T1)
+	partial = align_with_tree(PairwiseAlignment(F1[:-1], Dw, Gw))
+	profile = align_to_profile(partial, [expr_list[-1]], Dw, Gw)
+
+	assert sorted(profile.expr_code) == sorted(full.expr_code)
+
+	full_positions, profile_positions = _positions(full), _positions(profile)
+	assert len(full_positions) == 603
+	assert len(profile_positions) == 602
+
+	# About 93% of the positions are the same
+	assert len(full_positions & profile_positions) == 563
+
+
 def test_align_2_alignments(A1, datadir, outputdir):
 	expr_list = []
 
@@ -377,8 +503,228 @@ def test_align_2_alignments(A1, datadir, outputdir):
 	top_ion_list = A9.common_ion()
 	A9.write_common_ion_csv(outputdir / 'area.csv', top_ion_list)
 
+
+def test_score_matrix(F1):
+	merged = align(F1[0], F1[1], Dw, Gw)
+
+	for a1, a2 in [(F1[0], F1[1]), (merged, F1[2]), (F1[3], merged)]:
+		expected = numpy.array([[position_similarity(pos1, pos2, Dw) for pos2 in a2.peakalgt] for pos1 in a1.peakalgt])
+
+		M = score_matrix(a1, a2, Dw)
+		assert M.shape == (len(a1), len(a2))
+		assert numpy.allclose(M, expected, rtol=0, atol=1e-12)
+
+
+def test_banded_score_matrix(F1):
+	merged = align(F1[0], F1[1], Dw, Gw)
+
+	for a1, a2 in [(F1[0], F1[1]), (merged, F1[2])]:
+		M = score_matrix(a1, a2, Dw)
+		scores, first, last = banded_score_matrix(a1, a2, Dw)
+
+		assert len(scores) == len(first) == len(last) == len(a1)
+		assert scores.shape[1] < len(a2)
+
+		# Every score outside the band is the worst score
+		banded = numpy.ones_like(M)
+		for i in range(len(a1)):
+			banded[i, first[i]:last[i] + 1] = scores[i, :last[i] - first[i] + 1]
+
+		# The scores are calculated with matrix products of different shapes, so may differ in the last place
+		numpy.testing.assert_allclose(banded, M, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("gap", [0.2, 0.3, 0.45])
+def test_banded_dp(gap):
+	rng = numpy.random.RandomState(42)
+
+	for _ in range(20):
+		rts1 = numpy.sort(rng.uniform(0, 200, rng.randint(1, 40)))
+		rts2 = numpy.sort(rng.uniform(0, 200, rng.randint(1, 40)))
+		delta = numpy.abs(rts1[:, None] - rts2[None, :])
+		S = numpy.where(delta > 10, 1.0, rng.random_sample(delta.shape))
+
+		first = numpy.array([numpy.argmax(row <= 10) if numpy.any(row <= 10) else 0 for row in delta])
+		last = numpy.array([len(row) - 1 - numpy.argmax(row[::-1] <= 10) if numpy.any(row <= 10) else -1 for row in delta])
+		scores = numpy.ones((len(rts1), max(1, numpy.max(last - first) + 1)))
+		for i in range(len(rts1)):
+			scores[i, :last[i] - first[i] + 1] = S[i, first[i]:last[i] + 1]
+
+		result = banded_dp(scores, first, last, len(rts2), gap)
+		expected = dp(S, gap)
+
+		n, m = S.shape
+		assert result['D'][n, m - result['offsets'][n]] == pytest.approx(expected['D'][n, m])
+		assert result['matches'] == expected['matches']
+
+
+def test_banded_alignment(F1, T1):
+	for a1, a2 in [(F1[0], F1[1]), (F1[2], F1[3])]:
+		assert align(a1, a2, Dw, Gw, banded=True).similarity == pytest.approx(align(a1, a2, Dw, Gw).similarity)
+
+	T = PairwiseAlignment(F1, Dw, Gw, banded=True)
+	assert numpy.allclose(T.sim_matrix, T1.sim_matrix)
+
+	A = align_with_tree(T, min_peaks=2)
+	assert len(A) == 232
+
+
+@pytest.mark.parametrize("gap", [0.5, 0.9])
+def test_banded_gap_errors(F1, gap):
+	with pytest.raises(ValueError):
+		align(F1[0], F1[1], Dw, gap, banded=True)
+	with pytest.raises(ValueError):
+		PairwiseAlignment(F1, Dw, gap, banded=True)
+	with pytest.raises(ValueError):
+		banded_dp(numpy.zeros((1, 1)), numpy.zeros(1, dtype=int), numpy.zeros(1, dtype=int), 1, gap)
+
+	# The full alignment has no limit
+	align(F1[0], F1[1], Dw, gap)
+
+
+def test_parallel_sim_matrix(F1, T1):
+	progress = []
+	T = PairwiseAlignment(F1, Dw, Gw, workers=2, progress_callback=lambda done, total: progress.append((done, total)))
+
+	assert numpy.array_equal(T.sim_matrix, T1.sim_matrix)
+	assert str(T.tree) == str(T1.tree)
+
+	n_pairs = len(F1) * (len(F1) - 1) // 2
+	assert progress == [(done, n_pairs) for done in range(1, n_pairs + 1)]
+
+	with pytest.raises(TypeError):
+		PairwiseAlignment(F1, Dw, Gw, workers=test_float)
+	with pytest.raises(ValueError):
+		PairwiseAlignment(F1, Dw, Gw, workers=0)
+
+
+def _kill_worker(*args):
+	# Kill the worker process, as running out of memory would
+	os._exit(1)
+
+
+def test_parallel_sim_matrix_broken(F1, monkeypatch):
+	# The worker processes are forked, so they call the replacement function
+	monkeypatch.setattr("pyms.DPA.PairwiseAlignment._packed_similarity", _kill_worker)
+	monkeypatch.setattr("pyms.DPA.PairwiseAlignment._POLL_INTERVAL", 0.1)
+
+	with pytest.raises(BrokenProcessPool):
+		PairwiseAlignment(F1, Dw, Gw, workers=2)
+
+
+def test_merge_packed(F1):
+	a1 = F1[0]
+	for a2 in F1[1:3]:
+		packed1, packed2 = pack_alignment(a1), pack_alignment(a2)
+		trace, similarity = _packed_trace(packed1, packed2, Dw, Gw)
+		a1, origins = _merge_alignments(a1, a2, trace)
+
+		rts, spectra = merge_packed(packed1, packed2, origins)
+		expected_rts, expected_spectra = pack_alignment(a1)
+		numpy.testing.assert_array_equal(rts, expected_rts)
+		numpy.testing.assert_array_equal(spectra, expected_spectra)
+
+
+def test_parallel_align_with_tree(T1):
+	serial = align_with_tree(T1, min_peaks=2)
+
+	T = copy.copy(T1)
+	T.workers = 2
+	parallel = align_with_tree(T, min_peaks=2)
+
+	assert parallel.expr_code == serial.expr_code
+	assert len(parallel) == len(serial) == 232
+
+	# The peaks are shared with the input alignments rather than copied
+	for parallel_position, serial_position in zip(parallel.peakalgt, serial.peakalgt):
+		assert all(p is s for p, s in zip(parallel_position, serial_position))
+
+
+def test_parallel_align_with_tree_broken(T1, monkeypatch):
+	# The worker processes are forked, so they call the replacement function
+	monkeypatch.setattr("pyms.DPA.PairwiseAlignment._packed_trace", _kill_worker)
+
+	T = copy.copy(T1)
+	T.workers = 2
+
+	with pytest.raises(BrokenProcessPool):
+		align_with_tree(T, min_peaks=2)
+
+
 # def test_alignment_compare():
 # todo
 
-# def test_dp()
-# todo
+
+def _reference_dp(S, gap_penalty):
+	# The original cell-by-cell Needleman-Wunsch implementation of dp()
+	row_length, col_length = S.shape
+
+	D = numpy.zeros((row_length + 1, col_length + 1), dtype='d')
+	for i in range(1, row_length + 1):
+		D[i, 0] = gap_penalty * i
+	for j in range(1, col_length + 1):
+		D[0, j] = gap_penalty * j
+
+	trace_matrix = numpy.zeros((row_length + 1, col_length + 1))
+	trace_matrix[:, 0] = 1
+	trace_matrix[0, :] = 2
+	trace_matrix[0, 0] = 3
+
+	for i in range(1, row_length + 1):
+		for j in range(1, col_length + 1):
+			darray = [D[i - 1, j - 1] + S[i - 1, j - 1], D[i - 1, j] + gap_penalty, D[i, j - 1] + gap_penalty]
+			D[i, j] = min(darray)
+			trace_matrix[i, j] = darray.index(D[i, j])
+
+	trace = []
+	matches = []
+	i, j = row_length, col_length
+	p = [row_length - 1]
+	q = [col_length - 1]
+	direction = trace_matrix[i, j]
+
+	while direction != 3:
+		if direction == 0:
+			i, j = i - 1, j - 1
+			matches.append([i, j])
+		elif direction == 1:
+			i = i - 1
+		elif direction == 2:
+			j = j - 1
+		p.append(i - 1)
+		q.append(j - 1)
+		trace.append(direction)
+		direction = trace_matrix[i, j]
+
+	p.pop()
+	q.pop()
+
+	return {'p': p[::-1], 'q': q[::-1], 'trace': trace[::-1], 'matches': matches[::-1], 'D': D, 'phi': trace_matrix}
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (1, 7), (7, 1), (25, 25), (40, 17), (17, 40)])
+@pytest.mark.parametrize("gap", [0.0, 0.25, 0.3])
+@pytest.mark.parametrize("quantised", [False, True])
+def test_dp(shape, gap, quantised):
+	rng = numpy.random.RandomState(sum(shape))
+	S = rng.random_sample(shape)
+
+	if quantised:
+		# Coarse scores produce many ties, which must be broken the same way
+		S = numpy.round(S * 4) / 4
+
+	result = dp(S, gap)
+	expected = _reference_dp(S, gap)
+
+	assert result['p'] == expected['p']
+	assert result['q'] == expected['q']
+	assert result['trace'] == expected['trace']
+	assert result['matches'] == expected['matches']
+	assert numpy.array_equal(result['D'], expected['D'])
+	assert numpy.array_equal(result['phi'], expected['phi'])
+	assert result['phi'].dtype == numpy.uint8
+
+
+def test_dp_errors():
+	with pytest.raises(IndexError):
+		dp(numpy.zeros((0, 0)), Gw)
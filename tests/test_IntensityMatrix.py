@@ -27,11 +27,12 @@ import types
 import numpy  # type: ignore
 import pytest  # type: ignore
 import deprecation  # type: ignore
+import scipy.sparse  # type: ignore
 
 # pyms
 from pyms.IntensityMatrix import (
 	ASCII_CSV, build_intensity_matrix, build_intensity_matrix_i, import_leco_csv,
-	IntensityMatrix,
+	IntensityMatrix, load_binary,
 	)
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Spectrum import MassSpectrum
@@ -214,6 +215,22 @@ class TestIntensityMatrix:
 		with pytest.raises(expects):
 			im.get_index_at_time(obj)
 
+	def test_indices_at_times(self, im):
+		times = [test_int, test_float, 12, im.time_list[-1]]
+		indices = im.indices_at_times(times)
+
+		assert isinstance(indices, numpy.ndarray)
+		assert indices.tolist() == [im.get_index_at_time(time) for time in times]
+		assert im.indices_at_times(numpy.array([[12.0]])).tolist() == [[10]]
+		assert im.indices_at_times([]).tolist() == []
+
+		for obj in [test_string, test_dict, test_list_strs, test_int]:
+			with pytest.raises(TypeError):
+				im.indices_at_times(obj)
+
+		with pytest.raises(IndexError):
+			im.indices_at_times([12, -1])
+
 	def test_get_time_at_index(self, im):
 		assert im.get_time_at_index(test_int) == 1304.15599823
 
@@ -299,6 +316,60 @@ class TestIntensityMatrix:
 		with pytest.raises(IndexError):
 			im.get_ic_at_index(test_int)
 
+	def test_shared_time_list(self, im):
+		ic = im.get_ic_at_index(123)
+
+		# The IonChromatogram shares the time list of the IntensityMatrix
+		assert ic._time_list is im._time_list
+		assert ic.time_list == im.time_list
+
+		# but changes to the copy returned by time_list are not shared
+		time_list = ic.time_list
+		time_list[0] = 0
+		assert im.time_list[0] == 1.05200003833
+
+	def test_get_ic_view(self, im):
+		im = copy.deepcopy(im)
+		expected = im.get_ic_at_index(123)
+
+		view = im.get_ic_view(123)
+		assert isinstance(view, IonChromatogram)
+		assert view.is_view
+		assert not expected.is_view
+		assert view == expected
+		assert view._time_list is im._time_list
+		assert numpy.shares_memory(view._intensity_array, im._intensity_array)
+
+		# Read-only views can't change the intensity matrix
+		with pytest.raises(ValueError):
+			view.intensity_array = numpy.zeros(len(view))
+		with pytest.raises(ValueError):
+			view - view
+
+		# but writeable views can, in place or by setting the intensity array
+		view = im.get_ic_view(123, writeable=True)
+		view.intensity_array = numpy.ones(len(view))
+		assert (im.get_ic_at_index(123).intensity_array == 1).all()
+
+		view - view
+		assert (im.get_ic_at_index(123).intensity_array == 0).all()
+
+		with pytest.raises(ValueError):
+			view.intensity_array = numpy.ones(len(view) + 1)
+
+		# The rest of the matrix is unchanged, and stays writeable
+		assert im.get_ic_at_index(122) == copy.deepcopy(im).get_ic_at_index(122)
+		assert im._intensity_array.flags.writeable
+
+		for obj in [test_dict, test_list_strs, test_list_ints, test_string, test_float]:
+			with pytest.raises(TypeError):
+				im.get_ic_view(obj)
+		for obj in [test_dict, test_list_strs, test_string, test_int]:
+			with pytest.raises(TypeError):
+				im.get_ic_view(123, writeable=obj)
+		with pytest.raises(IndexError):
+			im.get_ic_view(test_int)
+
 	def test_get_ic_at_mass(self, im):
 		# TODO: im.get_ic_at_mass() # Broken
 		ic = im.get_ic_at_mass(123)
@@ -373,6 +444,13 @@ class TestIntensityMatrix:
 			with pytest.raises(TypeError):
 				im.get_index_of_mass(obj)
 
+		masses = [73.3, 50, 123.2516, 1000]
+		assert im.indices_of_masses(masses).tolist() == [im.get_index_of_mass(mass) for mass in masses]
+
+		for obj in [test_string, test_list_strs, test_dict, test_int]:
+			with pytest.raises(TypeError):
+				im.indices_of_masses(obj)
+
 		for obj in [test_float, test_string, test_list_strs, test_list_ints, test_dict]:
 			with pytest.raises(TypeError):
 				im.get_mass_at_index(obj)
@@ -419,8 +497,17 @@ class TestIntensityMatrix:
 
 		im.null_mass(120)
 
-		# TODO: Check that the nulling worked
-		print(sum(im.get_ic_at_mass(120).intensity_array))
+		assert not im.get_ic_at_mass(120).intensity_array.any()
+		assert im.get_ic_at_mass(121).intensity_array.any()
+
+	def test_tic(self, im):
+		tic = im.tic
+		assert isinstance(tic, IonChromatogram)
+		assert tic.is_tic()
+		assert numpy.array_equal(tic.intensity_array, im.intensity_array.sum(axis=1))
+		assert tic._time_list is im._time_list
+
+		assert im.get_ic_at_mass() == tic
 
 	def test_reduce_mass_spectra(self, im):
 		im = copy.deepcopy(im)
@@ -431,6 +518,181 @@ class TestIntensityMatrix:
 				im.reduce_mass_spectra(obj)
 
 
+@pytest.fixture(scope="module")
+def im_sparse(im):
+	return im.to_sparse()
+
+
+class TestSparse:
+
+	def test_creation(self, im, im_sparse):
+		assert im_sparse.is_sparse
+		assert not im.is_sparse
+		assert isinstance(im_sparse._intensity_array, scipy.sparse.csr_matrix)
+		assert im_sparse._time_list is im._time_list
+
+		assert im_sparse == im
+		assert im_sparse.to_dense() == im
+		assert not im_sparse.to_dense().is_sparse
+
+		# Other sparse formats are stored by scan
+		coo = scipy.sparse.coo_matrix(im.intensity_array)
+		assert IntensityMatrix(im.time_list, im.mass_list, coo) == im_sparse
+
+		with pytest.raises(ValueError):
+			IntensityMatrix(im.time_list[1:], im.mass_list, coo)
+		with pytest.raises(ValueError):
+			IntensityMatrix(im.time_list, im.mass_list[1:], coo)
+
+	def test_build(self, data, im, im_i):
+		im_sparse = build_intensity_matrix(data, sparse=True)
+		assert im_sparse.is_sparse
+		assert im_sparse == im
+		assert im_sparse._intensity_array.data.all()
+
+		im_i_sparse = build_intensity_matrix_i(data, sparse=True)
+		assert im_i_sparse.is_sparse
+		assert im_i_sparse == im_i
+
+		im_32 = build_intensity_matrix_i(data, dtype=numpy.float32, sparse=True)
+		assert im_32._intensity_array.dtype == numpy.float32
+		assert im_32 == build_intensity_matrix_i(data, dtype=numpy.float32)
+
+		# Small bins
+		im_fine = build_intensity_matrix(data, bin_interval=0.1, bin_left=0.05, bin_right=0.05, sparse=True)
+		assert im_fine.is_sparse
+		assert im_fine == build_intensity_matrix(data, bin_interval=0.1, bin_left=0.05, bin_right=0.05)
+
+		for obj in [test_string, test_int, test_dict, test_list_ints]:
+			with pytest.raises(TypeError):
+				build_intensity_matrix(data, sparse=obj)
+			with pytest.raises(TypeError):
+				build_intensity_matrix_i(data, sparse=obj)
+
+	def test_size(self, im, im_sparse):
+		assert im_sparse.size == im.size
+		assert len(im_sparse) == len(im)
+		assert list(im_sparse.iter_ms_indices()) == list(im.iter_ms_indices())
+		assert list(im_sparse.iter_ic_indices()) == list(im.iter_ic_indices())
+
+	def test_intensity_array(self, im, im_sparse):
+		assert isinstance(im_sparse.intensity_array, numpy.ndarray)
+		assert numpy.array_equal(im_sparse.intensity_array, im.intensity_array)
+		assert im_sparse.intensity_array_list == im.intensity_array_list
+
+	def test_get_ic_at_index(self, im, im_sparse):
+		for ix in [0, 123, len(im.mass_list) - 1]:
+			ic = im_sparse.get_ic_at_index(ix)
+			assert isinstance(ic, IonChromatogram)
+			assert ic == im.get_ic_at_index(ix)
+			assert ic._time_list is im_sparse._time_list
+
+		with pytest.raises(IndexError):
+			im_sparse.get_ic_at_index(test_int)
+		with pytest.raises(TypeError):
+			im_sparse.get_ic_at_index(test_string)
+
+	def test_get_ic_view(self, im, im_sparse):
+		# The intensities are copied, and can't be changed
+		ic = im_sparse.get_ic_view(123)
+		assert ic == im.get_ic_at_index(123)
+		assert not ic.is_view
+		with pytest.raises(ValueError):
+			ic - ic
+
+		with pytest.raises(ValueError):
+			im_sparse.get_ic_view(123, writeable=True)
+
+	def test_get_ms_at_index(self, im, im_sparse):
+		for ix in [0, 1234, len(im) - 1]:
+			assert im_sparse.get_scan_at_index(ix) == im.get_scan_at_index(ix)
+
+			ms = im_sparse.get_ms_at_index(ix)
+			assert isinstance(ms, MassSpectrum)
+			assert ms.mass_spec == im.get_ms_at_index(ix).mass_spec
+
+		with pytest.raises(IndexError):
+			im_sparse.get_scan_at_index(-1)
+
+	def test_tic(self, im, im_sparse):
+		assert numpy.allclose(im_sparse.tic.intensity_array, im.tic.intensity_array)
+
+	def test_crop_mass(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		im.crop_mass(100, 200)
+		im_sparse.crop_mass(100, 200)
+
+		assert im_sparse.is_sparse
+		assert im_sparse == im
+		assert min(im_sparse.mass_list) >= 100
+		assert max(im_sparse.mass_list) <= 200
+
+	def test_null_mass(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		# The ion chromatograms are cached, so make sure the cache is updated
+		assert im_sparse.get_ic_at_mass(120).intensity_array.any()
+
+		im.null_mass(120)
+		im_sparse.null_mass(120)
+
+		assert im_sparse == im
+		assert not im_sparse.get_ic_at_mass(120).intensity_array.any()
+		assert im_sparse._intensity_array.nnz == im.to_sparse()._intensity_array.nnz
+
+	def test_set_ic_at_index(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		ic = im.get_ic_at_index(10)
+		ic.intensity_array = ic.intensity_array[::-1].copy()
+
+		im.set_ic_at_index(20, ic)
+		im_sparse.set_ic_at_index(20, ic)
+
+		assert im_sparse.is_sparse
+		assert im_sparse == im
+		assert im_sparse.get_ic_at_index(20) == im.get_ic_at_index(20)
+
+		with pytest.raises(ValueError):
+			im_sparse.set_ic_at_index(20, IonChromatogram(numpy.zeros(10), list(range(10))))
+		with pytest.raises(IndexError):
+			im_sparse.set_ic_at_index(test_int, ic)
+
+	def test_reduce_mass_spectra(self, im, im_sparse):
+		im, im_sparse = copy.deepcopy(im), copy.deepcopy(im_sparse)
+
+		im.reduce_mass_spectra(5)
+		im_sparse.reduce_mass_spectra(5)
+
+		assert im_sparse == im
+		assert im_sparse._intensity_array.getnnz(axis=1).max() <= 5
+
+	def test_reduce_negative_mass_spectra(self):
+		intensities = numpy.array([[-3.0, 0, 0, 2, -1, 0], [5, 0, 5, 5, 0, 0], [-1, -2, 0, 0, 0, 0]])
+		im = IntensityMatrix([1.0, 2.0, 3.0], [50, 51, 52, 53, 54, 55], intensities)
+		im_sparse = im.to_sparse()
+
+		im.reduce_mass_spectra(2)
+		im_sparse.reduce_mass_spectra(2)
+
+		assert im_sparse == im
+
+	def test_pickle(self, im_sparse):
+		im_sparse.get_ic_at_index(0)
+
+		loaded = pickle.loads(pickle.dumps(im_sparse))
+		assert loaded.is_sparse
+		assert loaded == im_sparse
+		assert loaded._column_cache is None
+
+	def test_save_binary(self, im, im_sparse, outputdir):
+		filename = outputdir / "im_sparse.pyms-im"
+		im_sparse.save_binary(filename)
+
+		assert load_binary(filename, verify=True) == im
+
+
 class Test_export_ascii:
 
 	def test_export_ascii(self, im, outputdir):
@@ -483,6 +745,83 @@ class Test_leco_csv:
 			im.export_leco_csv(obj)
 
 
+class Test_binary:
+	@pytest.mark.parametrize("mmap", [True, False])
+	def test_round_trip(self, im, outputdir, mmap):
+		filename = outputdir / "im.pyms-im"
+		im.save_binary(filename)
+
+		loaded_im = load_binary(filename, mmap=mmap, verify=True)
+		assert isinstance(loaded_im, IntensityMatrix)
+		assert loaded_im == im
+		assert isinstance(loaded_im._intensity_array, numpy.memmap) is mmap
+
+		ic = loaded_im.get_ic_at_index(10)
+		assert numpy.array_equal(ic.intensity_array, im.get_ic_at_index(10).intensity_array)
+		assert ic.mass == im.get_ic_at_index(10).mass
+
+		# Changes are not written back to the file
+		loaded_im.null_mass(loaded_im.mass_list[10])
+		assert load_binary(filename) == im
+
+	def test_float32(self, data, outputdir):
+		im_f32 = build_intensity_matrix(data, dtype=numpy.float32)
+		filename = outputdir / "im_f32.pyms-im"
+		im_f32.save_binary(filename)
+
+		loaded_im = load_binary(filename)
+		assert loaded_im.intensity_array.dtype == numpy.float32
+		assert loaded_im == im_f32
+
+	def test_corrupt(self, im, outputdir):
+		filename = outputdir / "im_corrupt.pyms-im"
+		im.save_binary(filename)
+
+		data = bytearray(filename.read_bytes())
+		data[-1] ^= 0xff
+		filename.write_bytes(bytes(data))
+
+		# The intensities are only checked on request
+		load_binary(filename)
+
+		with pytest.raises(IOError, match="corrupt"):
+			load_binary(filename, verify=True)
+
+	@pytest.mark.parametrize("mmap", [True, False])
+	def test_truncated(self, im, outputdir, mmap):
+		filename = outputdir / "im_truncated.pyms-im"
+		im.save_binary(filename)
+
+		data = filename.read_bytes()
+		filename.write_bytes(data[:-8])
+
+		with pytest.raises(IOError, match="The intensity data in the file is corrupt"):
+			load_binary(filename, mmap=mmap)
+
+	def test_version(self, im, outputdir):
+		filename = outputdir / "im_version.pyms-im"
+		im.save_binary(filename)
+
+		data = bytearray(filename.read_bytes())
+		data[8] = 99
+		filename.write_bytes(bytes(data))
+
+		with pytest.raises(IOError, match="Unsupported"):
+			load_binary(filename)
+
+	def test_not_binary(self, im_leco_filename):
+		with pytest.raises(IOError, match="not a PyMassSpec binary intensity matrix"):
+			load_binary(im_leco_filename)
+
+	@pytest.mark.parametrize("obj", [test_dict, *test_lists, *test_numbers])
+	def test_errors(self, im, obj):
+		with pytest.raises(TypeError):
+			im.save_binary(obj)
+
+		with pytest.raises(TypeError):
+			load_binary(obj)
+
+
 def test_IntensityMatrix_custom(data):
 	# IntensityMatrix
 	# must build intensity matrix before accessing any intensity matrix methods.
@@ -541,6 +880,31 @@ def test_build_intensity_matrix(data):
 		build_intensity_matrix(data, bin_interval=0)
 
 
+def _reference_fill_bins(data, min_mass, bin_interval, bl, num_bins):
+	# The original point-by-point binning loop
+	intensity_matrix = []
+	for scan in data.scan_list:
+		intensity_list = [0.0] * num_bins
+		for mass, intensity in zip(scan.mass_list, scan.intensity_list):
+			intensity_list[int((mass + bl - min_mass) / bin_interval)] += intensity
+		intensity_matrix.append(intensity_list)
+
+	return numpy.array(intensity_matrix)
+
+
+def test_build_intensity_matrix_values(data, im, im_i):
+	numpy.testing.assert_array_equal(
+			im.intensity_array,
+			_reference_fill_bins(data, im.mass_list[0], 1, 0.5, len(im.mass_list)),
+			)
+	numpy.testing.assert_array_equal(im_i.intensity_array, _reference_fill_bins(data, im_i.mass_list[0], 1, 0.3, len(im_i.mass_list)))
+
+	im_32 = build_intensity_matrix_i(data, dtype=numpy.float32)
+	assert im_32.intensity_array.dtype == numpy.float32
+	assert im_32.mass_list == im_i.mass_list
+	assert numpy.allclose(im_32.intensity_array, im_i.intensity_array, rtol=1e-6)
+
+
 def test_build_intensity_matrix_i(data, im_i):
 	assert isinstance(im_i, IntensityMatrix)
 
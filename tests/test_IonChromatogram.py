@@ -78,6 +78,27 @@ def test_subtract_ic(im):
 	assert isinstance(ic3, IonChromatogram)
 
 
+def test_subtract_ic_values(im):
+	ic1 = im.get_ic_at_index(0)
+	ic2 = im.get_ic_at_index(1)
+	expected = ic1.intensity_array - ic2.intensity_array
+
+	assert numpy.array_equal((ic1 - ic2).intensity_array, expected)
+
+
+def test_view(im):
+	view = im.get_ic_view(0)
+	assert view.is_view
+
+	# Copies of a view have their own intensities
+	for ic in [copy.copy(view), copy.deepcopy(view), pickle.loads(pickle.dumps(view))]:
+		assert not ic.is_view
+		assert ic == view
+		ic.intensity_array = numpy.zeros(len(ic))
+
+	assert view == im.get_ic_at_index(0)
+
+
 def test_equality(tic, im):
 	assert tic == IonChromatogram(tic.intensity_array, tic.time_list)
 	assert tic != im.get_ic_at_index(0)
@@ -276,6 +297,26 @@ def test_get_index_at_time(tic):
 		tic.get_index_at_time(1000000)
 
 
+def test_indices_at_times(tic):
+	times = [12, test_int, test_float]
+	assert tic.indices_at_times(times).tolist() == [tic.get_index_at_time(time) for time in times]
+
+	# Errors
+	for obj in [test_string, test_int, test_dict, test_list_strs]:
+		with pytest.raises(TypeError):
+			tic.indices_at_times(obj)
+
+	with pytest.raises(IndexError):
+		tic.indices_at_times([-1])
+
+
+def test_shared_time_list(data, tic):
+	# The TIC shares the time list of the GCMS_data, and copies of the TIC share it too
+	assert tic._time_list is data._time_list
+	assert copy.copy(tic)._time_list is tic._time_list
+	assert copy.deepcopy(tic)._time_list is tic._time_list
+
+
 def test_get_time_at_index(tic):
 	assert isinstance(tic.get_time_at_index(test_int), float)
 	assert tic.get_time_at_index(test_int) == 1304.15599823
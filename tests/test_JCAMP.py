@@ -30,7 +30,7 @@ import pytest  # type: ignore
 
 # pyms
 from pyms.GCMS.Class import GCMS_data
-from pyms.GCMS.IO.JCAMP import JCAMP_reader
+from pyms.GCMS.IO.JCAMP import iter_JCAMP_scans, JCAMP_reader
 from pyms.IonChromatogram import IonChromatogram
 from pyms.Spectrum import Scan
 
@@ -48,6 +48,21 @@ def test_JCAMP_reader(datadir):
 		JCAMP_reader(test_string)
 
 
+def test_iter_JCAMP_scans(datadir, data):
+	scans = iter_JCAMP_scans(datadir / "ELEY_1_SUBTRACT.JDX")
+
+	for index in range(3):
+		time, scan = next(scans)
+		assert time == data.time_list[index]
+		assert isinstance(scan, Scan)
+		assert isinstance(scan.mass_list, numpy.ndarray)
+		assert scan == data.get_scan(index)
+
+	for obj in [*test_numbers, *test_sequences, test_dict]:
+		with pytest.raises(TypeError):
+			next(iter_JCAMP_scans(obj))
+
+
 # def test_JCAMP_OpenChrom_reader(datadir):
 	# todo
 
@@ -0,0 +1,288 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+import base64
+import gzip
+import math
+import struct
+import zlib
+
+# 3rd party
+import numpy  # type: ignore
+import pytest  # type: ignore
+
+# pyms
+from pyms.GCMS.Class import GCMS_data
+from pyms.GCMS.IO.MZML import iter_mzML_scans, mzML_reader
+from pyms.Spectrum import Scan
+
+# tests
+from .constants import *
+
+
+def _binary_data_array(values, array_type, dtype, compress):
+	data = numpy.asarray(values, dtype=dtype).tobytes()
+	if compress:
+		data = zlib.compress(data)
+		compression = '<cvParam cvRef="MS" accession="MS:1000574" name="zlib compression"/>'
+	else:
+		compression = '<referenceableParamGroupRef ref="uncompressed"/>'
+
+	data_type = {"<f4": "MS:1000521", "<f8": "MS:1000523"}[dtype]
+
+	return f"""<binaryDataArray encodedLength="0">
+<cvParam cvRef="MS" accession="{data_type}"/>{compression}
+<cvParam cvRef="MS" accession="{array_type}"/>
+<binary>{base64.b64encode(data).decode("ascii")}</binary>
+</binaryDataArray>"""
+
+
+def _numpress_int(value):
+	# The half bytes of an integer, encoded as by the MS-Numpress reference implementation
+	value &= 0xffffffff
+	nibbles = [(value >> (4 * i)) & 0xf for i in range(8)]
+
+	n_leading = 0
+	if nibbles[7] == 0:
+		while n_leading < 8 and nibbles[7 - n_leading] == 0:
+			n_leading += 1
+		head = n_leading
+	elif nibbles[7] == 0xf:
+		while n_leading < 7 and nibbles[7 - n_leading] == 0xf:
+			n_leading += 1
+		head = n_leading + 8
+	else:
+		head = 0
+
+	return [head, *nibbles[:8 - n_leading]]
+
+
+def _pack_half_bytes(half_bytes):
+	if len(half_bytes) % 2:
+		half_bytes = [*half_bytes, 0]
+	return bytes((high << 4) | low for high, low in zip(half_bytes[0::2], half_bytes[1::2]))
+
+
+def _numpress_linear(values, fixed_point=1e6):
+	ints = [int(value * fixed_point + 0.5) for value in values]
+	data = struct.pack(">d", fixed_point) + struct.pack(f"<{len(ints[:2])}i", *ints[:2])
+
+	half_bytes = []
+	for i in range(2, len(ints)):
+		half_bytes.extend(_numpress_int(ints[i] - (2 * ints[i - 1] - ints[i - 2])))
+
+	return data + _pack_half_bytes(half_bytes)
+
+
+def _numpress_pic(values):
+	return _pack_half_bytes([half_byte for value in values for half_byte in _numpress_int(int(value + 0.5))])
+
+
+def _numpress_slof(values, fixed_point=1000.0):
+	return struct.pack(">d", fixed_point) + struct.pack(
+			f"<{len(values)}H", *(int(math.log(value + 1) * fixed_point + 0.5) for value in values)
+			)
+
+
+def _numpress_array(data, array_type, compression):
+	return f"""<binaryDataArray encodedLength="0">
+<cvParam cvRef="MS" accession="MS:1000523"/><cvParam cvRef="MS" accession="{compression}"/>
+<cvParam cvRef="MS" accession="{array_type}"/>
+<binary>{base64.b64encode(data).decode("ascii")}</binary>
+</binaryDataArray>"""
+
+
+def _spectrum(index, ms_level, time, mass_list, intensity_list, dtype="<f8", compress=False):
+	return f"""<spectrum index="{index}" id="scan={index + 1}" defaultArrayLength="{len(mass_list)}">
+<cvParam cvRef="MS" accession="MS:1000511" name="ms level" value="{ms_level}"/>
+<scanList count="1"><scan>{time}</scan></scanList>
+<binaryDataArrayList count="2">
+{_binary_data_array(mass_list, "MS:1000514", dtype, compress)}
+{_binary_data_array(intensity_list, "MS:1000515", dtype, compress)}
+</binaryDataArrayList>
+</spectrum>"""
+
+
+def _scan_time(value, unit="minute"):
+	unit_accession = {"minute": "UO:0000031", "second": "UO:0000010"}[unit]
+	return f'<cvParam cvRef="MS" accession="MS:1000016" value="{value}" unitAccession="{unit_accession}"/>'
+
+
+@pytest.fixture(scope="module")
+def mzml_file(tmp_path_factory):
+	spectra = [
+			_spectrum(0, 1, _scan_time(5.0), [50.5, 51.0, 73.0], [10, 20, 30]),
+			_spectrum(1, 2, _scan_time(5.01), [60.0, 61.0], [1, 2]),
+			_spectrum(2, 1, _scan_time(301.2, "second"), [52.0, 50.0], [40, 50], dtype="<f4", compress=True),
+			_spectrum(3, 1, '', [55.0], [60]),
+			_spectrum(4, 1, _scan_time(5.03), [], []),
+			_spectrum(5, 1, _scan_time(5.04), [50.0, 100.0, 150.0], [5, 6, 7], compress=True),
+			]
+
+	file_name = tmp_path_factory.mktemp("mzml") / "test.mzML"
+	file_name.write_text(_mzml_document(spectra))
+
+	return file_name
+
+
+def _mzml_document(spectra):
+	return f"""<?xml version="1.0" encoding="utf-8"?>
+<indexedmzML xmlns="http://psi.hupo.org/ms/mzml">
+<mzML xmlns="http://psi.hupo.org/ms/mzml" version="1.1.0">
+<referenceableParamGroupList count="1">
+<referenceableParamGroup id="uncompressed"><cvParam cvRef="MS" accession="MS:1000576"/></referenceableParamGroup>
+</referenceableParamGroupList>
+<run id="run"><spectrumList count="{len(spectra)}">
+{"".join(spectra)}
+</spectrumList></run>
+</mzML>
+</indexedmzML>
+"""
+
+
+def _numpress_spectrum(index, time, mass_array, intensity_array):
+	return f"""<spectrum index="{index}" id="scan={index + 1}" defaultArrayLength="{len(mass_array)}">
+<scanList count="1"><scan>{_scan_time(time)}</scan></scanList>
+<binaryDataArrayList count="2">
+{mass_array}
+{intensity_array}
+</binaryDataArrayList>
+</spectrum>"""
+
+
+def test_mzML_reader(mzml_file):
+	data = mzML_reader(mzml_file)
+	assert isinstance(data, GCMS_data)
+
+	# The spectrum without a scan start time is skipped
+	assert data.time_list == pytest.approx([300.0, 300.6, 301.2, 301.8, 302.4])
+	assert len(data) == 5
+
+	scans = data.scan_list
+	assert scans[0].mass_list == [50.5, 51.0, 73.0]
+	assert scans[0].intensity_list == [10, 20, 30]
+	assert scans[1].mass_list == [60.0, 61.0]
+
+	# Descending m/z values are reversed
+	assert scans[2].mass_list == [50.0, 52.0]
+	assert scans[2].intensity_list == [50, 40]
+
+	assert len(scans[3]) == 0
+	assert data.tic.intensity_array.tolist() == [60, 3, 90, 0, 18]
+
+	for obj in [*test_numbers, test_list_ints, test_dict]:
+		with pytest.raises(TypeError):
+			mzML_reader(obj)
+
+
+def test_mzML_reader_filters(mzml_file):
+	data = mzML_reader(mzml_file, ms_level=1)
+	assert data.time_list == pytest.approx([300.0, 301.2, 301.8, 302.4])
+
+	data = mzML_reader(mzml_file, ms_level=1, min_rt=300.5, max_rt="5.1m")
+	assert data.time_list == pytest.approx([301.2, 301.8, 302.4])
+
+	data = mzML_reader(mzml_file, min_rt="5.0m", max_rt=301.5)
+	assert data.time_list == pytest.approx([300.0, 300.6, 301.2])
+
+
+def test_iter_mzML_scans(mzml_file):
+	scans = iter_mzML_scans(mzml_file, ms_level=2)
+	time, scan = next(scans)
+	assert time == pytest.approx(300.6)
+	assert isinstance(scan, Scan)
+	assert isinstance(scan.mass_list, numpy.ndarray)
+	assert scan.mass_list.tolist() == [60.0, 61.0]
+
+	with pytest.raises(StopIteration):
+		next(scans)
+
+
+def test_mzML_reader_gzip(mzml_file, tmp_path):
+	gzip_file = tmp_path / "test.mzML.gz"
+	gzip_file.write_bytes(gzip.compress(mzml_file.read_bytes()))
+
+	data = mzML_reader(gzip_file)
+	expected = mzML_reader(mzml_file)
+	assert data.time_list == expected.time_list
+	assert [scan.mass_list for scan in data.scan_list] == [scan.mass_list for scan in expected.scan_list]
+	assert [scan.intensity_list for scan in data.scan_list] == [scan.intensity_list for scan in expected.scan_list]
+
+
+def test_mzML_reader_numpress(tmp_path):
+	# Checked by hand against the MS-Numpress specification
+	assert _numpress_pic([0, 1, 255]) == bytes([0x87, 0x16, 0xff])
+	assert _numpress_int(-1) == [15, 15]
+	assert _numpress_int(0xf0000000) == [9, 0, 0, 0, 0, 0, 0, 0]
+
+	rng = numpy.random.RandomState(13)
+	mass_list = numpy.sort(rng.uniform(50, 500, 200))
+	intensity_list = rng.randint(0, 100000, 200).astype(float)
+
+	spectra = [
+			_numpress_spectrum(
+					0,
+					5.0,
+					_numpress_array(_numpress_linear(mass_list), "MS:1000514", "MS:1002312"),
+					_numpress_array(_numpress_pic(intensity_list), "MS:1000515", "MS:1002313"),
+					),
+			_numpress_spectrum(
+					1,
+					5.1,
+					_numpress_array(zlib.compress(_numpress_linear(mass_list[:3])), "MS:1000514", "MS:1002746"),
+					_numpress_array(zlib.compress(_numpress_slof([1, 10, 1000])), "MS:1000515", "MS:1002748"),
+					),
+			_numpress_spectrum(
+					2,
+					5.2,
+					_numpress_array(_numpress_linear([100.0]), "MS:1000514", "MS:1002312"),
+					_numpress_array(zlib.compress(_numpress_pic([42])), "MS:1000515", "MS:1002747"),
+					),
+			]
+
+	file_name = tmp_path / "numpress.mzML"
+	file_name.write_text(_mzml_document(spectra))
+
+	scans = mzML_reader(file_name).scan_list
+	assert scans[0].mass_list == pytest.approx(list(mass_list), abs=1e-6)
+	assert scans[0].intensity_list == list(intensity_list)
+	assert scans[1].mass_list == pytest.approx(list(mass_list[:3]), abs=1e-6)
+	assert scans[1].intensity_list == pytest.approx([1, 10, 1000], rel=1e-3)
+	assert scans[2].mass_list == pytest.approx([100.0])
+	assert scans[2].intensity_list == [42]
+
+
+def test_mzML_reader_max_rt_stops(tmp_path):
+	# Reading stops at the first spectrum after max_rt, so the spectra after
+	# it, including this out of order one, are not read
+	spectra = [
+			_spectrum(0, 1, _scan_time(5.0), [50.0], [1]),
+			_spectrum(1, 1, _scan_time(5.01), [51.0], [2]),
+			_spectrum(2, 1, _scan_time(5.02), [52.0], [3]),
+			_spectrum(3, 1, _scan_time(5.2), [53.0], [4]),
+			_spectrum(4, 1, _scan_time(5.05), [54.0], [5]),
+			]
+
+	file_name = tmp_path / "unordered.mzML"
+	file_name.write_text(_mzml_document(spectra))
+
+	assert mzML_reader(file_name, max_rt="5.1m").time_list == pytest.approx([300.0, 300.6, 301.2])
+	assert [time for time, scan in iter_mzML_scans(file_name)] == pytest.approx([300.0, 300.6, 301.2, 312.0, 303.0])
@@ -19,6 +19,7 @@
 #############################################################################
 
 # 3rd party
+import numpy  # type: ignore
 import pytest  # type: ignore
 
 # pyms
@@ -32,6 +33,23 @@ from pyms.TopHat import tophat
 from .constants import *
 
 
+def _reference_window(ia, wing_length, use_median=False):
+	"""
+	Point-by-point window smoothing, with the window truncated at the ends of the array
+	"""
+
+	ia_denoise = numpy.zeros(len(ia))
+
+	for index in range(len(ia)):
+		window = ia[max(index - wing_length, 0):index + wing_length + 1]
+		if use_median:
+			ia_denoise[index] = numpy.median(window)
+		else:
+			ia_denoise[index] = numpy.mean(window)
+
+	return ia_denoise
+
+
 def test_window_smooth(tic):
 	assert isinstance(tic, IonChromatogram)
 
@@ -48,6 +66,11 @@ def test_window_smooth(tic):
 	tic3 = window_smooth(tic, window='7s')
 	assert isinstance(tic3, IonChromatogram)
 
+	# Smoothed intensities are not truncated to integers
+	numpy.testing.assert_allclose(tic1.intensity_array, _reference_window(tic.intensity_array, 2), rtol=1e-12)
+	numpy.testing.assert_array_equal(tic2.intensity_array, _reference_window(tic.intensity_array, 2, use_median=True))
+	assert tic1.intensity_array.dtype == numpy.float64
+
 	for obj in [*test_numbers, test_string, *test_lists, test_dict]:
 		with pytest.raises(TypeError):
 			window_smooth(obj)
@@ -87,6 +110,18 @@ def test_window_smooth_im(im):
 			window_smooth_im(im, use_median=obj)
 
 
+@pytest.mark.parametrize("use_median", [True, False])
+def test_window_smooth_im_dtype(im, use_median):
+	# float32 intensities stay float32
+	im_f32 = IntensityMatrix(im.time_list, im.mass_list, im.intensity_array.astype(numpy.float32))
+	assert window_smooth_im(im_f32, use_median=use_median).intensity_array.dtype == numpy.float32
+
+	# Short chromatograms, where every window is truncated
+	im_short = IntensityMatrix(im.time_list[:3], im.mass_list, im.intensity_array[:3])
+	expected = [_reference_window(column, 2, use_median) for column in im_short.intensity_array.T]
+	numpy.testing.assert_allclose(window_smooth_im(im_short, window=5, use_median=use_median).intensity_array.T, expected, rtol=1e-12)
+
+
 def test_smooth_im(data):
 	# Build intensity matrix with defaults, float masses with interval
 	# (bin size) of one from min mass
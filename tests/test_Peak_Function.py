@@ -18,14 +18,19 @@
 #                                                                           #
 #############################################################################
 
+# stdlib
+import copy
+
 # 3rd party
 import deprecation  # type: ignore
+import numpy  # type: ignore
 import pytest  # type: ignore
 
 # pyms
+from pyms.BillerBiemann import BillerBiemann, num_ions_threshold, rel_threshold
 from pyms.Peak.Function import (
-	half_area, ion_area, median_bounds, peak_pt_bounds, peak_sum_area, peak_top_ion_areas,
-	top_ions_v1, top_ions_v2,
+	half_area, ion_area, ion_areas, IonAreas, median_bounds, peak_list_areas, peak_list_ion_areas, peak_list_median_bounds,
+	peak_list_pt_bounds, peak_pt_bounds, peak_sum_area, peak_top_ion_areas, top_ions_v1, top_ions_v2,
 	)
 # tests
 from .constants import *
@@ -158,6 +163,78 @@ class Test_ion_area:
 			ion_area(list(range(100)), 20, tol=obj)
 
 
+class Test_ion_areas:
+
+	def test_array(self):
+		ia = list(range(100))
+		assert ion_area(numpy.array(ia), 20) == ion_area(ia, 20)
+		assert ion_area(numpy.array(ia, dtype=float), numpy.int64(20)) == ion_area(ia, 20)
+		assert half_area(numpy.array(ia), 20) == half_area(ia, 20)
+
+	def test_main(self, im_i):
+		ia = im_i.intensity_array
+		apexes = numpy.array([0, 5, 120, 500, len(ia) - 1])
+		columns = numpy.array([0, 3, 20, 50])
+
+		for max_bound in [0, 2]:
+			result = ion_areas(ia, apexes[:, None], columns[None, :], max_bound=max_bound)
+			assert len(result) == 5
+
+			for array in result:
+				assert isinstance(array, numpy.ndarray)
+				assert array.shape == (len(apexes), len(columns))
+
+			for row, apex in enumerate(apexes):
+				for col, column in enumerate(columns):
+					expected = ion_area(ia[:, column].tolist(), int(apex), max_bound=max_bound)
+					assert tuple(array[row, col] for array in result) == expected
+
+	def test_single_ic(self):
+		ia = numpy.array([0, 1, 5, 20, 5, 1, 0, 0, 2, 8, 2, 0, 0], dtype=float)
+		result = ion_areas(ia, [3, 9])
+
+		assert list(zip(*(array.tolist() for array in result))) == [ion_area(ia.tolist(), 3), ion_area(ia.tolist(), 9)]
+
+	def test_empty(self):
+		area, left, right, l_share, r_share = ion_areas(list(range(100)), [])
+		assert area.shape == left.shape == right.shape == (0, )
+
+	@pytest.mark.parametrize("obj", [test_string, *test_numbers, test_dict, test_list_strs])
+	def test_ia_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(obj, 20)
+
+	@pytest.mark.parametrize("obj", [test_string, test_float, test_list_strs])
+	def test_apexes_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(list(range(100)), obj)
+
+	@pytest.mark.parametrize("obj", [test_string, test_float, test_list_strs])
+	def test_columns_errors(self, obj):
+		with pytest.raises(TypeError):
+			ion_areas(list(range(100)), 20, columns=obj)
+
+	def test_out_of_range(self):
+		with pytest.raises(IndexError):
+			ion_areas(list(range(100)), 100)
+
+		with pytest.raises(IndexError):
+			ion_areas(list(range(100)), [20, -1])
+
+		with pytest.raises(IndexError):
+			ion_areas(list(range(100)), 20, columns=1)
+
+	def test_shape_errors(self):
+		with pytest.raises(ValueError):
+			ion_areas(numpy.zeros((3, 3, 3)), 1)
+
+		with pytest.raises(ValueError):
+			ion_area(numpy.zeros((3, 3)), 1)
+
+		with pytest.raises(ValueError):
+			ion_areas([], 0)
+
+
 class Test_half_area:
 
 	def test_main(self, peak, im_i):
@@ -211,6 +288,100 @@ class Test_median_bounds:
 			median_bounds(im_i, peak, obj)
 
 
+@pytest.fixture(scope="module")
+def area_peak_list(im_i):
+	peak_list = BillerBiemann(im_i, points=9, scans=2)
+	peak_list = num_ions_threshold(rel_threshold(peak_list, 2), 3, 3000)
+	return peak_list[::10]
+
+
+class Test_peak_list:
+
+	def test_ion_areas(self, im_i, area_peak_list):
+		for max_bound in [0, 5]:
+			ion_areas = peak_list_ion_areas(im_i, area_peak_list, max_bound=max_bound)
+			assert isinstance(ion_areas, IonAreas)
+
+			for index, peak in enumerate(area_peak_list):
+				in_peak = ion_areas.peak_index == index
+				area_sum, area_dict = peak_sum_area(im_i, peak, single_ion=True, max_bound=max_bound)
+				assert ion_areas.mass[in_peak].tolist() == list(area_dict)
+				assert ion_areas.area[in_peak].tolist() == list(area_dict.values())
+
+
+			# Compare the boundaries with ion_area
+			for pair in range(0, len(ion_areas.area), 37):
+				apex = im_i.get_index_at_time(area_peak_list[ion_areas.peak_index[pair]].rt)
+				ia = im_i.get_ic_at_index(int(ion_areas.column[pair])).intensity_array.tolist()
+				expected = ion_area(ia, apex, max_bound=max_bound)
+				assert expected == (
+						ion_areas.area[pair],
+						ion_areas.left[pair],
+						ion_areas.right[pair],
+						ion_areas.left_shared[pair],
+						ion_areas.right_shared[pair],
+						)
+
+	def test_areas(self, im_i, area_peak_list):
+		peak_list = copy.deepcopy(area_peak_list)
+		areas = peak_list_areas(im_i, peak_list, n_top_ions=4)
+
+		assert areas == [peak_sum_area(im_i, peak) for peak in area_peak_list]
+		assert [peak.area for peak in peak_list] == areas
+		assert [peak.ion_areas for peak in peak_list] == [
+				peak_top_ion_areas(im_i, peak, n_top_ions=4) for peak in area_peak_list
+				]
+
+	def test_bounds(self, im_i, area_peak_list):
+		assert peak_list_pt_bounds(im_i, area_peak_list) == [peak_pt_bounds(im_i, peak) for peak in area_peak_list]
+
+		for shared in [True, False]:
+			bounds = peak_list_median_bounds(im_i, area_peak_list, shared)
+			assert bounds == [median_bounds(im_i, peak, shared) for peak in area_peak_list]
+
+	def test_sparse(self, im_i, area_peak_list):
+		im_sparse = im_i.to_sparse()
+		peak = area_peak_list[3]
+
+		ion_areas = peak_list_ion_areas(im_sparse, area_peak_list, max_bound=5)
+		expected = peak_list_ion_areas(im_i, area_peak_list, max_bound=5)
+		for values, expected_values in zip(ion_areas, expected):
+			assert values.tolist() == expected_values.tolist()
+
+		peak_list = copy.deepcopy(area_peak_list)
+		assert peak_list_areas(im_sparse, peak_list) == peak_list_areas(im_i, copy.deepcopy(area_peak_list))
+		assert [peak.ion_areas for peak in peak_list] == [
+				peak_top_ion_areas(im_i, peak) for peak in area_peak_list
+				]
+
+		assert peak_sum_area(im_sparse, peak, single_ion=True) == peak_sum_area(im_i, peak, single_ion=True)
+		assert peak_top_ion_areas(im_sparse, peak) == peak_top_ion_areas(im_i, peak)
+		assert peak_list_pt_bounds(im_sparse, area_peak_list) == peak_list_pt_bounds(im_i, area_peak_list)
+		assert median_bounds(im_sparse, peak) == median_bounds(im_i, peak)
+		assert peak_list_areas(im_sparse, []) == []
+
+	@pytest.mark.parametrize("obj", [test_string, *test_numbers, test_dict, *test_lists])
+	def test_errors(self, im_i, area_peak_list, obj):
+		with pytest.raises(TypeError):
+			peak_list_ion_areas(obj, area_peak_list)
+
+		with pytest.raises(TypeError):
+			peak_list_ion_areas(im_i, obj)
+
+		with pytest.raises(TypeError):
+			peak_list_areas(im_i, obj)
+
+		with pytest.raises(TypeError):
+			peak_list_median_bounds(im_i, obj)
+
+		if not isinstance(obj, int):
+			with pytest.raises(TypeError):
+				peak_list_ion_areas(im_i, area_peak_list, max_bound=obj)
+
+			with pytest.raises(TypeError):
+				peak_list_areas(im_i, area_peak_list, n_top_ions=obj)
+
+
 """def test_abundant_ions(filtered_peak_list, im_i):
 
 	print("Number of filtered peaks: ", len(filtered_peak_list))
@@ -95,6 +95,21 @@ def test_composite_peak_outliers(filtered_peak_list, im_i):
 	assert peak.UID != uid
 
 
+def test_composite_peak_outliers_not_modified():
+	ms = MassSpectrum([50, 51, 52], [10.0, 20.0, 30.0])
+	peaks = [Peak(rt, ms) for rt in [100.0, 100.5, 101.0, 101.5, 150.0]]
+	composite_peak_list = list(peaks)
+
+	peak = composite_peak(composite_peak_list, ignore_outliers=True)
+	assert peak.rt == 100.75
+
+	# The outlier is replaced with a marked copy
+	assert composite_peak_list[4] is not peaks[4]
+	assert composite_peak_list[4].is_outlier
+	assert composite_peak_list[4].rt == 150.0
+	assert not any(p.is_outlier for p in peaks)
+
+
 def test_fill_peaks(im_i, peak_list):
 	filled_peak_list = fill_peaks(im_i, peak_list, 10.0)
 	assert is_peak_list(filled_peak_list)
@@ -0,0 +1,165 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+from collections import Counter
+
+# 3rd party
+import pytest  # type: ignore
+
+# pyms
+from pyms.BillerBiemann import BillerBiemann, rel_threshold
+from pyms.GCMS.IO.JCAMP import JCAMP_reader
+from pyms.IntensityMatrix import build_intensity_matrix_i
+from pyms.Pipeline import Pipeline
+
+# tests
+from .constants import *
+
+calls = Counter()
+
+
+def add(value, amount):
+	calls["add"] += 1
+	return value + amount
+
+
+def multiply(value, factor=1):
+	calls["multiply"] += 1
+	return value * factor
+
+
+@pytest.fixture()
+def pipeline(tmp_path):
+	calls.clear()
+
+	pipeline = Pipeline(tmp_path / "cache")
+	pipeline.add_stage("add", add, 2).add_stage("multiply", multiply, factor=3)
+	return pipeline
+
+
+def test_run(pipeline):
+	assert pipeline.stage_names == ["add", "multiply"]
+	assert len(pipeline) == 2
+
+	assert pipeline.run(1) == 9
+	assert calls == {"add": 1, "multiply": 1}
+
+	# Everything is cached
+	assert pipeline.run(1) == 9
+	assert calls == {"add": 1, "multiply": 1}
+
+	# Different input
+	assert pipeline.run(2) == 12
+	assert calls == {"add": 2, "multiply": 2}
+
+
+def test_set_params(pipeline):
+	pipeline.run(1)
+
+	# Only the changed stage is repeated
+	pipeline.set_params("multiply", factor=4)
+	assert pipeline.run(1) == 12
+	assert calls == {"add": 1, "multiply": 2}
+
+	# Changing an earlier stage invalidates the later ones
+	pipeline.set_params("add", 3)
+	assert pipeline.run(1) == 16
+	assert calls == {"add": 2, "multiply": 3}
+
+	with pytest.raises(ValueError):
+		pipeline.set_params("divide", 2)
+
+
+def test_stop(pipeline):
+	assert pipeline.run(1, stop="add") == 3
+	assert calls == {"add": 1}
+
+	assert pipeline.run(1) == 9
+	assert calls == {"add": 1, "multiply": 1}
+
+
+def test_no_cache():
+	calls.clear()
+
+	pipeline = Pipeline()
+	pipeline.add_stage("add", add, 2)
+
+	assert pipeline.run(1) == 3
+	assert pipeline.run(1) == 3
+	assert calls == {"add": 2}
+
+
+def test_cache_size(tmp_path):
+	calls.clear()
+
+	pipeline = Pipeline(tmp_path / "cache", max_cache_size=0)
+	pipeline.add_stage("add", add, 2)
+
+	assert pipeline.run(1) == 3
+	assert pipeline.run(1) == 3
+	assert calls == {"add": 2}
+	assert not list((tmp_path / "cache").iterdir())
+
+
+def test_clear_cache(pipeline):
+	pipeline.run(1)
+	pipeline.clear_cache()
+	pipeline.run(1)
+
+	assert calls == {"add": 2, "multiply": 2}
+
+
+def test_errors(pipeline):
+	with pytest.raises(ValueError):
+		pipeline.add_stage("add", add, 3)
+
+	with pytest.raises(TypeError):
+		pipeline.add_stage("lambda", add, lambda x: x)
+
+	with pytest.raises(TypeError):
+		pipeline.add_stage("not_callable", 1)
+
+	for obj in [test_float, *test_numbers, test_dict, *test_lists]:
+		with pytest.raises(TypeError):
+			pipeline.add_stage(obj, add)
+
+	with pytest.raises(TypeError):
+		Pipeline(test_int)
+
+	with pytest.raises(TypeError):
+		Pipeline(max_cache_size=test_float)
+
+
+def test_peak_detection(datadir, tmp_path):
+	pipeline = Pipeline(tmp_path / "cache")
+	pipeline.add_stage("read", JCAMP_reader)
+	pipeline.add_stage("bin", build_intensity_matrix_i)
+	pipeline.add_stage("peaks", BillerBiemann, points=9, scans=2)
+	pipeline.add_stage("threshold", rel_threshold, percent=2)
+
+	peak_list = pipeline.run(datadir / "ELEY_1_SUBTRACT.JDX")
+
+	expected = rel_threshold(BillerBiemann(build_intensity_matrix_i(JCAMP_reader(datadir / "ELEY_1_SUBTRACT.JDX")), points=9, scans=2), percent=2)
+	assert len(peak_list) == len(expected)
+	assert [peak.rt for peak in peak_list] == [peak.rt for peak in expected]
+
+	pipeline.set_params("threshold", percent=5)
+	assert pipeline.run(datadir / "ELEY_1_SUBTRACT.JDX") == rel_threshold(expected, percent=5)
@@ -23,7 +23,7 @@ import numpy  # type: ignore
 import pytest  # type: ignore
 
 # pyms
-from pyms.Spectrum import Scan
+from pyms.Spectrum import Scan, sort_scan
 
 # tests
 from .constants import *
@@ -77,3 +77,23 @@ def test_scan_values(scan, index, mass, intensity):
 def test_zero_length():
 	# TODO: finish
 	scan = Scan([], [])
+
+
+def test_sort_scan():
+	masses = numpy.array([50.0, 51.0, 52.0])
+	intensities = numpy.array([3.0, 2.0, 1.0])
+
+	sorted_masses, sorted_intensities = sort_scan(masses, intensities)
+	assert sorted_masses is masses
+	assert sorted_intensities is intensities
+
+	sorted_masses, sorted_intensities = sort_scan(masses[::-1], intensities[::-1])
+	assert sorted_masses.tolist() == [50.0, 51.0, 52.0]
+	assert sorted_intensities.tolist() == [3.0, 2.0, 1.0]
+
+	with pytest.warns(UserWarning, match="Unknown sort order"):
+		sorted_masses, sorted_intensities = sort_scan(numpy.array([51.0, 50.0, 52.0]), intensities)
+	assert sorted_masses.tolist() == [50.0, 51.0, 52.0]
+	assert sorted_intensities.tolist() == [2.0, 3.0, 1.0]
+
+	assert sort_scan(numpy.zeros(0), numpy.zeros(0))[0].tolist() == []
@@ -58,6 +58,9 @@ def test_tophat_im(im):
 	ic_base_corr = im_base_corr.get_ic_at_index(73)
 	assert isinstance(ic_base_corr, IonChromatogram)
 
+	# Threads give the same result
+	assert tophat_im(im, struct="1.5m", n_jobs=3) == tophat_im(im, struct="1.5m")
+
 
 class TestErrors:
 
@@ -84,6 +87,15 @@ class TestErrors:
 			with pytest.raises(expects):
 				tophat(tic, struct)
 
+	@pytest.mark.parametrize("n_jobs, expects", [
+			(0, ValueError),
+			(test_float, TypeError),
+			(test_string, TypeError),
+			])
+	def test_n_jobs_errors(self, im, n_jobs, expects):
+		with pytest.raises(expects):
+			tophat_im(im, "1m", n_jobs=n_jobs)
+
 
 # TODO:
 # ic.write("output/ic.dat",minutes=True)
@@ -0,0 +1,138 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# 3rd party
+import pytest  # type: ignore
+
+# pyms
+from pyms.Utils.jcamp import iter_jcamp_pages
+
+
+def _write_jdx(path, form, data, **labels):
+	header = ''.join(f"##{label}={value}\n" for label, value in labels.items())
+	path.write_text(f"##TITLE=test\n{header}##XYDATA={form}\n{data}\n##END=\n")
+	return path
+
+
+@pytest.mark.parametrize("data", [
+		"100 1 2 3 4",  # AFFN
+		"100A B C D",  # SQZ
+		"100AJJJ",  # DIF
+		"100AJU",  # DIF and DUP
+		"100A J J\n103C J",  # DIF, with the y value check on the second line
+		"100 1 2\n102 3 4",
+		])
+def test_x_yy(tmp_path, data):
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", data, FIRSTX=100, LASTX=103, NPOINTS=4)
+
+	(labels, x_values, y_values), = iter_jcamp_pages(file_name)
+	assert labels["TITLE"] == "test"
+	assert x_values.tolist() == [100, 101, 102, 103]
+	assert y_values.tolist() == [1, 2, 3, 4]
+
+
+def test_x_yy_asdf(tmp_path):
+	data = "1@a%TA0jq\n8A a1"
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", data, FIRSTX=1, LASTX=8, NPOINTS=8, YFACTOR=0.5)
+
+	(labels, x_values, y_values), = iter_jcamp_pages(file_name)
+	assert x_values.tolist() == [1, 2, 3, 4, 5, 6, 7, 8]
+	assert y_values.tolist() == [0, -0.5, -0.5, -0.5, 5, 4.5, 0.5, -5.5]
+
+
+@pytest.mark.parametrize("data, y_values", [
+		("100E10E11E12", [510, 511, 512]),  # SQZ 5, directly after the numbers
+		("100e10e11e12", [-510, -511, -512]),  # SQZ -5
+		("100E10 E11\n102E12", [510, 511, 512]),
+		("100E10J", [510, 511]),  # SQZ and DIF
+		("100 1.5E2 2.5e+2 -3.5E-1", [150, 250, -0.35]),  # AFFN with exponents
+		("100.0E0,5.1E2", [510]),
+		])
+def test_x_yy_sqz_e(tmp_path, data, y_values):
+	n_points = len(y_values)
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", data, FIRSTX=100, LASTX=99 + n_points, NPOINTS=n_points)
+
+	(labels, x_values, y_values_read), = iter_jcamp_pages(file_name)
+	assert y_values_read.tolist() == pytest.approx(y_values)
+
+
+def test_x_yy_errors(tmp_path):
+	# The y value check at the start of the second line doesn't match
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", "1AJ\n3C", FIRSTX=1, LASTX=3, NPOINTS=3)
+	with pytest.raises(ValueError):
+		list(iter_jcamp_pages(file_name))
+
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", "1 1 2", FIRSTX=1, LASTX=3, NPOINTS=3)
+	with pytest.raises(ValueError):
+		list(iter_jcamp_pages(file_name))
+
+	file_name = _write_jdx(tmp_path / "test.jdx", "(X++(Y..Y))", "1 1 2", NPOINTS=2)
+	with pytest.raises(ValueError):
+		list(iter_jcamp_pages(file_name))
+
+
+def test_xy_pages(tmp_path):
+	file_name = tmp_path / "test.jdx"
+	file_name.write_text("""##TITLE=test
+##NTUPLES=MASS SPECTRUM
+##PAGE=T=1.5
+##NPOINTS=3
+##DATA TABLE=(XY..XY), PEAKS
+50.1, 10.0; 51.2, 20.0
+52.3,  $$ comment
+30.0
+##PAGE=T=3.0
+##NPOINTS=0
+##DATA TABLE=(XY..XY), PEAKS
+##PAGE=T=4.5
+##DATA TABLE=(XY..XY), PEAKS
+60 1 61 2
+##END NTUPLES=MASS SPECTRUM
+##END=
+""")
+
+	pages = iter_jcamp_pages(file_name)
+
+	labels, x_values, y_values = next(pages)
+	assert labels["PAGE"] == "T=1.5"
+	assert labels["NTUPLES"] == "MASS SPECTRUM"
+	assert x_values.tolist() == [50.1, 51.2, 52.3]
+	assert y_values.tolist() == [10, 20, 30]
+
+	labels, x_values, y_values = next(pages)
+	assert labels == {"PAGE": "T=3.0", "NPOINTS": '0', "DATA TABLE": "(XY..XY), PEAKS"}
+	assert len(x_values) == len(y_values) == 0
+
+	labels, x_values, y_values = next(pages)
+	assert x_values.tolist() == [60, 61]
+	assert y_values.tolist() == [1, 2]
+
+	with pytest.raises(StopIteration):
+		next(pages)
+
+
+def test_xy_errors(tmp_path):
+	file_name = _write_jdx(tmp_path / "test.jdx", "(XY..XY)", "50, 1, 51")
+	with pytest.raises(ValueError, match=r"Odd number of values \(3\) in \(XY\.\.XY\) data table"):
+		list(iter_jcamp_pages(file_name))
+
+	file_name = _write_jdx(tmp_path / "test.jdx", "(XY..XY)", "50, 1, 51, ?")
+	with pytest.raises(ValueError):
+		list(iter_jcamp_pages(file_name))
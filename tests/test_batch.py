@@ -0,0 +1,168 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+import csv
+import os
+import shutil
+
+# 3rd party
+import pytest  # type: ignore
+
+# pyms
+from pyms.Experiment import Experiment, load_expr
+from pyms.GCMS.Class import GCMS_data
+from pyms.IntensityMatrix import build_intensity_matrix_i
+from pyms.Pipeline import Pipeline
+from pyms.batch import default_pipeline, detect_peaks, main, read_data, run_batch
+
+# tests
+from .constants import *
+
+
+def make_pipeline():
+	pipeline = Pipeline()
+	pipeline.add_stage("read", read_data)
+	pipeline.add_stage("bin", build_intensity_matrix_i)
+	pipeline.add_stage("peaks", detect_peaks, points=9, scans=2, percent=2, n=3, cutoff=3000)
+	return pipeline
+
+
+def read_or_crash(file_name):
+	# Kill the worker process, as running out of memory would
+	if "crash" in str(file_name):
+		os._exit(1)
+
+	return read_data(file_name)
+
+
+@pytest.fixture(scope="module")
+def data_files(datadir, tmp_path_factory):
+	directory = tmp_path_factory.mktemp("batch_data")
+
+	file_names = []
+	for name in ["run_1.JDX", "run_2.JDX"]:
+		shutil.copy(str(datadir / "ELEY_1_SUBTRACT.JDX"), str(directory / name))
+		file_names.append(directory / name)
+
+	# A file which can't be processed
+	(directory / "broken.jdx").write_text("##TITLE= broken\n##END=\n")
+	file_names.append(directory / "broken.jdx")
+
+	return file_names
+
+
+def test_read_data(datadir):
+	assert isinstance(read_data(datadir / "ELEY_1_SUBTRACT.JDX"), GCMS_data)
+
+	with pytest.raises(ValueError):
+		read_data(datadir / "ELEY_1_SUBTRACT.txt")
+
+	for obj in [test_float, *test_numbers, test_dict, *test_lists]:
+		with pytest.raises(TypeError):
+			read_data(obj)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_batch(data_files, tmp_path, max_workers):
+	results = run_batch(data_files, make_pipeline(), tmp_path, max_workers=max_workers)
+
+	assert [result.file_name for result in results] == data_files
+	assert [result.ok for result in results] == [True, True, False]
+
+	for result in results[:2]:
+		expr = load_expr(result.output_file)
+		assert isinstance(expr, Experiment)
+		assert expr.expr_code == result.file_name.stem
+		assert len(expr) == result.n_peaks > 0
+		assert result.elapsed > 0
+
+		for peak in expr.peak_list:
+			assert peak.area > 0
+			assert len(peak.ion_areas) == 5
+
+	assert results[2].output_file is None
+	assert results[2].error.startswith("Traceback")
+	assert not (tmp_path / "broken.expr").exists()
+
+
+def test_run_batch_broken_pool(data_files, tmp_path):
+	crash_file = tmp_path / "crash.jdx"
+	shutil.copy(str(data_files[0]), str(crash_file))
+
+	pipeline = Pipeline()
+	pipeline.add_stage("read", read_or_crash)
+	pipeline.add_stage("bin", build_intensity_matrix_i)
+	pipeline.add_stage("peaks", detect_peaks)
+
+	file_names = [crash_file, *data_files]
+	results = run_batch(file_names, pipeline, tmp_path / "output", max_workers=2)
+
+	assert [result.file_name for result in results] == file_names
+	assert not results[0].ok
+	assert "BrokenProcessPool" in results[0].error
+
+	# Files which had not finished when the worker died are failed too
+	for result in results:
+		assert result.ok or result.output_file is None
+
+
+def test_run_batch_errors(data_files, tmp_path):
+	with pytest.raises(TypeError):
+		run_batch(data_files, test_dict, tmp_path)
+
+	with pytest.raises(TypeError):
+		run_batch(data_files, make_pipeline(), test_int)
+
+	with pytest.raises(TypeError):
+		run_batch([test_int], make_pipeline(), tmp_path)
+
+	with pytest.raises(ValueError):
+		run_batch(data_files, make_pipeline(), tmp_path, max_workers=0)
+
+	with pytest.raises(ValueError, match="run_1"):
+		run_batch([data_files[0], tmp_path / "run_1.cdf"], make_pipeline(), tmp_path)
+
+
+def test_main(data_files, tmp_path):
+	assert main([
+			*map(str, data_files[:2]),
+			"--output-dir", str(tmp_path),
+			"--jobs", "2",
+			"--recipe", "tests.test_batch:make_pipeline",
+			]) == 0
+
+	assert (tmp_path / "run_1.expr").exists()
+	assert (tmp_path / "run_2.expr").exists()
+
+	with (tmp_path / "batch_report.csv").open() as fp:
+		rows = list(csv.reader(fp))
+
+	assert rows[0] == ["File", "Output", "Peaks", "Time (s)", "Error"]
+	assert len(rows) == 3
+
+	assert main([str(data_files[2]), "-o", str(tmp_path), "-j", "1", "--recipe", "tests.test_batch:make_pipeline"]) == 1
+
+
+def test_default_pipeline():
+	pipeline = default_pipeline(percent=5)
+	assert pipeline.stage_names == ["read", "bin", "smooth", "baseline", "peaks"]
+	assert pipeline.stages[4].function is detect_peaks
+	assert pipeline.stages[4].kwargs == {"points": 9, "scans": 2, "percent": 5, "n": 3, "cutoff": 3000}
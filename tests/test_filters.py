@@ -0,0 +1,90 @@
+#############################################################################
+#                                                                           #
+#    PyMassSpec software for processing of mass-spectrometry data           #
+#    Copyright (C) 2019-2020 Dominic Davis-Foster                           #
+#                                                                           #
+#    This program is free software; you can redistribute it and/or modify   #
+#    it under the terms of the GNU General Public License version 2 as      #
+#    published by the Free Software Foundation.                             #
+#                                                                           #
+#    This program is distributed in the hope that it will be useful,        #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          #
+#    GNU General Public License for more details.                           #
+#                                                                           #
+#    You should have received a copy of the GNU General Public License      #
+#    along with this program; if not, write to the Free Software            #
+#    Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA.              #
+#                                                                           #
+#############################################################################
+
+# stdlib
+import copy
+
+# 3rd party
+import numpy  # type: ignore
+import pytest  # type: ignore
+
+# pyms
+from pyms.Noise.SavitzkyGolay import savitzky_golay, savitzky_golay_im
+from pyms.Noise.Window import window_smooth, window_smooth_im
+from pyms.TopHat import tophat, tophat_im
+
+# tests
+from .constants import *
+
+# The functions which filter the whole intensity matrix at once, the
+# functions they are equivalent to for each IC, their arguments,
+# and the tolerance on the difference between them.
+filters = pytest.mark.parametrize("im_func, ic_func, kwargs, tolerance", [
+		(savitzky_golay_im, savitzky_golay, {"window": 7, "degree": 2}, {"rtol": 1e-10, "atol": 1e-6}),
+		(savitzky_golay_im, savitzky_golay, {"window": 7, "degree": 5}, {"rtol": 1e-10, "atol": 1e-6}),
+		(savitzky_golay_im, savitzky_golay, {"window": 5, "degree": 2}, {"rtol": 1e-10, "atol": 1e-6}),
+		(savitzky_golay_im, savitzky_golay, {"window": "5s", "degree": 3}, {"rtol": 1e-10, "atol": 1e-6}),
+		(window_smooth_im, window_smooth, {"window": 5, "use_median": False}, {"rtol": 1e-12}),
+		(window_smooth_im, window_smooth, {"window": 5, "use_median": True}, {"rtol": 1e-12}),
+		(window_smooth_im, window_smooth, {"window": "7s", "use_median": False}, {"rtol": 1e-12}),
+		(window_smooth_im, window_smooth, {"window": "7s", "use_median": True}, {"rtol": 1e-12}),
+		(tophat_im, tophat, {"struct": "1.5m"}, {"rtol": 0}),
+		(tophat_im, tophat, {"struct": None}, {"rtol": 0}),
+		(tophat_im, tophat, {"struct": 20}, {"rtol": 0}),
+		])
+
+
+@filters
+def test_matches_ic(im, im_func, ic_func, kwargs, tolerance):
+	# The whole-matrix filter matches filtering each IC separately
+	im_filtered = im_func(im, **kwargs)
+
+	for ii in [0, 73, im.size[1] - 1]:
+		expected = ic_func(im.get_ic_at_index(ii), **kwargs).intensity_array
+		numpy.testing.assert_allclose(im_filtered.get_ic_at_index(ii).intensity_array, expected, **tolerance)
+
+	assert im_filtered.time_list == im.time_list
+	assert im_filtered.mass_list == im.mass_list
+
+
+@filters
+def test_sparse(im, im_func, ic_func, kwargs, tolerance):
+	im_sparse = im.to_sparse()
+
+	im_filtered = im_func(im_sparse, **kwargs)
+	assert im_filtered.is_sparse
+	numpy.testing.assert_array_equal(im_filtered.intensity_array, im_func(im, **kwargs).intensity_array)
+
+	assert im_func(im_sparse, inplace=True, **kwargs) is im_sparse
+	assert im_sparse.is_sparse
+	assert im_sparse == im_filtered
+
+
+@filters
+def test_inplace(im, im_func, ic_func, kwargs, tolerance):
+	im_copy = copy.deepcopy(im)
+
+	im_filtered = im_func(im_copy, inplace=True, **kwargs)
+	assert im_filtered is im_copy
+	assert im_copy == im_func(im, **kwargs)
+
+	# A large structural element leaves this data unchanged
+	if kwargs != {"struct": None}:
+		assert im_copy != im